@@ -0,0 +1,150 @@
+# batch_eval.py
+#
+# Vectorized static evaluation of many positions at once with NumPy: material,
+# piece-square tables and pawn structure (isolated, doubled and passed pawns),
+# the same terms Bot.evaluate_board computes before its attack-map terms.
+# It is a standalone tool for analysis and data generation: the search keeps
+# material and piece-square scores incrementally, so batching its leaves saves
+# nothing and the attack-map terms still cost one pass per position.
+#
+#   python batch_eval.py positions.fen            # one FEN per line, prints a score per line
+#   python batch_eval.py positions.fen --batch 65536
+#
+# Boards are encoded as an (N, 64) int8 array of piece codes, squares in
+# row * 8 + col order. Scores are from white's point of view.
+
+import argparse
+import sys
+import numpy as np
+from chess_logic import board_from_fen
+from evaluation import (
+    PSQT_MIDDLEGAME, PSQT_ENDGAME, PIECE_PHASE, MAX_PHASE,
+    ISOLATED_PAWN_PENALTY, DOUBLED_PAWN_PENALTY, PASSED_PAWN_BONUS
+)
+
+# Piece codes: 0 is an empty square
+PIECE_CODES = ['--', 'wp', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bp', 'bN', 'bB', 'bR', 'bQ', 'bK']
+CODE_OF = {piece: code for code, piece in enumerate(PIECE_CODES)}
+WHITE_PAWN = CODE_OF['wp']
+BLACK_PAWN = CODE_OF['bp']
+
+
+def _code_table(tables):
+    """
+    Stacks per-piece square tables into a (13, 64) array indexed by piece code.
+    """
+    table = np.zeros((len(PIECE_CODES), 64), dtype=np.int32)
+    for code, piece in enumerate(PIECE_CODES[1:], 1):
+        table[code] = tables[piece]
+    return table
+
+
+MIDDLEGAME_BY_CODE = _code_table(PSQT_MIDDLEGAME)
+ENDGAME_BY_CODE = _code_table(PSQT_ENDGAME)
+PHASE_BY_CODE = np.array([0] + [PIECE_PHASE[piece] for piece in PIECE_CODES[1:]], dtype=np.int32)
+SQUARES = np.arange(64)
+ROWS = np.arange(8).reshape(1, 8, 1)
+
+
+def encode_boards(boards):
+    """
+    Encodes a sequence of 8x8 boards as an (N, 64) int8 array of piece codes.
+    """
+    encoded = np.zeros((len(boards), 64), dtype=np.int8)
+    for i, board in enumerate(boards):
+        encoded[i] = [CODE_OF[piece] for row in board for piece in row]
+    return encoded
+
+
+def psqt_scores(encoded):
+    """
+    Tapered material and piece-square score of every encoded board.
+    """
+    middlegame = MIDDLEGAME_BY_CODE[encoded, SQUARES].sum(axis=1)
+    endgame = ENDGAME_BY_CODE[encoded, SQUARES].sum(axis=1)
+    phase = np.minimum(PHASE_BY_CODE[encoded].sum(axis=1), MAX_PHASE)
+    return (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def _pawn_counts(pawns, enemy_pawns, white):
+    """
+    Counts (isolated, doubled, passed) pawns per board for one side, given
+    (N, 8, 8) boolean pawn masks.
+    """
+    files = pawns.sum(axis=1)  # (N, 8) pawns per file
+    doubled = np.maximum(files - 1, 0).sum(axis=1)
+    padded = np.pad(files, ((0, 0), (1, 1)))
+    neighbours = padded[:, :-2] + padded[:, 2:]
+    isolated = (files * (neighbours == 0)).sum(axis=1)
+
+    # A pawn is passed if no enemy pawn on its own or an adjacent file is
+    # further up the board than it in its direction of travel
+    if white:
+        # Most advanced blocker: the smallest enemy row per file (8 if none)
+        front = np.where(enemy_pawns, ROWS, 8).min(axis=1)
+        front = np.pad(front, ((0, 0), (1, 1)), constant_values=8)
+        front = np.minimum(np.minimum(front[:, :-2], front[:, 1:-1]), front[:, 2:])
+        passed = pawns & (front[:, None, :] >= ROWS)
+    else:
+        front = np.where(enemy_pawns, ROWS, -1).max(axis=1)
+        front = np.pad(front, ((0, 0), (1, 1)), constant_values=-1)
+        front = np.maximum(np.maximum(front[:, :-2], front[:, 1:-1]), front[:, 2:])
+        passed = pawns & (front[:, None, :] <= ROWS)
+    return isolated, doubled, passed.sum(axis=(1, 2))
+
+
+def pawn_structure_scores(encoded):
+    """
+    Isolated, doubled and passed pawn terms of every encoded board.
+    """
+    boards = encoded.reshape(-1, 8, 8)
+    white_pawns = boards == WHITE_PAWN
+    black_pawns = boards == BLACK_PAWN
+    scores = np.zeros(len(encoded), dtype=np.int32)
+    for pawns, enemy_pawns, white, sign in ((white_pawns, black_pawns, True, 1),
+                                             (black_pawns, white_pawns, False, -1)):
+        isolated, doubled, passed = _pawn_counts(pawns, enemy_pawns, white)
+        scores += sign * (PASSED_PAWN_BONUS * passed - ISOLATED_PAWN_PENALTY * isolated
+                          - DOUBLED_PAWN_PENALTY * doubled)
+    return scores
+
+
+def evaluate_encoded(encoded):
+    """
+    Static score of every encoded board from white's point of view.
+    """
+    return psqt_scores(encoded) + pawn_structure_scores(encoded)
+
+
+def evaluate_boards(boards):
+    """
+    Static scores of a sequence of 8x8 boards from white's point of view.
+    """
+    return evaluate_encoded(encode_boards(boards))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score FEN positions with the batched static evaluation.')
+    parser.add_argument('path', help="file with one FEN per line, or '-' for standard input")
+    parser.add_argument('--batch', type=int, default=16384, help='positions evaluated per batch')
+    args = parser.parse_args(argv)
+
+    def flush(boards):
+        for score in evaluate_boards(boards):
+            print(int(score))
+
+    source = sys.stdin if args.path == '-' else open(args.path)
+    boards = []
+    with source:
+        for line in source:
+            if line.strip():
+                boards.append(board_from_fen(line.strip())[0])
+                if len(boards) == args.batch:
+                    flush(boards)
+                    boards = []
+    if boards:
+        flush(boards)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,661 @@
+# bitboard.py
+#
+# Bitboard-backed alternative to the list-of-lists board used in chess_logic.
+# Squares are indexed as row * 8 + col, so bit 0 is a8 and bit 63 is h1,
+# matching the (row, col) layout of the 8x8 board.
+
+from chess_logic import (
+    ZOBRIST_PIECE_KEYS, ZOBRIST_CASTLING_KEYS, ZOBRIST_EN_PASSANT_KEYS, ZOBRIST_SIDE_KEY,
+    compute_zobrist_hash
+)
+from evaluation import PIECE_VALUES, PSQT_MIDDLEGAME, PSQT_ENDGAME, PIECE_PHASE, compute_psqt
+
+PIECES = ('wp', 'wN', 'wB', 'wR', 'wQ', 'wK',
+          'bp', 'bN', 'bB', 'bR', 'bQ', 'bK')
+PIECE_INDEX = {piece: index for index, piece in enumerate(PIECES)}
+
+# Castling rights are packed into four bits
+WHITE_KING_SIDE = 1
+WHITE_QUEEN_SIDE = 2
+BLACK_KING_SIDE = 4
+BLACK_QUEEN_SIDE = 8
+
+FILE_A = sum(1 << (row * 8) for row in range(8))
+FILE_H = FILE_A << 7
+FULL_BOARD = (1 << 64) - 1
+
+# (row, col) tuple for every square index, shared so movegen does not allocate them
+SQUARES = [divmod(sq, 8) for sq in range(64)]
+
+
+def square_index(pos):
+    """
+    Converts a (row, col) tuple to a square index.
+    """
+    return pos[0] * 8 + pos[1]
+
+
+def _leaper_attacks(offsets):
+    """
+    Builds a 64-entry attack table for a piece that jumps by fixed offsets.
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for d_row, d_col in offsets:
+            new_row, new_col = row + d_row, col + d_col
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                mask |= 1 << (new_row * 8 + new_col)
+        table.append(mask)
+    return table
+
+
+def _ray_table(d_row, d_col):
+    """
+    Builds a 64-entry table of rays running from each square (exclusive) to the board edge.
+    """
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        new_row, new_col = row + d_row, col + d_col
+        while 0 <= new_row < 8 and 0 <= new_col < 8:
+            mask |= 1 << (new_row * 8 + new_col)
+            new_row += d_row
+            new_col += d_col
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_attacks([(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                  (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _leaper_attacks([(-1, -1), (-1, 0), (-1, 1), (0, -1),
+                                (0, 1), (1, -1), (1, 0), (1, 1)])
+# PAWN_ATTACKS[color][sq] is the set of squares a pawn of that color on sq attacks
+PAWN_ATTACKS = {
+    'w': _leaper_attacks([(-1, -1), (-1, 1)]),
+    'b': _leaper_attacks([(1, -1), (1, 1)]),
+}
+
+# Each ray table is paired with whether square indices increase along it. For
+# increasing rays the nearest blocker is the lowest set bit, otherwise the highest.
+ROOK_RAYS = [
+    (_ray_table(-1, 0), False),
+    (_ray_table(1, 0), True),
+    (_ray_table(0, -1), False),
+    (_ray_table(0, 1), True),
+]
+BISHOP_RAYS = [
+    (_ray_table(-1, -1), False),
+    (_ray_table(-1, 1), False),
+    (_ray_table(1, -1), True),
+    (_ray_table(1, 1), True),
+]
+
+# Castling bits that survive a move touching each square
+CASTLING_MASK = [15] * 64
+CASTLING_MASK[60] &= ~(WHITE_KING_SIDE | WHITE_QUEEN_SIDE)  # e1
+CASTLING_MASK[63] &= ~WHITE_KING_SIDE  # h1
+CASTLING_MASK[56] &= ~WHITE_QUEEN_SIDE  # a1
+CASTLING_MASK[4] &= ~(BLACK_KING_SIDE | BLACK_QUEEN_SIDE)  # e8
+CASTLING_MASK[7] &= ~BLACK_KING_SIDE  # h8
+CASTLING_MASK[0] &= ~BLACK_QUEEN_SIDE  # a8
+
+
+def _slider_attacks(sq, occupied, rays):
+    """
+    Returns the attack set of a slider on sq, stopping each ray at its first blocker.
+    """
+    attacks = 0
+    for table, increasing in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if increasing:
+                ray ^= table[(blockers & -blockers).bit_length() - 1]
+            else:
+                ray ^= table[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+def _relevant_mask(rays, sq):
+    """
+    Returns the squares whose occupancy can change a slider's attacks from sq:
+    every ray square except the last one before the edge.
+    """
+    mask = 0
+    for table, increasing in rays:
+        ray = table[sq]
+        if ray:
+            edge = (ray & -ray) if not increasing else 1 << (ray.bit_length() - 1)
+            mask |= ray & ~edge
+    return mask
+
+
+ROOK_MASKS = [_relevant_mask(ROOK_RAYS, sq) for sq in range(64)]
+BISHOP_MASKS = [_relevant_mask(BISHOP_RAYS, sq) for sq in range(64)]
+# Attack sets per square keyed by the relevant occupancy, filled in as they are first needed
+ROOK_CACHE = [{} for _ in range(64)]
+BISHOP_CACHE = [{} for _ in range(64)]
+
+
+def rook_attacks(sq, occupied):
+    """
+    Returns the squares a rook on sq attacks given the occupancy mask.
+    """
+    key = occupied & ROOK_MASKS[sq]
+    attacks = ROOK_CACHE[sq].get(key)
+    if attacks is None:
+        attacks = ROOK_CACHE[sq][key] = _slider_attacks(sq, key, ROOK_RAYS)
+    return attacks
+
+
+def bishop_attacks(sq, occupied):
+    """
+    Returns the squares a bishop on sq attacks given the occupancy mask.
+    """
+    key = occupied & BISHOP_MASKS[sq]
+    attacks = BISHOP_CACHE[sq].get(key)
+    if attacks is None:
+        attacks = BISHOP_CACHE[sq][key] = _slider_attacks(sq, key, BISHOP_RAYS)
+    return attacks
+
+
+def iter_bits(mask):
+    """
+    Yields the square index of every set bit, lowest first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Position:
+    """
+    A chess position stored as twelve piece bitboards plus occupancy masks.
+
+    The 8x8 board is kept alongside the bitboards so piece lookups by square
+    stay O(1) and callers that read board[row][col] keep working. The search
+    reads it at nearly every node (SEE, pawn structure, piece safety), so it
+    is updated on make/unmake rather than rebuilt from the bitboards on demand;
+    the update is a couple of list stores and a small share of make/unmake.
+    """
+
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.occupancy = {'w': 0, 'b': 0}
+        self.occupied = 0
+        self.board = [['--'] * 8 for _ in range(8)]
+        self.turn = 'w'
+        self.en_passant = None  # Square index or None
+        self.castling = 0
+        self.undo_stack = []
+        self.null_moves = []
+        self.zobrist_hash = 0
+        # Running material + piece-square score (white's point of view) and game phase
+        self.psqt_mg = self.psqt_eg = self.phase = 0
+        # Optional nnue.Accumulator, kept in step with make/unmake
+        self.accumulator = None
+
+    @classmethod
+    def from_board(cls, board, turn='w', en_passant_possible=(), castling_rights=None):
+        """
+        Builds a Position from an 8x8 board and the chess_logic game state.
+        """
+        position = cls()
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != '--':
+                    position._put(piece, row * 8 + col)
+        position.turn = turn
+        if en_passant_possible:
+            position.en_passant = square_index(en_passant_possible)
+        if castling_rights is not None:
+            castling = 0
+            if castling_rights['w']['king_side'] and board[7][4] == 'wK' and board[7][7] == 'wR':
+                castling |= WHITE_KING_SIDE
+            if castling_rights['w']['queen_side'] and board[7][4] == 'wK' and board[7][0] == 'wR':
+                castling |= WHITE_QUEEN_SIDE
+            if castling_rights['b']['king_side'] and board[0][4] == 'bK' and board[0][7] == 'bR':
+                castling |= BLACK_KING_SIDE
+            if castling_rights['b']['queen_side'] and board[0][4] == 'bK' and board[0][0] == 'bR':
+                castling |= BLACK_QUEEN_SIDE
+            position.castling = castling
+        position.zobrist_hash = compute_zobrist_hash(board, turn, en_passant_possible,
+                                                     position.castling_rights)
+        position.psqt_mg, position.psqt_eg, position.phase = compute_psqt(board)
+        return position
+
+    def to_board(self):
+        """
+        Returns a copy of the position as an 8x8 list of piece strings.
+        """
+        return [row[:] for row in self.board]
+
+    @property
+    def en_passant_possible(self):
+        """
+        The en passant square in chess_logic form: a (row, col) tuple or ().
+        """
+        return SQUARES[self.en_passant] if self.en_passant is not None else ()
+
+    @property
+    def castling_rights(self):
+        """
+        The castling rights in chess_logic's nested dictionary form.
+        """
+        return {
+            'w': {'king_side': bool(self.castling & WHITE_KING_SIDE),
+                  'queen_side': bool(self.castling & WHITE_QUEEN_SIDE)},
+            'b': {'king_side': bool(self.castling & BLACK_KING_SIDE),
+                  'queen_side': bool(self.castling & BLACK_QUEEN_SIDE)}
+        }
+
+    def _put(self, piece, sq):
+        bit = 1 << sq
+        self.pieces[PIECE_INDEX[piece]] |= bit
+        self.occupancy[piece[0]] |= bit
+        self.occupied |= bit
+        self.board[sq >> 3][sq & 7] = piece
+
+    def _remove(self, piece, sq):
+        mask = ~(1 << sq)
+        self.pieces[PIECE_INDEX[piece]] &= mask
+        self.occupancy[piece[0]] &= mask
+        self.occupied &= mask
+        self.board[sq >> 3][sq & 7] = '--'
+
+    def king_square(self, color):
+        """
+        Returns the square index of the given side's king, or None if it has none.
+        """
+        kings = self.pieces[5 if color == 'w' else 11]
+        return kings.bit_length() - 1 if kings else None
+
+    def attack_maps(self):
+        """
+        Builds both sides' attack maps from the bitboards.
+        Returns {color: (attack_counts, least_attacker, mobility)} in the same form
+        as chess_logic.compute_attack_maps.
+        """
+        occupied = self.occupied
+        maps = {}
+        for color, base in (('w', 0), ('b', 6)):
+            counts = [0] * 64
+            least = [0] * 64
+            mobility = 0
+            not_own = ~self.occupancy[color]
+            for offset, piece_type in enumerate('pNBRQK'):
+                value = PIECE_VALUES[piece_type]
+                for from_sq in iter_bits(self.pieces[base + offset]):
+                    if piece_type == 'p':
+                        attacks = PAWN_ATTACKS[color][from_sq]
+                    elif piece_type == 'N':
+                        attacks = KNIGHT_ATTACKS[from_sq]
+                    elif piece_type == 'B':
+                        attacks = bishop_attacks(from_sq, occupied)
+                    elif piece_type == 'R':
+                        attacks = rook_attacks(from_sq, occupied)
+                    elif piece_type == 'Q':
+                        attacks = bishop_attacks(from_sq, occupied) | rook_attacks(from_sq, occupied)
+                    else:
+                        attacks = KING_ATTACKS[from_sq]
+                    if piece_type != 'p' and piece_type != 'K':
+                        mobility += bin(attacks & not_own).count('1')
+                    # Pieces are visited cheapest first, so the first attacker is the least valuable
+                    for sq in iter_bits(attacks):
+                        if not counts[sq]:
+                            least[sq] = value
+                        counts[sq] += 1
+            maps[color] = (counts, least, mobility)
+        return maps
+
+    def is_square_attacked(self, sq, by_color, occupied=None, captured=0):
+        """
+        Checks if any piece of by_color attacks the given square index.
+        occupied and captured describe the board after a move without making it:
+        sliders see through occupied, and pieces on captured squares are ignored.
+        """
+        base = 0 if by_color == 'w' else 6
+        pieces = self.pieces
+        if occupied is None:
+            occupied = self.occupied
+        keep = ~captured
+        if PAWN_ATTACKS['b' if by_color == 'w' else 'w'][sq] & pieces[base] & keep:
+            return True
+        if KNIGHT_ATTACKS[sq] & pieces[base + 1] & keep:
+            return True
+        if KING_ATTACKS[sq] & pieces[base + 5]:
+            return True
+        rooks = (pieces[base + 3] | pieces[base + 4]) & keep
+        if rooks and rook_attacks(sq, occupied) & rooks:
+            return True
+        bishops = (pieces[base + 2] | pieces[base + 4]) & keep
+        if bishops and bishop_attacks(sq, occupied) & bishops:
+            return True
+        return False
+
+    def in_check(self, color=None):
+        """
+        Determines if the given side (default: side to move) is in check.
+        """
+        color = color or self.turn
+        king_sq = self.king_square(color)
+        if king_sq is None:
+            return False
+        return self.is_square_attacked(king_sq, 'b' if color == 'w' else 'w')
+
+    def generate_pseudo_legal_moves(self, captures_only=False, quiets_only=False):
+        """
+        Returns (from_sq, to_sq) pairs for the side to move, ignoring checks on its own king.
+        captures_only keeps just captures (en passant included); quiets_only just the rest.
+        """
+        color = self.turn
+        enemy_color = 'b' if color == 'w' else 'w'
+        base = 0 if color == 'w' else 6
+        pieces = self.pieces
+        own = self.occupancy[color]
+        enemy = self.occupancy[enemy_color]
+        occupied = self.occupied
+        empty = ~occupied & FULL_BOARD
+        if captures_only:
+            targets = enemy
+        elif quiets_only:
+            targets = empty
+        else:
+            targets = ~own & FULL_BOARD
+        moves = []
+
+        # Pawns: pushes and captures are generated set-wise
+        pawns = pieces[base]
+        if quiets_only:
+            pawn_targets = 0
+        else:
+            pawn_targets = enemy
+        if color == 'w':
+            left = ((pawns & ~FILE_A) >> 9) & pawn_targets
+            right = ((pawns & ~FILE_H) >> 7) & pawn_targets
+            moves += [(to + 9, to) for to in iter_bits(left)]
+            moves += [(to + 7, to) for to in iter_bits(right)]
+            if not captures_only:
+                single = (pawns >> 8) & empty
+                double = ((single & (0xFF << 40)) >> 8) & empty
+                moves += [(to + 8, to) for to in iter_bits(single)]
+                moves += [(to + 16, to) for to in iter_bits(double)]
+        else:
+            left = ((pawns & ~FILE_A) << 7) & pawn_targets
+            right = ((pawns & ~FILE_H) << 9) & pawn_targets
+            moves += [(to - 7, to) for to in iter_bits(left)]
+            moves += [(to - 9, to) for to in iter_bits(right)]
+            if not captures_only:
+                single = (pawns << 8) & empty
+                double = ((single & (0xFF << 16)) << 8) & empty
+                moves += [(to - 8, to) for to in iter_bits(single)]
+                moves += [(to - 16, to) for to in iter_bits(double)]
+        if self.en_passant is not None and not quiets_only:
+            ep = self.en_passant
+            for from_sq in iter_bits(PAWN_ATTACKS[enemy_color][ep] & pawns):
+                moves.append((from_sq, ep))
+
+        for from_sq in iter_bits(pieces[base + 1]):
+            moves += [(from_sq, to) for to in iter_bits(KNIGHT_ATTACKS[from_sq] & targets)]
+        for from_sq in iter_bits(pieces[base + 2] | pieces[base + 4]):
+            moves += [(from_sq, to) for to in iter_bits(bishop_attacks(from_sq, occupied) & targets)]
+        for from_sq in iter_bits(pieces[base + 3] | pieces[base + 4]):
+            moves += [(from_sq, to) for to in iter_bits(rook_attacks(from_sq, occupied) & targets)]
+
+        king_sq = self.king_square(color)
+        if king_sq is not None:
+            moves += [(king_sq, to) for to in iter_bits(KING_ATTACKS[king_sq] & targets)]
+            if not captures_only and self.castling:
+                moves += self._castling_moves(color, enemy_color, king_sq)
+        return moves
+
+    def _castling_moves(self, color, enemy_color, king_sq):
+        """
+        Returns castling moves whose path is empty and whose king squares are not attacked.
+        """
+        if color == 'w':
+            king_side, queen_side = WHITE_KING_SIDE, WHITE_QUEEN_SIDE
+        else:
+            king_side, queen_side = BLACK_KING_SIDE, BLACK_QUEEN_SIDE
+        moves = []
+        occupied = self.occupied
+        attacked = self.is_square_attacked
+        if self.castling & king_side and not occupied & (0b11 << (king_sq + 1)):
+            if not (attacked(king_sq, enemy_color) or attacked(king_sq + 1, enemy_color)
+                    or attacked(king_sq + 2, enemy_color)):
+                moves.append((king_sq, king_sq + 2))
+        if self.castling & queen_side and not occupied & (0b111 << (king_sq - 3)):
+            if not (attacked(king_sq, enemy_color) or attacked(king_sq - 1, enemy_color)
+                    or attacked(king_sq - 2, enemy_color)):
+                moves.append((king_sq, king_sq - 2))
+        return moves
+
+    def _pinned(self, color, king_sq):
+        """
+        Returns a mask of color's pieces that are pinned to its king.
+        """
+        base = 6 if color == 'w' else 0
+        pieces = self.pieces
+        enemy = self.occupancy['b' if color == 'w' else 'w']
+        own = self.occupancy[color]
+        pinned = 0
+        # Enemy sliders seen from the king through its own pieces
+        for attacks, sliders in ((rook_attacks, pieces[base + 3] | pieces[base + 4]),
+                                 (bishop_attacks, pieces[base + 2] | pieces[base + 4])):
+            for sniper in iter_bits(attacks(king_sq, enemy) & sliders):
+                between = attacks(king_sq, 1 << sniper) & attacks(sniper, 1 << king_sq) & own
+                if between and not between & (between - 1):
+                    pinned |= between
+        return pinned
+
+    def _filter_legal(self, moves):
+        """
+        Keeps the pseudo-legal moves that don't leave the mover's king attacked.
+        Outside check only king moves, pinned pieces and en passant can do that;
+        those are tested on the occupancy after the move, without making it.
+        """
+        color = self.turn
+        king_sq = self.king_square(color)
+        if king_sq is None:
+            return moves
+        enemy_color = 'b' if color == 'w' else 'w'
+        attacked = self.is_square_attacked
+        checked = attacked(king_sq, enemy_color)
+        pinned = 0 if checked else self._pinned(color, king_sq)
+        ep = self.en_passant
+        occupied = self.occupied
+        board = self.board
+        legal = []
+        for from_sq, to_sq in moves:
+            is_ep = to_sq == ep and board[from_sq >> 3][from_sq & 7][1] == 'p'
+            if checked or from_sq == king_sq or pinned >> from_sq & 1 or is_ep:
+                captured = 1 << to_sq
+                if is_ep:
+                    captured = 1 << (to_sq + (8 if color == 'w' else -8))
+                after = (occupied & ~(1 << from_sq) & ~captured) | (1 << to_sq)
+                if attacked(to_sq if from_sq == king_sq else king_sq, enemy_color, after, captured):
+                    continue
+            legal.append((from_sq, to_sq))
+        return legal
+
+    def generate_legal_moves(self, captures_only=False, quiets_only=False):
+        """
+        Returns legal (from_sq, to_sq) pairs for the side to move.
+        """
+        return self._filter_legal(self.generate_pseudo_legal_moves(captures_only, quiets_only))
+
+    def get_all_possible_moves(self, color=None):
+        """
+        Returns all legal moves for the given side (default: side to move) as
+        ((row, col), (row, col)) pairs.
+        """
+        return [(SQUARES[from_sq], SQUARES[to_sq]) for from_sq, to_sq in self._legal_moves_for(color, False)]
+
+    def get_capture_moves(self, color=None):
+        """
+        Returns all legal captures, including en passant, as ((row, col), (row, col)) pairs.
+        """
+        return [(SQUARES[from_sq], SQUARES[to_sq]) for from_sq, to_sq in self._legal_moves_for(color, True)]
+
+    def get_quiet_moves(self, color=None):
+        """
+        Returns all legal non-captures (castling included) as ((row, col), (row, col)) pairs.
+        """
+        return [(SQUARES[from_sq], SQUARES[to_sq])
+                for from_sq, to_sq in self._legal_moves_for(color, False, True)]
+
+    def _legal_moves_for(self, color, captures_only, quiets_only=False):
+        if color is None or color == self.turn:
+            return self.generate_legal_moves(captures_only, quiets_only)
+        # Generate for the side not to move by temporarily handing it the turn
+        saved_turn = self.turn
+        self.turn = color
+        try:
+            return self.generate_legal_moves(captures_only, quiets_only)
+        finally:
+            self.turn = saved_turn
+
+    def get_valid_moves(self, pos):
+        """
+        Returns the legal destination squares for the piece at the given (row, col).
+        """
+        from_sq = square_index(pos)
+        moves = [move for move in self.generate_pseudo_legal_moves() if move[0] == from_sq]
+        return [SQUARES[to_sq] for _, to_sq in self._filter_legal(moves)]
+
+    def is_valid_move(self, start_pos, end_pos):
+        """
+        Checks if moving from start_pos to end_pos is legal for the side to move.
+        """
+        return end_pos in self.get_valid_moves(start_pos)
+
+    def make_move(self, start_pos, end_pos, promotion='Q'):
+        """
+        Plays a move given as (row, col) tuples and returns the captured piece ('--' if none).
+        """
+        return self._make(square_index(start_pos), square_index(end_pos), promotion)
+
+    def _make(self, from_sq, to_sq, promotion='Q'):
+        board = self.board
+        moved = board[from_sq >> 3][from_sq & 7]
+        color = moved[0]
+        captured = board[to_sq >> 3][to_sq & 7]
+        captured_sq = to_sq
+        if moved[1] == 'p' and to_sq == self.en_passant and captured == '--':
+            # En passant: the captured pawn sits behind the target square
+            captured_sq = to_sq + 8 if color == 'w' else to_sq - 8
+            captured = board[captured_sq >> 3][captured_sq & 7]
+        if captured != '--':
+            self._remove(captured, captured_sq)
+        self._remove(moved, from_sq)
+        placed = moved
+        if moved[1] == 'p' and (to_sq < 8 or to_sq >= 56):
+            placed = color + promotion
+        self._put(placed, to_sq)
+
+        rook_from = rook_to = None
+        if moved[1] == 'K' and abs(to_sq - from_sq) == 2:
+            if to_sq > from_sq:  # King-side castling
+                rook_from, rook_to = from_sq + 3, from_sq + 1
+            else:  # Queen-side castling
+                rook_from, rook_to = from_sq - 4, from_sq - 1
+            rook = color + 'R'
+            self._remove(rook, rook_from)
+            self._put(rook, rook_to)
+
+        self.undo_stack.append((from_sq, to_sq, moved, placed, captured, captured_sq,
+                                self.en_passant, self.castling, rook_from, rook_to,
+                                self.zobrist_hash, self.psqt_mg, self.psqt_eg, self.phase))
+
+        # Update the running piece-square score
+        middlegame = self.psqt_mg + PSQT_MIDDLEGAME[placed][to_sq] - PSQT_MIDDLEGAME[moved][from_sq]
+        endgame = self.psqt_eg + PSQT_ENDGAME[placed][to_sq] - PSQT_ENDGAME[moved][from_sq]
+        if placed != moved:
+            self.phase += PIECE_PHASE[placed]
+        if captured != '--':
+            middlegame -= PSQT_MIDDLEGAME[captured][captured_sq]
+            endgame -= PSQT_ENDGAME[captured][captured_sq]
+            self.phase -= PIECE_PHASE[captured]
+        if rook_from is not None:
+            middlegame += PSQT_MIDDLEGAME[rook][rook_to] - PSQT_MIDDLEGAME[rook][rook_from]
+            endgame += PSQT_ENDGAME[rook][rook_to] - PSQT_ENDGAME[rook][rook_from]
+        self.psqt_mg = middlegame
+        self.psqt_eg = endgame
+
+        if self.accumulator is not None:
+            removed = [(moved, from_sq)]
+            added = [(placed, to_sq)]
+            if captured != '--':
+                removed.append((captured, captured_sq))
+            if rook_from is not None:
+                removed.append((rook, rook_from))
+                added.append((rook, rook_to))
+            self.accumulator.push(self.board, removed, added)
+
+        # Update the hash with only what this move touched
+        h = self.zobrist_hash ^ ZOBRIST_SIDE_KEY
+        h ^= ZOBRIST_PIECE_KEYS[moved][from_sq] ^ ZOBRIST_PIECE_KEYS[placed][to_sq]
+        if captured != '--':
+            h ^= ZOBRIST_PIECE_KEYS[captured][captured_sq]
+        if rook_from is not None:
+            h ^= ZOBRIST_PIECE_KEYS[rook][rook_from] ^ ZOBRIST_PIECE_KEYS[rook][rook_to]
+        if self.en_passant is not None:
+            h ^= ZOBRIST_EN_PASSANT_KEYS[self.en_passant & 7]
+        if moved[1] == 'p' and abs(to_sq - from_sq) == 16:
+            self.en_passant = (from_sq + to_sq) // 2
+            h ^= ZOBRIST_EN_PASSANT_KEYS[self.en_passant & 7]
+        else:
+            self.en_passant = None
+        castling = self.castling & CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+        if castling != self.castling:
+            h ^= ZOBRIST_CASTLING_KEYS[self.castling] ^ ZOBRIST_CASTLING_KEYS[castling]
+            self.castling = castling
+        self.zobrist_hash = h
+        self.turn = 'b' if color == 'w' else 'w'
+        return captured
+
+    def unmake_move(self):
+        """
+        Restores the position to exactly what it was before the last make_move.
+        """
+        (from_sq, to_sq, moved, placed, captured, captured_sq,
+         en_passant, castling, rook_from, rook_to,
+         zobrist_hash, self.psqt_mg, self.psqt_eg, self.phase) = self.undo_stack.pop()
+        if self.accumulator is not None:
+            self.accumulator.pop()
+        self._remove(placed, to_sq)
+        self._put(moved, from_sq)
+        if captured != '--':
+            self._put(captured, captured_sq)
+        if rook_from is not None:
+            rook = moved[0] + 'R'
+            self._remove(rook, rook_to)
+            self._put(rook, rook_from)
+        self.en_passant = en_passant
+        self.castling = castling
+        self.zobrist_hash = zobrist_hash
+        self.turn = moved[0]
+
+    def make_null_move(self):
+        """
+        Passes the turn to the opponent without moving a piece.
+        """
+        self.null_moves.append((self.en_passant, self.zobrist_hash))
+        if self.en_passant is not None:
+            self.zobrist_hash ^= ZOBRIST_EN_PASSANT_KEYS[self.en_passant & 7]
+        self.zobrist_hash ^= ZOBRIST_SIDE_KEY
+        self.en_passant = None
+        self.turn = 'b' if self.turn == 'w' else 'w'
+
+    def unmake_null_move(self):
+        """
+        Reverses the last make_null_move.
+        """
+        self.en_passant, self.zobrist_hash = self.null_moves.pop()
+        self.turn = 'b' if self.turn == 'w' else 'w'
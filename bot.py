@@ -1,326 +1,716 @@
+import multiprocessing
+import os
 import random
-import copy
+import threading
 import time
-from chess_logic import (
-    get_valid_moves, make_move, in_check, copy_castling_rights
+from chess_logic import GameState, copy_castling_rights, move_to_uci, gives_check, find_king
+from bitboard import Position
+from evaluation import (
+    PIECE_VALUES, ISOLATED_PAWN_PENALTY, DOUBLED_PAWN_PENALTY, PASSED_PAWN_BONUS, tapered_score
 )
+from polyglot import OpeningBook
+from see import see_move, see_square
+from tablebase import Tablebases, WIN, LOSS, MAX_DISTANCE
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Score of being mated at the root; mates found deeper score closer to zero
+MATE_SCORE = 100000
+MAX_PLY = 128
+# Scores at least this far from zero are mates. Tablebase wins add their
+# distance to mate on top of the ply they are probed at, and table entries
+# shift scores by the ply they are stored at, so the band leaves room for both.
+MATE_BOUND = MATE_SCORE - 2 * MAX_PLY - MAX_DISTANCE
+# Half-width of the first aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+MAX_ASPIRATION_WINDOW = 1000
+# Quiet moves that caused a cutoff, remembered per ply
+MAX_KILLERS = 2
+# Nodes between checks of the clock and the stop signal
+CHECK_INTERVAL = 512
+
+# Time management. Without a clock the soft limit is a fraction of time_limit;
+# with one, the move gets its share of the remaining time plus most of the
+# increment, and the hard limit allows overrunning that share a few times.
+SOFT_LIMIT_RATIO = 0.5
+DEFAULT_MOVES_TO_GO = 30
+HARD_LIMIT_FACTOR = 4
+MAX_TIME_FRACTION = 0.5  # Never plan to use more than this much of the clock on one move
+MOVE_OVERHEAD = 0.05  # Seconds kept back for making the move
+# Stop at a fraction of the soft limit once the best move has held this many iterations
+STABLE_ITERATIONS = 4
+STABLE_SOFT_RATIO = 0.5
+# A ponder search gives up after this many times the move's soft limit, so an
+# opponent who never moves doesn't keep a core busy
+PONDER_LIMIT_FACTOR = 4
+# Positions with more phase than two queens have too many pieces to be in a tablebase
+TABLEBASE_MAX_PHASE = 8
+
+
+def score_to_table(score, ply):
+    """
+    Converts a mate score from distance-to-root to distance-to-this-node, so
+    a transposition table entry means the same thing at any ply.
+    """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    Inverse of score_to_table for an entry probed at ply.
+    """
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def _helper_search(color, use_bitboards, table_name, hash_mb, generation, board, en_passant_possible,
+                   castling_rights, move_log, start_time, time_limit, helper_id, stop_event, nnue_path=None):
+    """
+    Entry point of a Lazy SMP helper process: runs the same iterative deepening
+    as the main search, filling the shared transposition table, until the
+    time limit or until the main process signals it to stop.
+    """
+    bot = Bot(color, use_bitboards, hash_mb=0, nnue_path=nnue_path)
+    bot.transposition_table = TranspositionTable.attach(table_name, hash_mb, generation)
+    bot.start_time = start_time
+    bot.time_limit = bot.soft_limit = bot.hard_limit = time_limit
+    bot.stop_event = stop_event
+    state = bot.create_state(board, color, en_passant_possible, castling_rights, move_log)
+    try:
+        # Odd helpers start one ply deeper and every helper shuffles its root
+        # moves, so the processes spread over different parts of the tree
+        bot.search(state, start_depth=1 + helper_id % 2, shuffle_seed=helper_id)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bot.transposition_table.close()
+
 
 class Bot:
-    def __init__(self, color):
+    def __init__(self, color, use_bitboards=True, hash_mb=16, verbose=False, threads=1, book_path=None,
+                 tablebase_dir=None, nnue_path=None):
         self.color = color  # 'w' for white, 'b' for black
         self.opponent_color = 'b' if color == 'w' else 'w'
+        # Route move generation and check detection through bitboard.Position
+        self.use_bitboards = use_bitboards
+
+        # Search processes; above 1, helpers run Lazy SMP over a shared table
+        self.threads = max(1, threads)
+
+        # Fixed-size transposition table, keyed by the state's incremental Zobrist hash
+        self.transposition_table = TranspositionTable(hash_mb, shared=self.threads > 1)
 
-        # Initialize the transposition table and Zobrist keys
-        self.transposition_table = {}
-        self.zobrist_table = self.initialize_zobrist_keys()
+        # Polyglot opening book, consulted before searching
+        self.book = None
+        if book_path:
+            self.load_book(book_path)
+        # Endgame tablebases, probed at the root and inside the search
+        self.tablebases = None
+        if tablebase_dir:
+            self.load_tablebases(tablebase_dir)
 
         # Piece values
-        self.piece_values = {
-            'p': 100,
-            'N': 320,
-            'B': 330,
-            'R': 500,
-            'Q': 900,
-            'K': 20000
-        }
-
-        # Positional tables for each piece
-        self.pawn_table = [
-            [0,   0,   0,   0,   0,   0,   0,   0],
-            [50,  50,  50,  50,  50,  50,  50,  50],
-            [10,  10,  20,  30,  30,  20,  10,  10],
-            [5,   5,  10,  25,  25,  10,   5,   5],
-            [0,   0,   0,  20,  20,   0,   0,   0],
-            [5,  -5, -10,   0,   0, -10,  -5,   5],
-            [5,  10,  10, -20, -20,  10,  10,   5],
-            [0,   0,   0,   0,   0,   0,   0,   0]
-        ]
-
-        self.knight_table = [
-            [-50, -40, -30, -30, -30, -30, -40, -50],
-            [-40, -20,   0,   0,   0,   0, -20, -40],
-            [-30,   0,  10,  15,  15,  10,   0, -30],
-            [-30,   5,  15,  20,  20,  15,   5, -30],
-            [-30,   0,  15,  20,  20,  15,   0, -30],
-            [-30,   5,  10,  15,  15,  10,   5, -30],
-            [-40, -20,   0,   5,   5,   0, -20, -40],
-            [-50, -40, -30, -30, -30, -30, -40, -50]
-        ]
-
-        self.bishop_table = [
-            [-20, -10, -10, -10, -10, -10, -10, -20],
-            [-10,   0,   0,   0,   0,   0,   0, -10],
-            [-10,   0,   5,  10,  10,   5,   0, -10],
-            [-10,   5,   5,  10,  10,   5,   5, -10],
-            [-10,   0,  10,  10,  10,  10,   0, -10],
-            [-10,  10,  10,  10,  10,  10,  10, -10],
-            [-10,   5,   0,   0,   0,   0,   5, -10],
-            [-20, -10, -10, -10, -10, -10, -10, -20]
-        ]
-
-        self.rook_table = [
-            [0,   0,   0,   0,   0,   0,   0,   0],
-            [5,  10,  10,  10,  10,  10,  10,   5],
-            [-5,   0,   0,   0,   0,   0,   0,  -5],
-            [-5,   0,   0,   0,   0,   0,   0,  -5],
-            [-5,   0,   0,   0,   0,   0,   0,  -5],
-            [-5,   0,   0,   0,   0,   0,   0,  -5],
-            [-5,   0,   0,   0,   0,   0,   0,  -5],
-            [0,   0,   0,   5,   5,   0,   0,   0]
-        ]
-
-        self.queen_table = [
-            [-20, -10, -10,  -5,  -5, -10, -10, -20],
-            [-10,   0,   0,   0,   0,   0,   0, -10],
-            [-10,   0,   5,   5,   5,   5,   0, -10],
-            [ -5,   0,   5,   5,   5,   5,   0,  -5],
-            [  0,   0,   5,   5,   5,   5,   0,  -5],
-            [-10,   5,   5,   5,   5,   5,   0, -10],
-            [-10,   0,   5,   0,   0,   0,   0, -10],
-            [-20, -10, -10,  -5,  -5, -10, -10, -20]
-        ]
-
-        self.king_table = [
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-30, -40, -40, -50, -50, -40, -40, -30],
-            [-20, -30, -30, -40, -40, -30, -30, -20],
-            [-10, -20, -20, -20, -20, -20, -20, -10],
-            [20,   20,   0,   0,   0,   0,  20,  20],
-            [20,   30,  10,   0,   0,  10,  30,  20]
-        ]
-
-        # Flip tables for black pieces
-        if self.color == 'b':
-            self.pawn_table = self.pawn_table[::-1]
-            self.knight_table = self.knight_table[::-1]
-            self.bishop_table = self.bishop_table[::-1]
-            self.rook_table = self.rook_table[::-1]
-            self.queen_table = self.queen_table[::-1]
-            self.king_table = self.king_table[::-1]
+        self.piece_values = PIECE_VALUES
+
+        # NNUE network replacing the hand-written evaluation when a weights file is given
+        self.nnue_path = None
+        self.network = None
+        if nnue_path:
+            self.load_network(nnue_path)
 
         # Time management variables
-        self.time_limit = 30.0  # Time limit in seconds
+        self.time_limit = 30.0  # Time limit in seconds when no clock is given
         self.start_time = None
+        # Per-move limits set by allocate_time: no new iteration starts after the
+        # soft limit, and the search is cut off at the hard limit
+        self.soft_limit = self.time_limit * SOFT_LIMIT_RATIO
+        self.hard_limit = self.time_limit
+        # Event that stops the running search early, checked every few nodes
+        self.stop_event = None
+        self.nodes = 0
+        # Optional depth and node limits on top of the time limits (None: no limit)
+        self.max_depth = None
+        self.max_nodes = None
+
+        # Pondering: searching the predicted reply while the opponent thinks
+        self.pondering = False  # Only ponder_limit applies while True
+        self.ponder_limit = None  # Seconds after which a ponder search stops anyway (None: never)
+        self.ponder_move = None
+        self.ponder_thread = None
+        self.ponder_result = None
 
         # Variables for move ordering and search enhancements
         self.killer_moves = {}
         self.history_heuristic = {}
-        self.current_depth = 0
 
-    def initialize_zobrist_keys(self):
+        # Triangular PV table: pv_table[ply] is the best line found from that ply
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        # Results of the last search, for the UI and logging
+        self.principal_variation = []
+        self.last_score = None
+        self.last_depth = 0
+        self.verbose = verbose  # Print a line per completed iteration
+        # Called as info_callback(depth, score, principal_variation) after each iteration
+        self.info_callback = None
+
+    def load_book(self, path):
         """
-        Initializes Zobrist keys for all pieces on all squares.
-        Each piece-square combination is assigned a random 64-bit integer.
+        Opens a Polyglot opening book. Raises OSError if it can't be read.
         """
-        random.seed(0)  # Ensures reproducibility
+        book = OpeningBook(path)
+        if self.book is not None:
+            self.book.close()
+        self.book = book
 
-        zobrist_table = {}
-        pieces = ['wp', 'wN', 'wB', 'wR', 'wQ', 'wK',
-                  'bp', 'bN', 'bB', 'bR', 'bQ', 'bK']
+    def load_tablebases(self, directory):
+        """
+        Probes endgame tablebases from a directory of generated tables.
+        Raises FileNotFoundError if it doesn't exist.
+        """
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f'no tablebase directory {directory}')
+        if self.tablebases is not None:
+            self.tablebases.close()
+        self.tablebases = Tablebases(directory)
 
-        for piece in pieces:
-            for row in range(8):
-                for col in range(8):
-                    zobrist_table[(piece, row, col)] = random.getrandbits(64)
-        return zobrist_table
+    def load_network(self, path):
+        """
+        Switches evaluation to the NNUE network in a weights file. Raises
+        OSError or ValueError for an unreadable or malformed file, and
+        ImportError without NumPy.
+        """
+        # Imported here so NumPy is only loaded when a network is used
+        try:
+            from nnue import load_network
+        except ImportError as error:
+            raise ImportError('NNUE evaluation needs NumPy') from error
+        self.network = load_network(path)
+        self.nnue_path = path
+
+    def set_color(self, color):
+        """
+        Switches the side the bot plays, keeping its tables and settings.
+        """
+        self.color = color
+        self.opponent_color = 'b' if color == 'w' else 'w'
 
-    def compute_zobrist_hash(self, board):
+    def create_state(self, board, turn, en_passant_possible, castling_rights, move_log=None):
         """
-        Computes the Zobrist hash for the given board state.
+        Builds the mutable search state the bot plays moves on.
+        The caller's board is copied once so the search never touches it.
         """
-        h = 0  # Initialize hash value
-        for row in range(8):
-            for col in range(8):
-                piece = board[row][col]
-                if piece != '--':
-                    h ^= self.zobrist_table[(piece, row, col)]
-        return h
+        if self.use_bitboards:
+            state = Position.from_board(board, turn, en_passant_possible, castling_rights)
+        else:
+            castling_rights_copy = copy_castling_rights(castling_rights)
+            move_log_copy = list(move_log) if move_log is not None else []
+            state = GameState([row[:] for row in board], turn, en_passant_possible,
+                              castling_rights_copy, move_log_copy)
+        if self.network is not None:
+            from nnue import Accumulator
+            state.accumulator = Accumulator(self.network, state.board)
+        return state
+
+    def close(self):
+        """
+        Frees the transposition table's shared memory, if it has any, and closes
+        the book and tablebase files.
+        """
+        self.transposition_table.close()
+        if self.book is not None:
+            self.book.close()
+        if self.tablebases is not None:
+            self.tablebases.close()
+
+    def get_move(self, board, en_passant_possible, castling_rights, move_log,
+                 time_left=None, increment=0.0, moves_to_go=None):
+        """
+        Searches the position for the bot's side and returns its move, or None
+        if it has no legal moves. time_left, increment and moves_to_go describe
+        the bot's clock in seconds; without them each move gets time_limit.
+        """
+        self.stop_ponder()
+        book_move = self.probe_book(board, en_passant_possible, castling_rights)
+        if book_move is not None:
+            return book_move
+        self.start_time = time.time()
+        self.allocate_time(time_left, increment, moves_to_go)
+        # Lets another thread end the search early through cancel()
+        self.stop_event = threading.Event()
+        self.transposition_table.new_search()
+
+        state = self.create_state(board, self.color, en_passant_possible, castling_rights, move_log)
+        tablebase_move = self.probe_tablebase_root(state)
+        if tablebase_move is not None:
+            return tablebase_move
+        helpers = []
+        if self.threads > 1 and state.get_all_possible_moves():
+            helpers = self.start_helpers(board, en_passant_possible, castling_rights, move_log)
+        try:
+            return self.search(state)
+        finally:
+            self.stop_helpers(helpers)
+            self.stop_event = None
+
+    def probe_book(self, board, en_passant_possible, castling_rights):
+        """
+        Returns a legal move from the opening book for the position, or None.
+        """
+        if self.book is None:
+            return None
+        entry = self.book.choose_move(board, self.color, en_passant_possible, castling_rights)
+        if entry is None:
+            return None
+        move, _ = entry  # Promotions in the opening are always to a queen here
+        state = self.create_state(board, self.color, en_passant_possible, castling_rights)
+        if not state.is_valid_move(*move):
+            return None  # Corrupt entry or key collision
+        self.principal_variation = [move]
+        self.last_score, self.last_depth = None, 0
+        return move
+
+    def probe_tablebase(self, state, ply):
+        """
+        Returns the tablebase score of the position for the side to move, or
+        None if it isn't covered. Wins score like mates found by the search.
+        """
+        if self.tablebases is None or state.phase > TABLEBASE_MAX_PHASE:
+            return None
+        entry = self.tablebases.probe(state.board, state.turn, state.en_passant_possible, state.castling_rights)
+        if entry is None:
+            return None
+        result, distance = entry
+        if result == WIN:
+            return MATE_SCORE - ply - distance
+        if result == LOSS:
+            return -MATE_SCORE + ply + distance
+        return 0
+
+    def probe_tablebase_root(self, state):
+        """
+        Picks the move that keeps the best tablebase result: the fastest win,
+        any draw, or the longest resistance. Returns None if the position or
+        one of its successors isn't covered.
+        """
+        if self.tablebases is None or self.probe_tablebase(state, 0) is None:
+            return None
+        best_move, best_score = None, None
+        for move in state.get_all_possible_moves():
+            state.make_move(*move)
+            score = self.probe_tablebase(state, 1)
+            state.unmake_move()
+            if score is None:
+                return None
+            if best_score is None or -score > best_score:
+                best_move, best_score = move, -score
+        if best_move is not None:
+            self.principal_variation = [best_move]
+            self.last_score, self.last_depth = best_score, 0
+        return best_move
+
+    def allocate_time(self, time_left=None, increment=0.0, moves_to_go=None):
+        """
+        Sets the soft and hard limits, in seconds from the start of the search,
+        for a move played with the given clock (or with the fixed time_limit).
+        """
+        if time_left is None:
+            self.hard_limit = self.time_limit
+            self.soft_limit = self.time_limit * SOFT_LIMIT_RATIO
+            return
+        available = max(0.0, time_left - MOVE_OVERHEAD)
+        moves = moves_to_go if moves_to_go else DEFAULT_MOVES_TO_GO
+        soft = available / moves + increment * 0.75
+        hard = min(soft * HARD_LIMIT_FACTOR, available * MAX_TIME_FRACTION if moves > 1 else available)
+        self.hard_limit = max(hard, 0.01)
+        self.soft_limit = min(soft, self.hard_limit)
+
+    def cancel(self):
+        """
+        Asks a search running in another thread (get_move or a ponder search) to
+        stop as soon as possible; get_move then returns the best move so far.
+        """
+        stop_event = self.stop_event
+        if stop_event is not None:
+            stop_event.set()
 
-    def get_move(self, board, en_passant_possible, castling_rights, move_log):
+    def start_helpers(self, board, en_passant_possible, castling_rights, move_log):
+        """
+        Starts threads - 1 helper processes searching the same position into the
+        shared transposition table. Returns (processes, stop_event).
+        """
+        stop_event = multiprocessing.Event()
+        table = self.transposition_table
+        processes = []
+        for helper_id in range(1, self.threads):
+            process = multiprocessing.Process(
+                target=_helper_search,
+                args=(self.color, self.use_bitboards, table.name, table.size_mb, table.generation, board,
+                      en_passant_possible, castling_rights, list(move_log or []), self.start_time,
+                      self.hard_limit, helper_id, stop_event, self.nnue_path),
+                daemon=True)
+            process.start()
+            processes.append(process)
+        return processes, stop_event
+
+    def stop_helpers(self, helpers):
+        """
+        Signals the helper processes to stop and waits for them to exit.
+        """
+        if not helpers:
+            return
+        processes, stop_event = helpers
+        stop_event.set()
+        for process in processes:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def start_ponder(self, board, en_passant_possible, castling_rights, move_log, predicted_move,
+                     time_left=None, increment=0.0, moves_to_go=None):
+        """
+        Starts searching, in a background thread, the position after the opponent
+        plays predicted_move (normally the second move of the principal variation).
+        The board is the one after the bot's own move and is copied. The search
+        stops after PONDER_LIMIT_FACTOR times the soft limit for the given clock
+        and keeps its result until ponder_hit or stop_ponder.
+        """
+        self.stop_ponder()
+        state = self.create_state(board, self.opponent_color, en_passant_possible, castling_rights, move_log)
+        if not state.is_valid_move(*predicted_move):
+            return
+        state.make_move(*predicted_move)
+        self.ponder_move = predicted_move
+        self.ponder_result = None
+        self.pondering = True
+        self.stop_event = threading.Event()
         self.start_time = time.time()
+        self.allocate_time(time_left, increment, moves_to_go)
+        self.ponder_limit = self.soft_limit * PONDER_LIMIT_FACTOR
+        self.transposition_table.new_search()
+        self.ponder_thread = threading.Thread(target=self._ponder, args=(state,), daemon=True)
+        self.ponder_thread.start()
+
+    def _ponder(self, state):
+        self.ponder_result = self.search(state)
+
+    def ponder_hit(self, time_left=None, increment=0.0, moves_to_go=None):
+        """
+        Called when the opponent played the predicted move. The ponder search
+        becomes the real search, with the time it has already spent counted
+        against the limits for the given clock, and its move is returned once
+        it finishes.
+        """
+        self.allocate_time(time_left, increment, moves_to_go)
+        self.pondering = False
+        self.ponder_thread.join()
+        move = self.ponder_result
+        self.end_ponder()
+        return move
+
+    def stop_ponder(self):
+        """
+        Abandons a ponder search after a different reply was played. The entries
+        it stored in the transposition table are kept.
+        """
+        if self.ponder_thread is None:
+            return
+        self.stop_event.set()
+        self.ponder_thread.join()
+        self.end_ponder()
+
+    def end_ponder(self):
+        """
+        Clears the ponder search's state once its thread has finished.
+        """
+        self.pondering = False
+        self.ponder_limit = None
+        self.ponder_move = None
+        self.ponder_thread = None
+        self.stop_event = None
+
+    def search(self, state, start_depth=1, shuffle_seed=None):
+        """
+        Runs iterative deepening on the state until the time limit and returns
+        the best move, or None if there are no legal moves.
+        """
+        self.quiescence_depth = 0
+        self.nodes = 0
         best_move = None
-        max_depth = 1
-        time_remaining = True
+        best_score = None
+        max_depth = start_depth
 
         # Generate all possible moves for the bot
-        all_moves = self.get_all_possible_moves(board, self.color, en_passant_possible, castling_rights)
+        all_moves = state.get_all_possible_moves()
         if not all_moves:
             return None  # No legal moves
+        if len(all_moves) == 1 and not self.pondering:
+            self.principal_variation = list(all_moves)
+            return all_moves[0]  # Nothing to think about
+
+        # Move ordering: prioritize captures and checks, then reuse the scores
+        # each iteration gives the root moves
+        ordered_moves = self.order_moves(all_moves, state)
+        if shuffle_seed is not None:
+            random.Random(shuffle_seed).shuffle(ordered_moves)
+        self.root_scores = {}
+        self.principal_variation = []
+        # Iterations the best move has survived, and the time the last two took
+        stable_iterations = 0
+        iteration_start = time.time()
+        last_iteration_time = previous_iteration_time = 0.0
 
         # Iterative deepening loop
-        while time_remaining:
+        last_depth = min(MAX_PLY, self.max_depth or MAX_PLY)
+        while max_depth <= last_depth:
             try:
-                best_evaluation = float('-inf')
-                # Move ordering: prioritize captures and checks
-                ordered_moves = self.order_moves(all_moves, board, self.color, en_passant_possible, castling_rights)
-                for move in ordered_moves:
-                    self.check_time()
-                    start_pos, end_pos = move
-                    # Copy the game state
-                    board_copy = copy.deepcopy(board)
-                    en_passant_copy = copy.deepcopy(en_passant_possible)
-                    castling_rights_copy = copy_castling_rights(castling_rights)
-                    move_log_copy = move_log.copy()
-                    # Make the move
-                    captured_piece, new_en_passant_possible, new_castling_rights = make_move(
-                        board_copy, start_pos, end_pos, en_passant_copy, castling_rights_copy, move_log_copy
-                    )
-                    self.current_depth = 1
-                    evaluation = self.minimax(
-                        max_depth - 1, board_copy, float('-inf'), float('inf'), False, self.opponent_color,
-                        new_en_passant_possible, new_castling_rights, move_log_copy
-                    )
-                    if evaluation > best_evaluation:
-                        best_evaluation = evaluation
-                        best_move = move
+                # Search a narrow window around the last score, widening it on a fail
+                delta = ASPIRATION_WINDOW
+                if best_score is None or abs(best_score) >= MATE_BOUND:
+                    alpha, beta = float('-inf'), float('inf')
+                else:
+                    alpha, beta = best_score - delta, best_score + delta
+                while True:
+                    score, move = self.search_root(max_depth, state, ordered_moves, alpha, beta)
+                    if score <= alpha:
+                        delta *= 2
+                        alpha = score - delta if delta < MAX_ASPIRATION_WINDOW else float('-inf')
+                    elif score >= beta:
+                        delta *= 2
+                        beta = score + delta if delta < MAX_ASPIRATION_WINDOW else float('inf')
+                    else:
+                        break
+                stable_iterations = stable_iterations + 1 if move == best_move else 0
+                best_score, best_move = score, move
+                self.last_score, self.last_depth = score, max_depth
+                self.principal_variation = list(self.pv_table[0])
+                if self.verbose:
+                    self.log_iteration()
+                if self.info_callback is not None:
+                    self.info_callback(max_depth, score, self.principal_variation)
+                # Search the best move first, then the rest by last iteration's score
+                ordered_moves.sort(key=lambda m: (m != move, -self.root_scores.get(m, float('-inf'))))
                 max_depth += 1
             except TimeoutError:
+                # Keep a better move found before the interrupted iteration ran out
+                if self.iteration_best is not None and self.iteration_best[1] != best_move:
+                    best_score, best_move = self.iteration_best
+                    self.last_score = best_score
+                    self.principal_variation = list(self.iteration_pv)
                 break  # Time limit exceeded
-            # Check if time limit is close
-            if time.time() - self.start_time >= self.time_limit:
-                time_remaining = False
-
+            now = time.time()
+            previous_iteration_time, last_iteration_time = last_iteration_time, now - iteration_start
+            iteration_start = now
+            if not self.pondering and self.out_of_time(stable_iterations, last_iteration_time,
+                                                       previous_iteration_time):
+                break
+
+        # Fall back to the best-ordered move if not even depth 1 finished
+        if best_move is None:
+            best_move = ordered_moves[0]
+            self.principal_variation = [best_move]
         return best_move
 
+    def out_of_time(self, stable_iterations, last_iteration_time, previous_iteration_time):
+        """
+        Decides after a completed iteration whether to stop deepening: past the
+        soft limit (reduced once the best move is stable), or when the next
+        iteration, predicted from the effective branching factor of the last
+        two, could not finish before the hard limit.
+        """
+        elapsed = time.time() - self.start_time
+        soft_limit = self.soft_limit
+        if stable_iterations >= STABLE_ITERATIONS:
+            soft_limit *= STABLE_SOFT_RATIO
+        if elapsed >= soft_limit:
+            return True
+        if previous_iteration_time > 0.001:
+            branching_factor = min(max(last_iteration_time / previous_iteration_time, 1.5), 10.0)
+        else:
+            branching_factor = 4.0
+        return elapsed + last_iteration_time * branching_factor > self.hard_limit
+
+    def log_iteration(self):
+        """
+        Prints the depth, score, elapsed time and principal variation of the last iteration.
+        """
+        elapsed = time.time() - self.start_time
+        pv = ' '.join(move_to_uci(move) for move in self.principal_variation)
+        print(f'depth {self.last_depth} score {self.last_score} time {elapsed:.2f} pv {pv}')
+
     def check_time(self):
         """
-        Checks if the time limit has been exceeded.
-        Raises a TimeoutError if time is up.
+        Counts a node and, every CHECK_INTERVAL nodes, checks the hard time limit
+        (or the ponder limit while pondering).
+        Raises a TimeoutError if time or the node limit is up, or if the search
+        has been told to stop (cancel(), a finished ponder search, or a helper's
+        stop signal).
         """
-        if time.time() - self.start_time >= self.time_limit:
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise TimeoutError
+        if self.nodes % CHECK_INTERVAL:
+            return
+        if self.pondering:
+            if self.ponder_limit is not None and time.time() - self.start_time >= self.ponder_limit:
+                raise TimeoutError
+        elif time.time() - self.start_time >= self.hard_limit:
+            raise TimeoutError
+        if self.stop_event is not None and self.stop_event.is_set():
             raise TimeoutError
 
-    def minimax(self, depth, board, alpha, beta, maximizing_player, turn,
-                en_passant_possible, castling_rights, move_log):
+    def search_root(self, depth, state, moves, alpha, beta):
+        """
+        Searches the root moves with principal variation search.
+        Returns (score, move) for the best move found inside the window.
+        """
+        best_score = float('-inf')
+        best_move = moves[0]
+        # Best move of this pass that beat the window, kept if time runs out
+        self.iteration_best = None
+        self.pv_table[0] = []
+        for index, move in enumerate(moves):
+            self.check_time()
+            start_pos, end_pos = move
+            state.make_move(start_pos, end_pos)
+            if index == 0:
+                score = -self.negamax(depth - 1, state, -beta, -alpha, 1)
+            else:
+                score = -self.negamax(depth - 1, state, -alpha - 1, -alpha, 1)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, state, -beta, -alpha, 1)
+            state.unmake_move()
+            self.root_scores[move] = score
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                self.pv_table[0] = [move] + self.pv_table[1]
+                self.iteration_best = (score, move)
+                self.iteration_pv = self.pv_table[0]
+            if alpha >= beta:
+                break
+        return best_score, best_move
+
+    def negamax(self, depth, state, alpha, beta, ply, allow_null=True):
+        """
+        Principal variation search from the point of view of the side to move.
+        The first move gets the full window; the rest are searched with a null
+        window and only re-searched when they land inside (alpha, beta).
+        """
         self.check_time()
-        self.current_depth += 1
+        self.pv_table[ply] = []
         alpha_original = alpha
-        beta_original = beta
-        # Compute the hash for the current board
-        board_hash = self.compute_zobrist_hash(board)
+        # The state keeps its Zobrist hash up to date through make/unmake
+        board_hash = state.zobrist_hash
         # Check if the position is in the transposition table
-        if board_hash in self.transposition_table:
-            entry = self.transposition_table[board_hash]
-            if entry['depth'] >= depth:
-                if entry['flag'] == 'exact':
-                    return entry['value']
-                elif entry['flag'] == 'lowerbound':
-                    alpha = max(alpha, entry['value'])
-                elif entry['flag'] == 'upperbound':
-                    beta = min(beta, entry['value'])
+        entry = self.transposition_table.probe(board_hash)
+        hash_move = None
+        if entry is not None:
+            value, entry_depth, flag, hash_move = entry
+            value = score_from_table(value, ply)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                elif flag == LOWER_BOUND:
+                    alpha = max(alpha, value)
+                elif flag == UPPER_BOUND:
+                    beta = min(beta, value)
                 if alpha >= beta:
-                    return entry['value']
+                    return value
+
+        # Positions in the tablebases are solved exactly
+        if ply > 0:
+            tablebase_score = self.probe_tablebase(state, ply)
+            if tablebase_score is not None:
+                return tablebase_score
 
-        if depth == 0:
-            eval = self.quiescence_search(alpha, beta, board, turn, en_passant_possible, castling_rights)
-            # Store in transposition table
-            self.transposition_table[board_hash] = {'value': eval, 'depth': depth, 'flag': 'exact'}
+        if depth <= 0 or ply >= MAX_PLY:
+            eval = self.quiescence_search(alpha, beta, state)
+            self.store_result(board_hash, 0, ply, eval, alpha_original, beta)
             return eval
 
-        all_moves = self.get_all_possible_moves(board, turn, en_passant_possible, castling_rights)
-        if not all_moves:
-            if in_check(board, turn):
-                return float('-inf') if maximizing_player else float('inf')
+        in_check = state.in_check()
+
+        # Null Move Pruning: if passing still fails high, a real move will too.
+        # Skipped in check and in pawn endings, where zugzwang is common.
+        if allow_null and depth >= 3 and not in_check and state.phase > 0:
+            self.check_time()
+            state.make_null_move()
+            null_eval = -self.negamax(depth - 1 - 2, state, -beta, -beta + 1, ply + 1, False)
+            state.unmake_null_move()
+            if null_eval >= beta:
+                return beta
+
+        # Moves come from the staged picker, so a cutoff skips generating the rest
+        best_score = float('-inf')
+        best_move = None
+        index = -1
+        for index, move in enumerate(self.pick_moves(state, hash_move, ply)):
+            self.check_time()
+            start_pos, end_pos = move
+            # Make the move on the shared board; every normal exit below unmakes it,
+            # while a timeout abandons the state (search discards it)
+            state.make_move(start_pos, end_pos)
+            if index == 0:
+                score = -self.negamax(depth - 1, state, -beta, -alpha, ply + 1)
             else:
-                return 0  # Stalemate
-
-        # Move ordering
-        ordered_moves = self.order_moves(all_moves, board, turn, en_passant_possible, castling_rights)
-
-        if maximizing_player:
-            max_eval = float('-inf')
-            for move in ordered_moves:
-                self.check_time()
-                start_pos, end_pos = move
-                # Copy the game state
-                board_copy = copy.deepcopy(board)
-                en_passant_copy = copy.deepcopy(en_passant_possible)
-                castling_rights_copy = copy_castling_rights(castling_rights)
-                move_log_copy = move_log.copy()
-                # Make the move
-                captured_piece, new_en_passant_possible, new_castling_rights = make_move(
-                    board_copy, start_pos, end_pos, en_passant_copy, castling_rights_copy, move_log_copy
-                )
-
-                # Null Move Pruning
-                if depth >= 3 and not in_check(board_copy, self.opponent_color):
-                    self.check_time()
-                    null_eval = -self.minimax(depth - 1 - 2, board_copy, -beta, -beta + 1, False, turn,
-                                              en_passant_copy, castling_rights_copy, move_log_copy)
-                    if null_eval >= beta:
-                        return beta
-
-                eval = self.minimax(
-                    depth - 1, board_copy, alpha, beta, False, self.opponent_color,
-                    new_en_passant_possible, new_castling_rights, move_log_copy
-                )
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
-                if alpha >= beta:
-                    # Beta cutoff
-                    # Killer moves and history heuristic
-                    self.killer_moves.setdefault(depth, []).append(move)
+                score = -self.negamax(depth - 1, state, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self.negamax(depth - 1, state, -beta, -alpha, ply + 1)
+            state.unmake_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                # Beta cutoff
+                # Killer moves and history heuristic
+                if self.is_quiet(state, move):
+                    killers = self.killer_moves.setdefault(ply, [])
+                    if move not in killers:
+                        killers.insert(0, move)
+                        del killers[MAX_KILLERS:]
                     self.history_heuristic[move] = self.history_heuristic.get(move, 0) + depth * depth
-                    break
-            # Store in transposition table
-            if max_eval <= alpha_original:
-                flag = 'upperbound'
-            elif max_eval >= beta_original:
-                flag = 'lowerbound'
-            else:
-                flag = 'exact'
-            self.transposition_table[board_hash] = {'value': max_eval, 'depth': depth, 'flag': flag}
-            return max_eval
+                break
+
+        if index < 0:
+            # No legal moves
+            if in_check:
+                return -MATE_SCORE + ply  # Prefer the quickest mate
+            return 0  # Stalemate
+
+        self.store_result(board_hash, depth, ply, best_score, alpha_original, beta, best_move)
+        return best_score
+
+    def store_result(self, board_hash, depth, ply, score, alpha, beta, move=None):
+        """
+        Stores a search score and best move with the bound implied by the window
+        it was searched with. Mate scores are stored relative to this node.
+        """
+        if score <= alpha:
+            flag = UPPER_BOUND
+        elif score >= beta:
+            flag = LOWER_BOUND
         else:
-            min_eval = float('inf')
-            for move in ordered_moves:
-                self.check_time()
-                start_pos, end_pos = move
-                # Copy the game state
-                board_copy = copy.deepcopy(board)
-                en_passant_copy = copy.deepcopy(en_passant_possible)
-                castling_rights_copy = copy_castling_rights(castling_rights)
-                move_log_copy = move_log.copy()
-                # Make the move
-                captured_piece, new_en_passant_possible, new_castling_rights = make_move(
-                    board_copy, start_pos, end_pos, en_passant_copy, castling_rights_copy, move_log_copy
-                )
-
-                # Null Move Pruning
-                if depth >= 3 and not in_check(board_copy, self.color):
-                    self.check_time()
-                    null_eval = -self.minimax(depth - 1 - 2, board_copy, -beta, -beta + 1, True, turn,
-                                              en_passant_copy, castling_rights_copy, move_log_copy)
-                    if null_eval <= alpha:
-                        return alpha
-
-                eval = self.minimax(
-                    depth - 1, board_copy, alpha, beta, True, self.color,
-                    new_en_passant_possible, new_castling_rights, move_log_copy
-                )
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    # Alpha cutoff
-                    # Killer moves and history heuristic
-                    self.killer_moves.setdefault(depth, []).append(move)
-                    self.history_heuristic[move] = self.history_heuristic.get(move, 0) + depth * depth
-                    break
-            # Store in transposition table
-            if min_eval <= alpha_original:
-                flag = 'upperbound'
-            elif min_eval >= beta_original:
-                flag = 'lowerbound'
-            else:
-                flag = 'exact'
-            self.transposition_table[board_hash] = {'value': min_eval, 'depth': depth, 'flag': flag}
-            return min_eval
+            flag = EXACT
+        self.transposition_table.store(board_hash, depth, flag, score_to_table(score, ply), move)
 
-    def quiescence_search(self, alpha, beta, board, turn, en_passant_possible, castling_rights):
+    def quiescence_search(self, alpha, beta, state):
         self.check_time()
-        stand_pat = self.evaluate_board(board, en_passant_possible, castling_rights)
+        # evaluate_board scores for the bot; quiescence scores for the side to move
+        stand_pat = self.evaluate_board(state)
+        if state.turn != self.color:
+            stand_pat = -stand_pat
         if stand_pat >= beta:
             return beta
         if alpha < stand_pat:
@@ -332,26 +722,23 @@ class Bot:
             return stand_pat
 
         # Generate capture moves
-        capture_moves = self.get_capture_moves(board, turn, en_passant_possible, castling_rights)
+        capture_moves = state.get_capture_moves()
         if not capture_moves:
             return stand_pat
 
-        # Move ordering can be applied here as well
-        for move in capture_moves:
+        # Drop captures that lose material once all recaptures are played out,
+        # and try the most profitable ones first
+        board = state.board
+        scored_captures = [(see_move(board, move), move) for move in capture_moves]
+        scored_captures = [item for item in scored_captures if item[0] >= 0]
+        scored_captures.sort(key=lambda item: -item[0])
+        for _, move in scored_captures:
             self.check_time()
             self.quiescence_depth = getattr(self, 'quiescence_depth', 0) + 1
             start_pos, end_pos = move
-            # Copy the game state
-            board_copy = copy.deepcopy(board)
-            en_passant_copy = copy.deepcopy(en_passant_possible)
-            castling_rights_copy = copy_castling_rights(castling_rights)
-            move_log_copy = []
-            # Make the move
-            captured_piece, new_en_passant_possible, new_castling_rights = make_move(
-                board_copy, start_pos, end_pos, en_passant_copy, castling_rights_copy, move_log_copy
-            )
-            score = -self.quiescence_search(-beta, -alpha, board_copy, self.opponent_color,
-                                            new_en_passant_possible, new_castling_rights)
+            state.make_move(start_pos, end_pos)
+            score = -self.quiescence_search(-beta, -alpha, state)
+            state.unmake_move()
             self.quiescence_depth -= 1
             if score >= beta:
                 return beta
@@ -359,57 +746,39 @@ class Bot:
                 alpha = score
         return alpha
 
-    def evaluate_board(self, board, en_passant_possible, castling_rights):
-        evaluation = 0
-        # Material and positional evaluation
-        for row in range(8):
-            for col in range(8):
-                piece = board[row][col]
-                if piece != '--':
-                    piece_type = piece[1]
-                    color = piece[0]
-                    value = self.piece_values.get(piece_type, 0)
-                    # Positional value
-                    if piece_type == 'p':
-                        positional_value = self.pawn_table[row][col]
-                    elif piece_type == 'N':
-                        positional_value = self.knight_table[row][col]
-                    elif piece_type == 'B':
-                        positional_value = self.bishop_table[row][col]
-                    elif piece_type == 'R':
-                        positional_value = self.rook_table[row][col]
-                    elif piece_type == 'Q':
-                        positional_value = self.queen_table[row][col]
-                    elif piece_type == 'K':
-                        positional_value = self.king_table[row][col]
-                    else:
-                        positional_value = 0
+    def evaluate_board(self, state):
+        if self.network is not None:
+            evaluation = state.accumulator.evaluate(state.turn)
+            return evaluation if state.turn == self.color else -evaluation
+        board = state.board
+        # Material and positional evaluation, kept up to date by make/unmake
+        evaluation = tapered_score(state.psqt_mg, state.psqt_eg, state.phase)
+        if self.color == 'b':
+            evaluation = -evaluation
 
-                    if color == self.color:
-                        evaluation += value + positional_value
-                    else:
-                        evaluation -= value + positional_value
+        # One attack-map pass feeds mobility, coordination and piece safety
+        attack_maps = state.attack_maps()
 
         # Mobility
-        my_mobility = len(self.get_all_possible_moves(board, self.color, en_passant_possible, castling_rights))
-        opp_mobility = len(self.get_all_possible_moves(board, self.opponent_color, en_passant_possible, castling_rights))
+        my_mobility = attack_maps[self.color][2]
+        opp_mobility = attack_maps[self.opponent_color][2]
         evaluation += 10 * (my_mobility - opp_mobility)
 
         # King Safety
-        evaluation += self.evaluate_king_safety(board, en_passant_possible, castling_rights)
+        evaluation += self.evaluate_king_safety(state)
 
         # Pawn Structure
         evaluation += self.evaluate_pawn_structure(board)
 
         # Piece Coordination
-        evaluation += self.evaluate_piece_coordination(board)
+        evaluation += self.evaluate_piece_coordination(board, attack_maps)
 
         # Piece Safety
-        evaluation += self.evaluate_piece_safety(board, en_passant_possible, castling_rights)
+        evaluation += self.evaluate_piece_safety(board, attack_maps)
 
         return evaluation
 
-    def evaluate_king_safety(self, board, en_passant_possible, castling_rights):
+    def evaluate_king_safety(self, state):
         evaluation = 0
         # Implement a simple king safety evaluation
         # For example, penalize if the king is exposed
@@ -429,16 +798,16 @@ class Bot:
                     opp_pawns.append((row, col))
 
         # Evaluate isolated pawns
-        evaluation -= 20 * self.count_isolated_pawns(my_pawns)
-        evaluation += 20 * self.count_isolated_pawns(opp_pawns)
+        evaluation -= ISOLATED_PAWN_PENALTY * self.count_isolated_pawns(my_pawns)
+        evaluation += ISOLATED_PAWN_PENALTY * self.count_isolated_pawns(opp_pawns)
 
         # Evaluate doubled pawns
-        evaluation -= 15 * self.count_doubled_pawns(my_pawns)
-        evaluation += 15 * self.count_doubled_pawns(opp_pawns)
+        evaluation -= DOUBLED_PAWN_PENALTY * self.count_doubled_pawns(my_pawns)
+        evaluation += DOUBLED_PAWN_PENALTY * self.count_doubled_pawns(opp_pawns)
 
         # Evaluate passed pawns
-        evaluation += 30 * self.count_passed_pawns(my_pawns, opp_pawns)
-        evaluation -= 30 * self.count_passed_pawns(opp_pawns, my_pawns)
+        evaluation += PASSED_PAWN_BONUS * self.count_passed_pawns(my_pawns, opp_pawns, self.color)
+        evaluation -= PASSED_PAWN_BONUS * self.count_passed_pawns(opp_pawns, my_pawns, self.opponent_color)
 
         return evaluation
 
@@ -459,7 +828,8 @@ class Bot:
         doubled_pawns = sum(count - 1 for count in file_counts.values() if count > 1)
         return doubled_pawns
 
-    def count_passed_pawns(self, my_pawns, opp_pawns):
+    def count_passed_pawns(self, my_pawns, opp_pawns, color):
+        # color owns my_pawns and sets the direction they advance in
         passed_pawns = 0
         for pawn in my_pawns:
             row, col = pawn
@@ -467,142 +837,148 @@ class Bot:
             for opp_pawn in opp_pawns:
                 opp_row, opp_col = opp_pawn
                 if opp_col in [col - 1, col, col + 1]:
-                    if (self.color == 'w' and opp_row < row) or (self.color == 'b' and opp_row > row):
+                    if (color == 'w' and opp_row < row) or (color == 'b' and opp_row > row):
                         is_passed = False
                         break
             if is_passed:
                 passed_pawns += 1
         return passed_pawns
 
-    def evaluate_piece_coordination(self, board):
+    def evaluate_piece_coordination(self, board, attack_maps):
         evaluation = 0
-        # Implement a simple piece coordination evaluation
-        # For example, encourage pieces that protect each other
+        # Encourage pieces that protect each other
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != '--' and piece[1] != 'K' and attack_maps[piece[0]][0][row * 8 + col]:
+                    evaluation += 5 if piece[0] == self.color else -5
         return evaluation
 
-    def evaluate_piece_safety(self, board, en_passant_possible, castling_rights):
+    def evaluate_piece_safety(self, board, attack_maps):
         evaluation = 0
-
-        # Get all possible opponent moves to see which of our pieces are under attack
-        opp_moves = self.get_all_possible_moves(board, self.opponent_color, en_passant_possible, castling_rights)
-        opp_attack_squares = set(move[1] for move in opp_moves)
-
-        # Get all possible our moves to see which of opponent's pieces are under attack
-        my_moves = self.get_all_possible_moves(board, self.color, en_passant_possible, castling_rights)
-        my_attack_squares = set(move[1] for move in my_moves)
-
-        # Evaluate the safety of our pieces
+        # A piece is hanging when the opponent wins material by starting an
+        # exchange on its square
         for row in range(8):
             for col in range(8):
                 piece = board[row][col]
-                if piece != '--':
-                    piece_type = piece[1]
-                    color = piece[0]
-                    position = (row, col)
-                    value = self.piece_values.get(piece_type, 0)
-
+                if piece == '--' or piece[1] == 'K':
+                    continue
+                color = piece[0]
+                enemy_color = 'b' if color == 'w' else 'w'
+                sq = row * 8 + col
+                attackers = attack_maps[enemy_color][0][sq]
+                if not attackers:
+                    continue
+                gain = see_square(board, (row, col), enemy_color)
+                if gain > 0:
+                    # Penalize our hanging pieces, reward the opponent's
                     if color == self.color:
-                        if position in opp_attack_squares:
-                            # Check if the piece is defended
-                            defenders = self.get_defenders(board, position, self.color, en_passant_possible, castling_rights)
-                            attackers = self.get_attackers(board, position, self.opponent_color, en_passant_possible, castling_rights)
-                            if len(defenders) < len(attackers):
-                                # Penalize based on the value of the piece
-                                evaluation -= value * 0.5  # Adjust the multiplier as needed
+                        evaluation -= gain // 2
                     else:
-                        if position in my_attack_squares:
-                            # Check if the piece is defended
-                            defenders = self.get_defenders(board, position, self.opponent_color, en_passant_possible, castling_rights)
-                            attackers = self.get_attackers(board, position, self.color, en_passant_possible, castling_rights)
-                            if len(attackers) > len(defenders):
-                                # Reward based on the value of the piece
-                                evaluation += value * 0.5  # Adjust the multiplier as needed
-
+                        evaluation += gain // 2
         return evaluation
 
-    def get_defenders(self, board, position, color, en_passant_possible, castling_rights):
-        defenders = []
-        for row in range(8):
-            for col in range(8):
-                piece = board[row][col]
-                if piece != '--' and piece[0] == color:
-                    valid_moves = get_valid_moves(board, (row, col), color, en_passant_possible, castling_rights)
-                    if position in valid_moves:
-                        defenders.append((row, col))
-        return defenders
-
-    def get_attackers(self, board, position, color, en_passant_possible, castling_rights):
-        attackers = []
-        for row in range(8):
-            for col in range(8):
-                piece = board[row][col]
-                if piece != '--' and piece[0] == color:
-                    valid_moves = get_valid_moves(board, (row, col), color, en_passant_possible, castling_rights)
-                    if position in valid_moves:
-                        attackers.append((row, col))
-        return attackers
-
-    def get_all_possible_moves(self, board, turn, en_passant_possible, castling_rights):
-        moves = []
-        for row in range(8):
-            for col in range(8):
-                if board[row][col][0] == turn:
-                    valid_moves = get_valid_moves(
-                        board, (row, col), turn, en_passant_possible, castling_rights)
-                    for end_pos in valid_moves:
-                        moves.append(((row, col), end_pos))
-        return moves
-
-    def get_capture_moves(self, board, turn, en_passant_possible, castling_rights):
-        capture_moves = []
-        for row in range(8):
-            for col in range(8):
-                if board[row][col][0] == turn:
-                    valid_moves = get_valid_moves(board, (row, col), turn, en_passant_possible, castling_rights)
-                    for end_pos in valid_moves:
-                        target_piece = board[end_pos[0]][end_pos[1]]
-                        if target_piece != '--' and target_piece[0] != turn:
-                            capture_moves.append(((row, col), end_pos))
-                        # Include en passant captures
-                        elif board[row][col][1] == 'p' and end_pos == en_passant_possible:
-                            capture_moves.append(((row, col), end_pos))
-        return capture_moves
-
-    def order_moves(self, moves, board, turn, en_passant_possible, castling_rights):
+    def is_quiet(self, state, move):
+        """
+        Checks if a move captures nothing, en passant included.
+        """
+        board = state.board
+        (start_row, start_col), (end_row, end_col) = move
+        if board[end_row][end_col] != '--':
+            return False
+        return board[start_row][start_col][1] != 'p' or start_col == end_col
+
+    def pick_moves(self, state, hash_move, ply):
+        """
+        Yields the legal moves of the position in stages: the hash move, captures
+        that don't lose material by MVV-LVA, killer moves, quiet moves by history
+        score (checks first among equals), and finally the losing captures. Each stage is generated only
+        once the previous ones have been searched without a cutoff.
+        """
+        board = state.board
+        searched = set()
+
+        if hash_move is not None and state.is_valid_move(*hash_move):
+            searched.add(hash_move)
+            yield hash_move
+
+        good_captures = []
+        bad_captures = []
+        for move in state.get_capture_moves():
+            if move in searched:
+                continue
+            exchange = see_move(board, move)
+            if exchange >= 0:
+                (start_row, start_col), (end_row, end_col) = move
+                victim = board[end_row][end_col]
+                victim_value = self.piece_values[victim[1]] if victim != '--' else self.piece_values['p']
+                good_captures.append((10 * victim_value - self.piece_values[board[start_row][start_col][1]], move))
+            else:
+                bad_captures.append((exchange, move))
+        good_captures.sort(key=lambda item: -item[0])
+        for _, move in good_captures:
+            searched.add(move)
+            yield move
+
+        for move in list(self.killer_moves.get(ply, ())):
+            if move not in searched and self.is_quiet(state, move) and state.is_valid_move(*move):
+                searched.add(move)
+                yield move
+
+        history = self.history_heuristic
+        enemy_king = find_king(board, 'b' if state.turn == 'w' else 'w')
+
+        def quiet_priority(move):
+            priority = history.get(move, 0)
+            if enemy_king is not None and gives_check(board, move, king_pos=enemy_king):
+                priority += 25
+            return -priority
+
+        quiet_moves = [move for move in state.get_quiet_moves() if move not in searched]
+        quiet_moves.sort(key=quiet_priority)
+        for move in quiet_moves:
+            yield move
+
+        bad_captures.sort(key=lambda item: -item[0])
+        for _, move in bad_captures:
+            yield move
+
+    def order_moves(self, moves, state, hash_move=None):
         """
         Orders moves using advanced heuristics for better pruning.
+        Used for the root moves, which are all needed up front anyway; inner
+        nodes use the staged pick_moves instead. Killers are only stored below
+        the root, so they play no part here.
+        The hash move, when given and legal here, always goes first.
         """
+        board = state.board
+        enemy_king = find_king(board, 'b' if state.turn == 'w' else 'w')
+
         def move_priority(move):
-            start_pos, end_pos = move
-            piece_moved = board[start_pos[0]][start_pos[1]]
+            if move == hash_move:
+                return float('-inf')
+            _, end_pos = move
             piece_captured = board[end_pos[0]][end_pos[1]]
 
             priority = 0
 
-            # MVV-LVA
+            # Captures by static exchange: winning and even trades first (bigger
+            # victims breaking ties), losing ones after the quiet moves
             if piece_captured != '--':
-                value_captured = self.piece_values.get(piece_captured[1], 0)
-                value_moved = self.piece_values.get(piece_moved[1], 0)
-                priority += 10 * value_captured - value_moved
-
-            # Killer Moves
-            if move in self.killer_moves.get(self.current_depth, []):
-                priority += 50
+                exchange = see_move(board, move)
+                if exchange >= 0:
+                    priority += 10 * exchange + self.piece_values.get(piece_captured[1], 0)
+                else:
+                    priority += exchange
 
             # History Heuristic
             priority += self.history_heuristic.get(move, 0)
 
             # Checks
-            # Make the move and see if it results in a check
-            board_copy = copy.deepcopy(board)
-            en_passant_copy = copy.deepcopy(en_passant_possible)
-            castling_rights_copy = copy_castling_rights(castling_rights)
-            move_log_copy = []
-            make_move(board_copy, start_pos, end_pos, en_passant_copy, castling_rights_copy, move_log_copy)
-            if in_check(board_copy, self.opponent_color if turn == self.color else self.color):
+            if enemy_king is not None and gives_check(board, move, king_pos=enemy_king):
                 priority += 25
 
             return -priority  # Negative for descending order
 
         ordered_moves = sorted(moves, key=move_priority)
-        return ordered_moves
\ No newline at end of file
+        return ordered_moves
@@ -0,0 +1,151 @@
+# build_book.py
+#
+# Builds a Polyglot opening book from a collection of PGN games.
+#
+#   python build_book.py games.pgn [more.pgn ...] -o book.bin
+#   python build_book.py games.pgn -o book.bin --max-ply 16 --min-games 3
+
+import argparse
+import re
+from chess_logic import GameState, STARTING_FEN, board_from_fen
+from polyglot import polyglot_key, encode_book_move, write_book
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+# Book weight of a move for the side that played it, by game result
+RESULT_POINTS = {'1-0': {'w': 2, 'b': 0}, '0-1': {'w': 0, 'b': 2}, '1/2-1/2': {'w': 1, 'b': 1}}
+
+TAG_PATTERN = re.compile(r'\[(\w+)\s+"([^"]*)"\]')
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+# Comments, line comments, NAGs, move numbers and annotation glyphs
+NOISE_PATTERN = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+|\d+\.(\.\.)?|[!?]+')
+
+
+def strip_variations(text):
+    """
+    Removes (possibly nested) variations from PGN movetext.
+    """
+    result = []
+    depth = 0
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(0, depth - 1)
+        elif depth == 0:
+            result.append(char)
+    return ''.join(result)
+
+
+def read_games(path):
+    """
+    Yields (tags, SAN moves) for every game in a PGN file.
+    """
+    with open(path, encoding='utf-8', errors='replace') as pgn_file:
+        text = pgn_file.read()
+    tags = {}
+    movetext = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('['):
+            if movetext:
+                yield tags, parse_movetext(' '.join(movetext))
+                tags, movetext = {}, []
+            match = TAG_PATTERN.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2)
+        elif line:
+            movetext.append(line)
+    if movetext:
+        yield tags, parse_movetext(' '.join(movetext))
+
+
+def parse_movetext(text):
+    """
+    Returns the SAN moves of a game's movetext, without comments, variations or the result.
+    """
+    text = NOISE_PATTERN.sub(' ', strip_variations(text))
+    return [token.rstrip('+#') for token in text.split() if token not in RESULTS]
+
+
+def move_from_san(state, san):
+    """
+    Finds the legal move written as san in the state's position.
+    Returns (move, promotion); raises ValueError if it isn't a legal move.
+    """
+    board = state.board
+    if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        row = 7 if state.turn == 'w' else 0
+        end_col = 2 if san.count('-') == 2 else 6
+        move = ((row, 4), (row, end_col))
+        if board[row][4] == state.turn + 'K' and state.is_valid_move(*move):
+            return move, None
+        raise ValueError(f'illegal castling: {san}')
+
+    match = SAN_PATTERN.match(san)
+    if match is None:
+        raise ValueError(f'unreadable move: {san}')
+    piece_type, from_file, from_rank, target, promotion = match.groups()
+    piece = state.turn + (piece_type or 'p')
+    end_pos = (8 - int(target[1]), ord(target[0]) - ord('a'))
+    candidates = []
+    for start_pos, move_end in state.get_all_possible_moves():
+        if move_end != end_pos or board[start_pos[0]][start_pos[1]] != piece:
+            continue
+        if from_file and start_pos[1] != ord(from_file) - ord('a'):
+            continue
+        if from_rank and start_pos[0] != 8 - int(from_rank):
+            continue
+        candidates.append((start_pos, move_end))
+    if len(candidates) != 1:
+        raise ValueError(f'{"ambiguous" if candidates else "illegal"} move: {san}')
+    return candidates[0], promotion
+
+
+def build_book(pgn_paths, output_path, max_ply=20, min_games=1):
+    """
+    Replays every game up to max_ply half-moves and writes a book entry for
+    each move played in at least min_games games, weighted by the results
+    for the side that played it. Returns (games read, entries written).
+    """
+    stats = {}  # (key, move code) -> [games, points]
+    games = 0
+    for path in pgn_paths:
+        for tags, moves in read_games(path):
+            points = RESULT_POINTS.get(tags.get('Result'))
+            if points is None:
+                continue  # Unfinished game: no result to weight its moves by
+            board, turn, en_passant_possible, castling_rights = board_from_fen(tags.get('FEN', STARTING_FEN))
+            state = GameState(board, turn, en_passant_possible, castling_rights)
+            games += 1
+            for san in moves[:max_ply]:
+                try:
+                    move, promotion = move_from_san(state, san)
+                except ValueError:
+                    break  # Stop at the first move we can't follow
+                key = polyglot_key(state.board, state.turn, state.en_passant_possible, state.castling_rights)
+                entry = stats.setdefault((key, encode_book_move(state.board, move, promotion)), [0, 0])
+                entry[0] += 1
+                entry[1] += points[state.turn]
+                state.make_move(move[0], move[1], promotion or 'Q')
+
+    entries = [(key, move, min(points, 0xFFFF)) for (key, move), (count, points) in stats.items()
+               if count >= min_games and points > 0]
+    write_book(output_path, entries)
+    return games, len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a Polyglot opening book from PGN files.')
+    parser.add_argument('pgn', nargs='+', help='PGN files to read')
+    parser.add_argument('-o', '--output', default='book.bin', help='book file to write')
+    parser.add_argument('--max-ply', type=int, default=20, help='half-moves of each game to include')
+    parser.add_argument('--min-games', type=int, default=1,
+                        help='leave out moves played in fewer games than this')
+    args = parser.parse_args(argv)
+
+    games, entries = build_book(args.pgn, args.output, args.max_ply, args.min_games)
+    print(f'{games} games, {entries} entries written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,15 @@
 import pygame
+import os
 import sys
 import copy
+import queue
+import threading
+import time
 from bot import Bot  # Import the Bot class
 from chess_logic import (
-    is_valid_move, make_move, undo_move, in_check, get_all_possible_moves, find_king
+    is_valid_move, make_move, undo_move, in_check, get_all_possible_moves, find_king, move_to_uci
 )
+from bitboard import Position
 
 # Initialize Pygame
 pygame.init()
@@ -18,11 +23,28 @@ SQUARE_SIZE = WIDTH // COLS
 WHITE = (245, 245, 220)  # Beige color for white squares
 BLACK = (139, 69, 19)    # Brown color for black squares
 BLUE = (106, 90, 205)    # Highlight color
+PANEL = (220, 220, 220)  # Background of the button bar under the board
+
+# Use the bitboard Position for legality checks and for the bot's search (Bot's default too)
+USE_BITBOARDS = True
+# Let the bot search the expected reply while the player is thinking
+PONDER = True
+# The bot's clock: (base seconds, increment per move), or None for a fixed Bot.time_limit per move
+BOT_TIME_CONTROL = (300.0, 2.0)
+# Polyglot opening book for the bot, used when the file exists (see build_book.py)
+BOOK_PATH = 'book.bin'
+# Endgame tablebases for the bot, used when the directory exists (see tablebase.py)
+TABLEBASE_DIR = 'tablebases'
+# NNUE weights for the bot's evaluation, used when the file exists (see nnue.py)
+NNUE_PATH = 'nnue.bin'
 
 # Fonts
 FONT = pygame.font.SysFont(None, 24)
 LARGE_FONT = pygame.font.SysFont(None, 48)
 
+# Posted by the bot's search thread so the idle main loop wakes up for its reports
+SEARCH_EVENT = pygame.USEREVENT + 1
+
 # Load images
 def load_images():
     pieces = ['wp', 'bp', 'wR', 'bR', 'wN', 'bN', 'wB', 'bB',
@@ -33,31 +55,42 @@ def load_images():
             pygame.image.load(f'images/{piece}.png'), (SQUARE_SIZE, SQUARE_SIZE))
     return images
 
-# Draw the chess board
-def draw_board(screen):
+# Pre-render the empty chess board once
+def draw_board():
+    surface = pygame.Surface((COLS * SQUARE_SIZE, ROWS * SQUARE_SIZE))
     for row in range(ROWS):
         for col in range(COLS):
             color = WHITE if (row + col) % 2 == 0 else BLACK
-            pygame.draw.rect(screen, color, pygame.Rect(
+            pygame.draw.rect(surface, color, pygame.Rect(
                 col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-
-# Draw pieces on the board
-def draw_pieces(screen, board, images):
-    for row in range(ROWS):
-        for col in range(COLS):
-            piece = board[row][col]
-            if piece != '--':
-                screen.blit(images[piece], pygame.Rect(
-                    col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
-
-# Highlight selected square
-def highlight_square(screen, pos):
-    if pos != ():
-        row, col = pos
-        s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE))
-        s.set_alpha(100)  # Transparency
-        s.fill(BLUE)
-        screen.blit(s, (col*SQUARE_SIZE, row*SQUARE_SIZE))
+    return surface
+
+# Translucent overlay for highlighted squares, created once
+def create_highlight():
+    s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE))
+    s.set_alpha(100)  # Transparency
+    s.fill(BLUE)
+    return s
+
+# Status text while the bot is searching, with its depth and best move so far
+def thinking_text(thinking_info):
+    text = 'Thinking...'
+    if thinking_info is not None:
+        depth, move = thinking_info
+        text += f'  depth {depth}  best {move_to_uci(move)}'
+    return text
+
+# Legality helpers that dispatch to the bitboard core when enabled
+def check_valid_move(board, start_pos, end_pos, turn, en_passant_possible, castling_rights):
+    if USE_BITBOARDS:
+        position = Position.from_board(board, turn, en_passant_possible, castling_rights)
+        return position.is_valid_move(start_pos, end_pos)
+    return is_valid_move(board, start_pos, end_pos, turn, en_passant_possible, castling_rights)
+
+def get_legal_moves(board, turn, en_passant_possible, castling_rights):
+    if USE_BITBOARDS:
+        return Position.from_board(board, turn, en_passant_possible, castling_rights).get_all_possible_moves()
+    return get_all_possible_moves(board, turn, en_passant_possible, castling_rights)
 
 # Button class
 class Button:
@@ -65,11 +98,14 @@ class Button:
         self.rect = pygame.Rect(x, y, width, height)
         self.color = (200, 200, 200)
         self.text = text
+        self.text_surf = None  # Rendered on first draw
         self.callback = callback
 
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
-        text_surf = FONT.render(self.text, True, (0, 0, 0))
+        if self.text_surf is None:
+            self.text_surf = FONT.render(self.text, True, (0, 0, 0))
+        text_surf = self.text_surf
         text_rect = text_surf.get_rect(center=self.rect.center)
         screen.blit(text_surf, text_rect)
 
@@ -78,6 +114,71 @@ class Button:
             if self.rect.collidepoint(event.pos):
                 self.callback()
 
+# Draws the window incrementally: each frame only the squares whose piece or
+# highlight changed are redrawn, and only their rectangles are sent to the display
+class BoardRenderer:
+    def __init__(self, screen, images):
+        self.screen = screen
+        self.images = images
+        self.board_surface = draw_board()
+        self.highlight = create_highlight()
+        self.text_cache = {}  # (font, text, color) -> rendered surface
+        self.invalidate()
+
+    def invalidate(self):
+        # Forget what is on screen so the next frame redraws everything
+        self.drawn = {}  # (row, col) -> (piece, highlighted) as last drawn
+        self.overlay = None  # (check, winner) as last drawn
+        self.status = None  # Status bar text as last drawn
+
+    def render_text(self, font, text, color):
+        key = (font, text, color)
+        if key not in self.text_cache:
+            self.text_cache[key] = font.render(text, True, color)
+        return self.text_cache[key]
+
+    def draw_square(self, board, row, col, highlighted):
+        rect = pygame.Rect(col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+        self.screen.blit(self.board_surface, rect, rect)
+        if highlighted:
+            self.screen.blit(self.highlight, rect)
+        piece = board[row][col]
+        if piece != '--':
+            self.screen.blit(self.images[piece], rect)
+        return rect
+
+    def draw(self, board, highlighted, check, winner, status, button):
+        # Returns the rectangles that changed, for pygame.display.update
+        rects = []
+        overlay = (check, winner)
+        if overlay != self.overlay:
+            # Text over the board covers squares: repaint them all underneath
+            self.drawn = {}
+        for row in range(ROWS):
+            for col in range(COLS):
+                square = (board[row][col], (row, col) in highlighted)
+                if self.drawn.get((row, col)) != square:
+                    rects.append(self.draw_square(board, row, col, square[1]))
+                    self.drawn[(row, col)] = square
+
+        if rects or overlay != self.overlay:
+            self.overlay = overlay
+            if winner:
+                text_surf = self.render_text(LARGE_FONT, winner, (0, 0, 0))
+                rects.append(self.screen.blit(text_surf, text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2))))
+            elif check:
+                rects.append(self.screen.blit(self.render_text(FONT, 'Check!', (255, 0, 0)), (10, 10)))
+
+        if status != self.status:
+            self.status = status
+            panel = pygame.Rect(0, ROWS * SQUARE_SIZE, WIDTH, HEIGHT - ROWS * SQUARE_SIZE)
+            self.screen.fill(PANEL, panel)
+            if status:
+                self.screen.blit(self.render_text(FONT, status, (0, 0, 0)), (10, HEIGHT - 32))
+            button.draw(self.screen)
+            rects.append(panel)
+        return rects
+
 # Initial board setup
 def create_board():
     board = [
@@ -98,13 +199,12 @@ def main():
     pygame.display.set_caption('2D Chess')
 
     images = load_images()
+    renderer = BoardRenderer(screen, images)
     board = create_board()
     selected_square = ()
     player_clicks = []
     running = True
 
-    clock = pygame.time.Clock()
-
     # Game state variables
     move_log = []
     en_passant_possible = ()
@@ -119,142 +219,215 @@ def main():
     # Choose who plays as white and black
     player_color = 'w'  # Change to 'b' if you want to play as black
     bot_color = 'b' if player_color == 'w' else 'w'
-    bot = Bot(bot_color)
+    bot = Bot(bot_color, use_bitboards=USE_BITBOARDS,
+              book_path=BOOK_PATH if os.path.exists(BOOK_PATH) else None,
+              tablebase_dir=TABLEBASE_DIR if os.path.isdir(TABLEBASE_DIR) else None,
+              nnue_path=NNUE_PATH if os.path.exists(NNUE_PATH) else None)
+
+    # Bot search worker: runs in a thread and reports back through a queue
+    search_results = queue.Queue()
+    search_thread = None
+    thinking_info = None  # (depth, best move) of the search in progress
+    search_started = None
+    bot_time_left = BOT_TIME_CONTROL[0] if BOT_TIME_CONTROL else None
+    bot_increment = BOT_TIME_CONTROL[1] if BOT_TIME_CONTROL else 0.0
+    # (move number, bot clock before it) for each bot move, so undo can restore the clock
+    bot_clock_log = []
+
+    def report_iteration(depth, score, principal_variation):
+        if principal_variation:
+            search_results.put(('info', depth, principal_variation[0]))
+            pygame.event.post(pygame.event.Event(SEARCH_EVENT))
+
+    bot.info_callback = report_iteration
+
+    def start_bot_search():
+        nonlocal search_thread, thinking_info, search_started
+        last_move = (move_log[-1][0], move_log[-1][1]) if move_log else None
+        ponder_hit = bot.ponder_move is not None and last_move == bot.ponder_move
+        # Use copies of game state variables
+        board_copy = [row[:] for row in board]
+        move_log_copy = move_log.copy()
+        en_passant_possible_copy = en_passant_possible
+        castling_rights_copy = copy.deepcopy(castling_rights)
+
+        time_left = bot_time_left
+
+        def run():
+            if ponder_hit:
+                # The player made the predicted reply: the ponder search carries on
+                move = bot.ponder_hit(time_left, bot_increment)
+            else:
+                move = bot.get_move(board_copy, en_passant_possible_copy, castling_rights_copy, move_log_copy,
+                                    time_left, bot_increment)
+            search_results.put(('move', move))
+            pygame.event.post(pygame.event.Event(SEARCH_EVENT))
+
+        thinking_info = None
+        search_started = time.time()
+        search_thread = threading.Thread(target=run, daemon=True)
+        search_thread.start()
+
+    def cancel_bot_search():
+        nonlocal search_thread, thinking_info
+        if search_thread is not None:
+            bot.cancel()
+            search_thread.join()
+            search_thread = None
+        bot.stop_ponder()
+        thinking_info = None
+        # Drop anything the cancelled search reported
+        while not search_results.empty():
+            search_results.get_nowait()
 
     # Undo button
     undo_button = Button('Undo Move', WIDTH - 120, HEIGHT - 40, 100, 30, lambda: undo_last_move())
 
     def undo_last_move():
-        nonlocal en_passant_possible, castling_rights, turn, game_over, winner
+        nonlocal en_passant_possible, castling_rights, turn, game_over, winner, bot_time_left
         if move_log:
-            undo_move(board, move_log, en_passant_possible, castling_rights)
+            cancel_bot_search()
+            en_passant_possible, castling_rights = undo_move(board, move_log, en_passant_possible, castling_rights)
+            if bot_clock_log and bot_clock_log[-1][0] == len(move_log):
+                bot_time_left = bot_clock_log.pop()[1]
             turn = 'w' if turn == 'b' else 'b'
             game_over = False
             winner = None
 
+    # The king in check, recomputed only when the position changes
+    check_key = None
+    king_in_check = None
+
     while running:
-        draw_board(screen)
-        highlight_square(screen, selected_square)
-        draw_pieces(screen, board, images)
-        undo_button.draw(screen)
-
-        if game_over:
-            text_surf = LARGE_FONT.render(winner, True, (0, 0, 0))
-            text_rect = text_surf.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-            screen.blit(text_surf, text_rect)
-        else:
-            if in_check(board, turn):
-                # Highlight the king or display a warning
-                king_pos = find_king(board, turn)
-                if king_pos:
-                    highlight_square(screen, king_pos)
-                check_text = FONT.render('Check!', True, (255, 0, 0))
-                screen.blit(check_text, (10, 10))
-
-        pygame.display.flip()
-
-        clock.tick(60)  # Limit to 60 FPS
-
-        if game_over:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-            continue  # Skip processing further events if game is over
-
-        if turn == player_color:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                    pygame.quit()
-                    sys.exit()
-
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    location = pygame.mouse.get_pos()
-                    col = location[0] // SQUARE_SIZE
-                    row = location[1] // SQUARE_SIZE
-
-                    # Handle undo button
-                    undo_button.handle_event(event)
-
-                    if location[1] >= HEIGHT - 40:
-                        continue  # Clicked outside the board
-
-                    if selected_square == (row, col):
-                        # Deselect
-                        selected_square = ()
-                        player_clicks = []
-                    else:
-                        selected_square = (row, col)
-                        player_clicks.append(selected_square)
-
-                    if len(player_clicks) == 2:
-                        start_pos = player_clicks[0]
-                        end_pos = player_clicks[1]
-
-                        if is_valid_move(board, start_pos, end_pos, turn, en_passant_possible, castling_rights):
-                            # Make the move
-                            captured_piece, en_passant_possible, castling_rights = make_move(
-                                board, start_pos, end_pos, en_passant_possible, castling_rights, move_log
-                            )
-
-                            # Check for pawn promotion
-                            piece_moved = board[end_pos[0]][end_pos[1]]
-                            if piece_moved[1] == 'p' and (end_pos[0] == 0 or end_pos[0] == 7):
-                                board[end_pos[0]][end_pos[1]] = piece_moved[0] + 'Q'  # Promote to Queen
-
-                            # Switch turn
-                            turn = bot_color
-
-                            # Check for game over
-                            if in_check(board, turn):
-                                if not get_all_possible_moves(board, turn, en_passant_possible, castling_rights):
-                                    game_over = True
-                                    winner = 'White wins by checkmate!' if turn == 'b' else 'Black wins by checkmate!'
-                            else:
-                                if not get_all_possible_moves(board, turn, en_passant_possible, castling_rights):
-                                    game_over = True
-                                    winner = 'Draw by stalemate.'
+        # Start the bot's search before sleeping on events: nothing else wakes
+        # the loop when the bot is to move at the start or after an undo
+        if not game_over and turn == bot_color and search_thread is None:
+            start_bot_search()
+
+        if check_key != (len(move_log), turn, game_over):
+            check_key = (len(move_log), turn, game_over)
+            king_in_check = find_king(board, turn) if not game_over and in_check(board, turn) else None
+
+        highlighted = {pos for pos in (selected_square, king_in_check) if pos}
+        status = thinking_text(thinking_info) if search_thread is not None else ''
+        rects = renderer.draw(board, highlighted, king_in_check is not None,
+                              winner if game_over else None, status, undo_button)
+        if rects:
+            pygame.display.update(rects)
+
+        # Sleep until there is input or a report from the search thread
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type in (pygame.VIDEOEXPOSE, getattr(pygame, 'WINDOWEXPOSED', pygame.VIDEOEXPOSE)):
+                renderer.invalidate()  # The window contents were lost
+
+            elif event.type == pygame.QUIT:
+                running = False
+                cancel_bot_search()
+                pygame.quit()
+                sys.exit()
+
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                # Handle undo button
+                undo_button.handle_event(event)
+
+                if game_over or turn != player_color:
+                    continue
+
+                location = pygame.mouse.get_pos()
+                col = location[0] // SQUARE_SIZE
+                row = location[1] // SQUARE_SIZE
+
+                if location[1] >= HEIGHT - 40:
+                    continue  # Clicked outside the board
+
+                if selected_square == (row, col):
+                    # Deselect
+                    selected_square = ()
+                    player_clicks = []
+                else:
+                    selected_square = (row, col)
+                    player_clicks.append(selected_square)
+
+                if len(player_clicks) == 2:
+                    start_pos = player_clicks[0]
+                    end_pos = player_clicks[1]
+
+                    if check_valid_move(board, start_pos, end_pos, turn, en_passant_possible, castling_rights):
+                        # Make the move
+                        captured_piece, en_passant_possible, castling_rights = make_move(
+                            board, start_pos, end_pos, en_passant_possible, castling_rights, move_log
+                        )
+
+                        # Switch turn
+                        turn = bot_color
+
+                        # Check for game over
+                        if in_check(board, turn):
+                            if not get_legal_moves(board, turn, en_passant_possible, castling_rights):
+                                game_over = True
+                                winner = 'White wins by checkmate!' if turn == 'b' else 'Black wins by checkmate!'
                         else:
-                            print("Invalid move!")
-                        player_clicks = []
-                        selected_square = ()
-
-        else:
-            # Bot's turn
-            pygame.display.flip()
-            # Use copies of game state variables
-            move_log_copy = move_log.copy()
-            en_passant_possible_copy = en_passant_possible
-            castling_rights_copy = copy.deepcopy(castling_rights)
-            move = bot.get_move(board, en_passant_possible_copy, castling_rights_copy, move_log_copy)
+                            if not get_legal_moves(board, turn, en_passant_possible, castling_rights):
+                                game_over = True
+                                winner = 'Draw by stalemate.'
+                        if game_over:
+                            bot.stop_ponder()
+                    else:
+                        print("Invalid move!")
+                    player_clicks = []
+                    selected_square = ()
+
+        if game_over or turn != bot_color or search_thread is None:
+            continue
+
+        # Bot's turn: pick up the search's reports each time it wakes the loop
+        move = None
+        finished = False
+        while not search_results.empty():
+            message = search_results.get_nowait()
+            if message[0] == 'info':
+                thinking_info = message[1:]
+            else:
+                move = message[1]
+                finished = True
+        if not finished:
+            continue
+        search_thread.join()
+        search_thread = None
+        thinking_info = None
+        if bot_time_left is not None:
             if move:
-                start_pos, end_pos = move
-                # Make the move
-                captured_piece, en_passant_possible, castling_rights = make_move(
-                    board, start_pos, end_pos, en_passant_possible, castling_rights, move_log
-                )
-
-                # Check for pawn promotion
-                piece_moved = board[end_pos[0]][end_pos[1]]
-                if piece_moved[1] == 'p' and (end_pos[0] == 0 or end_pos[0] == 7):
-                    board[end_pos[0]][end_pos[1]] = piece_moved[0] + 'Q'  # Promote to Queen
-
-                # Switch turn
-                turn = player_color
-
-                # Check for game over
-                if in_check(board, turn):
-                    if not get_all_possible_moves(board, turn, en_passant_possible, castling_rights):
-                        game_over = True
-                        winner = 'Black wins by checkmate!' if turn == 'w' else 'White wins by checkmate!'
-                else:
-                    if not get_all_possible_moves(board, turn, en_passant_possible, castling_rights):
-                        game_over = True
-                        winner = 'Draw by stalemate.'
+                bot_clock_log.append((len(move_log), bot_time_left))
+            bot_time_left = max(0.0, bot_time_left - (time.time() - search_started)) + bot_increment
+
+        if move:
+            start_pos, end_pos = move
+            # Make the move
+            captured_piece, en_passant_possible, castling_rights = make_move(
+                board, start_pos, end_pos, en_passant_possible, castling_rights, move_log
+            )
+
+            # Switch turn
+            turn = player_color
+
+            # Check for game over
+            if in_check(board, turn):
+                if not get_legal_moves(board, turn, en_passant_possible, castling_rights):
+                    game_over = True
+                    winner = 'Black wins by checkmate!' if turn == 'w' else 'White wins by checkmate!'
             else:
-                print("Bot has no legal moves!")
-                game_over = True
-                winner = 'Draw by stalemate.'
+                if not get_legal_moves(board, turn, en_passant_possible, castling_rights):
+                    game_over = True
+                    winner = 'Draw by stalemate.'
+
+            # Think about the player's expected reply until they move
+            if PONDER and not game_over and len(bot.principal_variation) >= 2:
+                bot.start_ponder(board, en_passant_possible, copy.deepcopy(castling_rights),
+                                 move_log.copy(), bot.principal_variation[1], bot_time_left, bot_increment)
+        else:
+            print("Bot has no legal moves!")
+            game_over = True
+            winner = 'Draw by stalemate.'
 
     pygame.quit()
 
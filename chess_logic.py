@@ -1,5 +1,82 @@
 # chess_logic.py
 
+import random
+from evaluation import PIECE_VALUES, PSQT_MIDDLEGAME, PSQT_ENDGAME, PIECE_PHASE, compute_psqt
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                  (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1),
+                (0, -1),          (0, 1),
+                (1, -1),  (1, 0),  (1, 1)]
+ORTHOGONAL_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def _build_offset_table(offsets):
+    """
+    For every square, lists the in-bounds squares reached by the given offsets.
+    """
+    return [[[(row + d_row, col + d_col) for d_row, d_col in offsets
+              if 0 <= row + d_row < 8 and 0 <= col + d_col < 8]
+             for col in range(8)] for row in range(8)]
+
+def _build_ray_table(directions):
+    """
+    For every square, lists one ray per direction, ordered outward from the square.
+    """
+    table = [[[] for col in range(8)] for row in range(8)]
+    for row in range(8):
+        for col in range(8):
+            for d_row, d_col in directions:
+                ray = []
+                new_row, new_col = row + d_row, col + d_col
+                while 0 <= new_row < 8 and 0 <= new_col < 8:
+                    ray.append((new_row, new_col))
+                    new_row += d_row
+                    new_col += d_col
+                if ray:
+                    table[row][col].append(ray)
+    return table
+
+# Precomputed attack tables, indexed as TABLE[row][col]
+KNIGHT_ATTACKS = _build_offset_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _build_offset_table(KING_OFFSETS)
+# PAWN_ATTACKERS[color][row][col] lists the squares a pawn of that color attacks (row, col) from
+PAWN_ATTACKERS = {
+    'w': _build_offset_table([(1, -1), (1, 1)]),
+    'b': _build_offset_table([(-1, -1), (-1, 1)])
+}
+# PAWN_ATTACKS[color][row][col] lists the squares a pawn of that color on (row, col) attacks
+PAWN_ATTACKS = {
+    'w': _build_offset_table([(-1, -1), (-1, 1)]),
+    'b': _build_offset_table([(1, -1), (1, 1)])
+}
+ORTHOGONAL_RAYS = _build_ray_table(ORTHOGONAL_DIRECTIONS)
+DIAGONAL_RAYS = _build_ray_table(DIAGONAL_DIRECTIONS)
+
+def _init_zobrist_keys():
+    """
+    Generates the Zobrist keys from a fixed seed so hashes are reproducible.
+    """
+    rng = random.Random(0)
+    pieces = ['wp', 'wN', 'wB', 'wR', 'wQ', 'wK',
+              'bp', 'bN', 'bB', 'bR', 'bQ', 'bK']
+    piece_keys = {piece: [rng.getrandbits(64) for _ in range(64)] for piece in pieces}
+    right_keys = [rng.getrandbits(64) for _ in range(4)]
+    castling_keys = []
+    for mask in range(16):
+        key = 0
+        for bit in range(4):
+            if mask & (1 << bit):
+                key ^= right_keys[bit]
+        castling_keys.append(key)
+    en_passant_keys = [rng.getrandbits(64) for _ in range(8)]
+    side_key = rng.getrandbits(64)
+    return piece_keys, castling_keys, en_passant_keys, side_key
+
+# ZOBRIST_PIECE_KEYS[piece][row * 8 + col]; castling keys are indexed by castling_mask;
+# en passant keys by file; the side key is XORed in when black is to move
+ZOBRIST_PIECE_KEYS, ZOBRIST_CASTLING_KEYS, ZOBRIST_EN_PASSANT_KEYS, ZOBRIST_SIDE_KEY = _init_zobrist_keys()
+
 def is_valid_move(board, start_pos, end_pos, turn, en_passant_possible, castling_rights):
     """
     Checks if a move from start_pos to end_pos is valid for the current player.
@@ -18,9 +95,65 @@ def get_valid_moves(board, pos, turn, en_passant_possible, castling_rights):
     piece = board[pos[0]][pos[1]]
     if piece == '--' or piece[0] != turn:
         return []
-    piece_type = piece[1]
-    color = piece[0]
-    moves = []
+    check_info = find_checkers_and_pins(board, find_king(board, turn), turn)
+    return get_legal_piece_moves(board, pos, turn, en_passant_possible, castling_rights, check_info)
+
+def find_checkers_and_pins(board, king_pos, color):
+    """
+    Finds the pieces checking the king at king_pos and the pieces pinned to it.
+    Returns (checkers, block_squares, pins): block_squares holds the squares that
+    capture or block a single checker, and pins maps each pinned piece's position
+    to the squares on its pin line (up to and including the pinner).
+    """
+    checkers = []
+    block_squares = set()
+    pins = {}
+    if king_pos is None:
+        return checkers, block_squares, pins
+    opponent_color = 'b' if color == 'w' else 'w'
+    row, col = king_pos
+    knight = opponent_color + 'N'
+    for r, c in KNIGHT_ATTACKS[row][col]:
+        if board[r][c] == knight:
+            checkers.append((r, c))
+            block_squares.add((r, c))
+    pawn = opponent_color + 'p'
+    for r, c in PAWN_ATTACKERS[opponent_color][row][col]:
+        if board[r][c] == pawn:
+            checkers.append((r, c))
+            block_squares.add((r, c))
+    for rays, sliders in ((ORTHOGONAL_RAYS[row][col], 'RQ'), (DIAGONAL_RAYS[row][col], 'BQ')):
+        for ray in rays:
+            shield = None
+            for i, (r, c) in enumerate(ray):
+                piece = board[r][c]
+                if piece == '--':
+                    continue
+                if piece[0] == color:
+                    if shield is not None:
+                        break  # Two of our pieces on the line: no pin
+                    shield = (r, c)
+                    continue
+                if piece[1] in sliders:
+                    if shield is None:
+                        checkers.append((r, c))
+                        block_squares.update(ray[:i + 1])
+                    else:
+                        pins[shield] = set(ray[:i + 1])
+                break
+    return checkers, block_squares, pins
+
+def get_legal_piece_moves(board, pos, color, en_passant_possible, castling_rights, check_info):
+    """
+    Returns the legal destination squares for the piece at pos, given the
+    (checkers, block_squares, pins) computed once for the position.
+    """
+    checkers, block_squares, pins = check_info
+    piece_type = board[pos[0]][pos[1]][1]
+    if piece_type == 'K':
+        return get_legal_king_moves(board, pos, color, castling_rights, bool(checkers))
+    if len(checkers) > 1:
+        return []  # Double check: only the king can move
     if piece_type == 'p':
         potential_moves = get_pawn_moves(board, pos, color, en_passant_possible)
     elif piece_type == 'R':
@@ -31,26 +164,55 @@ def get_valid_moves(board, pos, turn, en_passant_possible, castling_rights):
         potential_moves = get_bishop_moves(board, pos, color)
     elif piece_type == 'Q':
         potential_moves = get_queen_moves(board, pos, color)
-    elif piece_type == 'K':
-        potential_moves = get_king_moves(board, pos, color, castling_rights)
     else:
         potential_moves = []
 
-    # Filter out moves that leave the king in check
+    pin_line = pins.get(pos)
+    if not checkers and pin_line is None and not (piece_type == 'p' and en_passant_possible):
+        return potential_moves
     valid_moves = []
     for end_pos in potential_moves:
-        # Make copies of the board and game state
-        board_copy = [row[:] for row in board]
-        en_passant_copy = en_passant_possible
-        castling_rights_copy = copy_castling_rights(castling_rights)
-        move_log_copy = []
-        # Simulate the move
-        make_move(board_copy, pos, end_pos, en_passant_copy, castling_rights_copy, move_log_copy)
-        # Check if king is in check
-        if not in_check(board_copy, color):
+        if piece_type == 'p' and end_pos == en_passant_possible:
+            # En passant removes two pieces from their squares; just play it and look
+            if en_passant_is_legal(board, pos, end_pos, color, en_passant_possible, castling_rights):
+                valid_moves.append(end_pos)
+        elif (not checkers or end_pos in block_squares) and (pin_line is None or end_pos in pin_line):
             valid_moves.append(end_pos)
     return valid_moves
 
+def get_legal_king_moves(board, pos, color, castling_rights, in_check_now):
+    """
+    Returns the legal king moves, testing each target square against enemy attacks.
+    """
+    row, col = pos
+    king = board[row][col]
+    moves = []
+    # Lift the king so sliders attack through its current square
+    board[row][col] = '--'
+    try:
+        for r, c in KING_ATTACKS[row][col]:
+            target_piece = board[r][c]
+            if (target_piece == '--' or target_piece[0] != color) and not square_under_attack(board, (r, c), color):
+                moves.append((r, c))
+    finally:
+        board[row][col] = king
+    if not in_check_now:
+        if castling_rights[color]['king_side'] and castling_path_is_safe(board, pos, color, 'king_side'):
+            moves.append((row, col + 2))
+        if castling_rights[color]['queen_side'] and castling_path_is_safe(board, pos, color, 'queen_side'):
+            moves.append((row, col - 2))
+    return moves
+
+def en_passant_is_legal(board, start_pos, end_pos, color, en_passant_possible, castling_rights):
+    """
+    Plays an en passant capture in place and reports whether it leaves the king safe.
+    """
+    move_log = []
+    make_move(board, start_pos, end_pos, en_passant_possible, castling_rights, move_log)
+    legal = not in_check(board, color)
+    unmake_move(board, move_log)
+    return legal
+
 def get_pawn_moves(board, pos, color, en_passant_possible):
     """
     Generates valid moves for a pawn at the given position.
@@ -152,97 +314,92 @@ def get_queen_moves(board, pos, color):
     # Queen's moves are the combination of rook and bishop moves
     return get_rook_moves(board, pos, color) + get_bishop_moves(board, pos, color)
 
-def get_king_moves(board, pos, color, castling_rights):
-    """
-    Generates valid moves for a king at the given position, including castling.
-    """
-    moves = []
-    row, col = pos
-    king_moves = [(-1, -1), (-1, 0), (-1, 1),
-                  (0, -1),          (0, 1),
-                  (1, -1),  (1, 0),  (1, 1)]
-    for move in king_moves:
-        new_row = row + move[0]
-        new_col = col + move[1]
-        if is_in_bounds(new_row, new_col):
-            target_piece = board[new_row][new_col]
-            if target_piece == '--' or target_piece[0] != color:
-                moves.append((new_row, new_col))
-    # Castling moves
-    if castling_rights[color]['king_side'] and can_castle(board, pos, color, 'king_side'):
-        moves.append((row, col + 2))
-    if castling_rights[color]['queen_side'] and can_castle(board, pos, color, 'queen_side'):
-        moves.append((row, col - 2))
-    return moves
-
 def is_in_bounds(row, col):
     """
     Checks if a given position is within the bounds of the board.
     """
     return 0 <= row < 8 and 0 <= col < 8
 
-def make_move(board, start_pos, end_pos, en_passant_possible, castling_rights, move_log):
+def make_move(board, start_pos, end_pos, en_passant_possible, castling_rights, move_log, promotion='Q'):
     """
     Executes a move on the board and returns any captured piece.
     Also returns updated en_passant_possible and castling_rights.
+    Pushes an undo record onto move_log so unmake_move can restore the exact prior state.
     """
     piece_moved = board[start_pos[0]][start_pos[1]]
     piece_captured = board[end_pos[0]][end_pos[1]]
+    captured_pos = end_pos
+    rook_move = None
+    promoted = None
 
     board[end_pos[0]][end_pos[1]] = piece_moved
     board[start_pos[0]][start_pos[1]] = '--'
 
-    move_log.append((start_pos, end_pos, piece_moved, piece_captured))
-
     # Update en passant possibility
     new_en_passant_possible = ()
     if piece_moved[1] == 'p':
         if abs(start_pos[0] - end_pos[0]) == 2:
             new_en_passant_possible = ((start_pos[0] + end_pos[0]) // 2, start_pos[1])
-        else:
-            new_en_passant_possible = ()
         # En passant capture
         if end_pos == en_passant_possible:
             if piece_moved[0] == 'w':
-                board[end_pos[0] + 1][end_pos[1]] = '--'
+                captured_pos = (end_pos[0] + 1, end_pos[1])
             else:
-                board[end_pos[0] - 1][end_pos[1]] = '--'
-    else:
-        new_en_passant_possible = ()
+                captured_pos = (end_pos[0] - 1, end_pos[1])
+            piece_captured = board[captured_pos[0]][captured_pos[1]]
+            board[captured_pos[0]][captured_pos[1]] = '--'
+        # Pawn promotion
+        elif end_pos[0] == 0 or end_pos[0] == 7:
+            promoted = piece_moved[0] + promotion
+            board[end_pos[0]][end_pos[1]] = promoted
 
     # Handle castling
-    new_castling_rights = update_castling_rights(piece_moved, start_pos, castling_rights)
+    new_castling_rights = update_castling_rights(piece_moved, start_pos, castling_rights, end_pos)
     if piece_moved[1] == 'K':
         if abs(start_pos[1] - end_pos[1]) == 2:
+            row = start_pos[0]
             if end_pos[1] > start_pos[1]:  # King-side castling
-                board[start_pos[0]][start_pos[1] + 1] = board[start_pos[0]][7]
-                board[start_pos[0]][7] = '--'
+                rook_move = ((row, 7), (row, start_pos[1] + 1))
             else:  # Queen-side castling
-                board[start_pos[0]][start_pos[1] - 1] = board[start_pos[0]][0]
-                board[start_pos[0]][0] = '--'
+                rook_move = ((row, 0), (row, start_pos[1] - 1))
+            (rook_row, rook_from_col), (_, rook_to_col) = rook_move
+            board[row][rook_to_col] = board[rook_row][rook_from_col]
+            board[row][rook_from_col] = '--'
+
+    move_log.append((start_pos, end_pos, piece_moved, piece_captured, captured_pos,
+                     en_passant_possible, castling_rights, rook_move, promoted))
 
     return piece_captured, new_en_passant_possible, new_castling_rights
 
+def unmake_move(board, move_log):
+    """
+    Reverses the last move made, including castling, en passant and promotion.
+    Returns the restored en_passant_possible and castling_rights.
+    """
+    (start_pos, end_pos, piece_moved, piece_captured, captured_pos,
+     en_passant_possible, castling_rights, rook_move, promoted) = move_log.pop()
+    board[start_pos[0]][start_pos[1]] = piece_moved
+    board[end_pos[0]][end_pos[1]] = '--'
+    board[captured_pos[0]][captured_pos[1]] = piece_captured
+    if rook_move is not None:
+        (row, rook_from_col), (_, rook_to_col) = rook_move
+        board[row][rook_from_col] = board[row][rook_to_col]
+        board[row][rook_to_col] = '--'
+    return en_passant_possible, castling_rights
+
 def undo_move(board, move_log, en_passant_possible, castling_rights):
     """
     Reverses the last move made.
+    Returns the restored en_passant_possible and castling_rights.
     """
     if len(move_log) == 0:
-        return
-    last_move = move_log.pop()
-    start_pos, end_pos, piece_moved, piece_captured = last_move
-    board[start_pos[0]][start_pos[1]] = piece_moved
-    board[end_pos[0]][end_pos[1]] = piece_captured
-
-    # Update en passant possible
-    # For simplicity, reset en_passant_possible and castling_rights
-    en_passant_possible = ()
-    # You may need to implement a more sophisticated method to fully restore previous states
-    # For now, this should suffice for basic functionality
+        return en_passant_possible, castling_rights
+    return unmake_move(board, move_log)
 
-def update_castling_rights(piece_moved, start_pos, castling_rights):
+def update_castling_rights(piece_moved, start_pos, castling_rights, end_pos=None):
     """
     Updates the castling rights after a move.
+    A move onto a rook's starting square (capturing it) also removes that right.
     Returns the updated castling_rights dictionary.
     """
     new_castling_rights = copy_castling_rights(castling_rights)
@@ -258,6 +415,14 @@ def update_castling_rights(piece_moved, start_pos, castling_rights):
             new_castling_rights['b']['queen_side'] = False
         elif start_pos == (0, 7):  # Black king-side rook
             new_castling_rights['b']['king_side'] = False
+    if end_pos == (7, 0):
+        new_castling_rights['w']['queen_side'] = False
+    elif end_pos == (7, 7):
+        new_castling_rights['w']['king_side'] = False
+    elif end_pos == (0, 0):
+        new_castling_rights['b']['queen_side'] = False
+    elif end_pos == (0, 7):
+        new_castling_rights['b']['king_side'] = False
     return new_castling_rights
 
 def copy_castling_rights(castling_rights):
@@ -269,13 +434,12 @@ def copy_castling_rights(castling_rights):
         'b': {'king_side': castling_rights['b']['king_side'], 'queen_side': castling_rights['b']['queen_side']}
     }
 
-def can_castle(board, pos, color, side):
+def castling_path_is_safe(board, pos, color, side):
     """
-    Determines if castling is possible for the given side (king_side or queen_side).
+    Checks the castling path for a king that is not in check: the squares between
+    king and rook are empty, the king's path is not attacked and the rook is home.
     """
     row, col = pos
-    if in_check(board, color):
-        return False
     if side == 'king_side':
         # Squares between king and rook must be empty
         if board[row][col + 1] != '--' or board[row][col + 2] != '--':
@@ -310,93 +474,166 @@ def in_check(board, color):
 def square_under_attack(board, pos, color):
     """
     Checks if the given square is under attack by the opponent.
+    Works outward from the square using the precomputed attack tables and
+    returns as soon as the first attacker is found.
     """
+    if pos is None:
+        return False
     opponent_color = 'b' if color == 'w' else 'w'
-    for row in range(8):
-        for col in range(8):
-            piece = board[row][col]
-            if piece != '--' and piece[0] == opponent_color:
-                piece_moves = get_valid_moves_for_attack(board, (row, col), opponent_color)
-                if pos in piece_moves:
+    row, col = pos
+    knight = opponent_color + 'N'
+    for r, c in KNIGHT_ATTACKS[row][col]:
+        if board[r][c] == knight:
+            return True
+    pawn = opponent_color + 'p'
+    for r, c in PAWN_ATTACKERS[opponent_color][row][col]:
+        if board[r][c] == pawn:
+            return True
+    king = opponent_color + 'K'
+    for r, c in KING_ATTACKS[row][col]:
+        if board[r][c] == king:
+            return True
+    # Sliders: the first piece met on each ray is the only one that can attack
+    for ray in ORTHOGONAL_RAYS[row][col]:
+        for r, c in ray:
+            piece = board[r][c]
+            if piece != '--':
+                if piece[0] == opponent_color and (piece[1] == 'R' or piece[1] == 'Q'):
                     return True
+                break
+    for ray in DIAGONAL_RAYS[row][col]:
+        for r, c in ray:
+            piece = board[r][c]
+            if piece != '--':
+                if piece[0] == opponent_color and (piece[1] == 'B' or piece[1] == 'Q'):
+                    return True
+                break
     return False
 
-def get_valid_moves_for_attack(board, pos, color):
+def gives_check(board, move, promotion='Q', king_pos=None):
     """
-    Returns a list of valid moves for attack purposes (excluding special moves like castling).
+    Checks if a move would put the enemy king in check, without playing it.
+    Looks outward from the enemy king: the moved piece is tested for a direct
+    check from its new square, and every square the move changes is tested
+    for a slider line it opens or closes (discovered checks, castling rooks,
+    en passant). king_pos can be passed to save locating the enemy king.
     """
-    piece = board[pos[0]][pos[1]]
-    piece_type = piece[1]
+    start_pos, end_pos = move
+    piece = board[start_pos[0]][start_pos[1]]
+    color, piece_type = piece[0], piece[1]
+    opponent_color = 'b' if color == 'w' else 'w'
+    if king_pos is None:
+        king_pos = find_king(board, opponent_color)
+        if king_pos is None:
+            return False
+    king_row, king_col = king_pos
+    end_row, end_col = end_pos
+
+    # Squares whose contents the move changes
+    changed = {start_pos: '--', end_pos: piece}
     if piece_type == 'p':
-        return get_pawn_attack_moves(board, pos, color)
-    elif piece_type == 'R':
-        return get_rook_moves(board, pos, color)
-    elif piece_type == 'N':
-        return get_knight_moves(board, pos, color)
-    elif piece_type == 'B':
-        return get_bishop_moves(board, pos, color)
-    elif piece_type == 'Q':
-        return get_queen_moves(board, pos, color)
-    elif piece_type == 'K':
-        return get_king_attack_moves(board, pos, color)
-    else:
-        return []
+        if end_row == 0 or end_row == 7:
+            changed[end_pos] = color + promotion
+        elif start_pos[1] != end_col and board[end_row][end_col] == '--':
+            changed[(start_pos[0], end_col)] = '--'  # En passant capture
+    elif piece_type == 'K' and abs(end_col - start_pos[1]) == 2:
+        rook_from, rook_to = (7, 5) if end_col > start_pos[1] else (0, 3)
+        changed[(end_row, rook_from)] = '--'
+        changed[(end_row, rook_to)] = color + 'R'
 
-def get_pawn_attack_moves(board, pos, color):
-    """
-    Generates attack moves for a pawn (used for checking attacks).
-    """
-    moves = []
-    direction = -1 if color == 'w' else 1
-    row, col = pos
-    for offset in [-1, 1]:
-        new_col = col + offset
-        new_row = row + direction
-        if is_in_bounds(new_row, new_col):
-            moves.append((new_row, new_col))
-    return moves
+    # Direct checks by the pieces that step next to the king
+    placed = changed[end_pos]
+    if placed[1] == 'N' and king_pos in KNIGHT_ATTACKS[end_row][end_col]:
+        return True
+    if placed[1] == 'p' and king_pos in PAWN_ATTACKS[color][end_row][end_col]:
+        return True
 
-def get_king_attack_moves(board, pos, color):
-    """
-    Generates attack moves for a king (excluding castling).
-    """
-    moves = []
-    row, col = pos
-    king_moves = [(-1, -1), (-1, 0), (-1, 1),
-                  (0, -1),          (0, 1),
-                  (1, -1),  (1, 0),  (1, 1)]
-    for move in king_moves:
-        new_row = row + move[0]
-        new_col = col + move[1]
-        if is_in_bounds(new_row, new_col):
-            moves.append((new_row, new_col))
-    return moves
+    # Slider lines from the king through every changed square
+    for row, col in changed:
+        d_row, d_col = row - king_row, col - king_col
+        if (d_row == 0 and d_col == 0) or (d_row and d_col and abs(d_row) != abs(d_col)):
+            continue
+        step_row = (d_row > 0) - (d_row < 0)
+        step_col = (d_col > 0) - (d_col < 0)
+        sliders = 'RQ' if step_row == 0 or step_col == 0 else 'BQ'
+        r, c = king_row + step_row, king_col + step_col
+        while 0 <= r < 8 and 0 <= c < 8:
+            square = changed.get((r, c), board[r][c])
+            if square != '--':
+                if square[0] == color and square[1] in sliders:
+                    return True
+                break
+            r += step_row
+            c += step_col
+    return False
 
 def get_all_possible_moves(board, color, en_passant_possible, castling_rights):
     """
     Generates all possible legal moves for the current player.
+    Checkers and pins are found once, so no move has to be played to test it
+    (except en passant, which is rare enough to make and unmake).
     """
+    check_info = find_checkers_and_pins(board, find_king(board, color), color)
     moves = []
     for row in range(8):
         for col in range(8):
             piece = board[row][col]
             if piece != '--' and piece[0] == color:
-                valid_moves = get_valid_moves(board, (row, col), color, en_passant_possible, castling_rights)
-                for end_pos in valid_moves:
-                    # Make the move
-                    board_copy = [row[:] for row in board]
-                    en_passant_copy = en_passant_possible
-                    castling_rights_copy = copy_castling_rights(castling_rights)
-                    move_log_copy = []
-                    captured_piece, new_en_passant_possible, new_castling_rights = make_move(
-                        board_copy, (row, col), end_pos, en_passant_copy, castling_rights_copy, move_log_copy
-                    )
-                    # Check if move puts player in check
-                    if not in_check(board_copy, color):
-                        moves.append(((row, col), end_pos))
-                    # No need to undo move since we're using a copy
+                for end_pos in get_legal_piece_moves(board, (row, col), color, en_passant_possible,
+                                                     castling_rights, check_info):
+                    moves.append(((row, col), end_pos))
     return moves
 
+def compute_attack_maps(board):
+    """
+    Builds both sides' attack maps in one pass over the board.
+    Returns {color: (attack_counts, least_attacker, mobility)} where attack_counts[sq]
+    is how many of that side's pieces attack square sq (row * 8 + col), own pieces
+    included so defenders are counted, least_attacker[sq] is the value of the cheapest
+    of them (0 if none), and mobility counts the squares its knights, bishops, rooks
+    and queens attack that are not occupied by their own side.
+    """
+    attack_counts = {'w': [0] * 64, 'b': [0] * 64}
+    least_attacker = {'w': [0] * 64, 'b': [0] * 64}
+    mobility = {'w': 0, 'b': 0}
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece == '--':
+                continue
+            color, piece_type = piece[0], piece[1]
+            if piece_type == 'p':
+                targets = PAWN_ATTACKS[color][row][col]
+            elif piece_type == 'N':
+                targets = KNIGHT_ATTACKS[row][col]
+            elif piece_type == 'K':
+                targets = KING_ATTACKS[row][col]
+            else:
+                targets = []
+                if piece_type != 'B':
+                    for ray in ORTHOGONAL_RAYS[row][col]:
+                        for r, c in ray:
+                            targets.append((r, c))
+                            if board[r][c] != '--':
+                                break
+                if piece_type != 'R':
+                    for ray in DIAGONAL_RAYS[row][col]:
+                        for r, c in ray:
+                            targets.append((r, c))
+                            if board[r][c] != '--':
+                                break
+            value = PIECE_VALUES[piece_type]
+            counts = attack_counts[color]
+            least = least_attacker[color]
+            for r, c in targets:
+                sq = r * 8 + c
+                counts[sq] += 1
+                if not least[sq] or value < least[sq]:
+                    least[sq] = value
+            if piece_type != 'p' and piece_type != 'K':
+                mobility[color] += sum(1 for r, c in targets if board[r][c][0] != color)
+    return {color: (attack_counts[color], least_attacker[color], mobility[color]) for color in ('w', 'b')}
+
 def find_king(board, color):
     """
     Finds the position of the king for the given color.
@@ -405,4 +642,314 @@ def find_king(board, color):
         for col in range(8):
             if board[row][col] == color + 'K':
                 return (row, col)
-    return None
\ No newline at end of file
+    return None
+
+def castling_mask(castling_rights):
+    """
+    Packs castling rights into four bits: 1 white king side, 2 white queen side,
+    4 black king side, 8 black queen side (the layout bitboard.Position uses).
+    """
+    return ((castling_rights['w']['king_side'] and 1) | (castling_rights['w']['queen_side'] and 2)
+            | (castling_rights['b']['king_side'] and 4) | (castling_rights['b']['queen_side'] and 8))
+
+def compute_zobrist_hash(board, turn, en_passant_possible, castling_rights):
+    """
+    Computes the Zobrist hash of a position from scratch.
+    Covers pieces, side to move, castling rights and the en passant file.
+    """
+    h = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != '--':
+                h ^= ZOBRIST_PIECE_KEYS[piece][row * 8 + col]
+    if turn == 'b':
+        h ^= ZOBRIST_SIDE_KEY
+    if en_passant_possible:
+        h ^= ZOBRIST_EN_PASSANT_KEYS[en_passant_possible[1]]
+    h ^= ZOBRIST_CASTLING_KEYS[castling_mask(castling_rights)]
+    return h
+
+def update_zobrist_hash(h, move_record, new_en_passant_possible, new_castling_rights):
+    """
+    Returns the hash after the move described by a make_move undo record.
+    Only the squares and state the move touched are XORed in and out.
+    """
+    (start_pos, end_pos, piece_moved, piece_captured, captured_pos,
+     en_passant_possible, castling_rights, rook_move, promoted) = move_record
+    keys = ZOBRIST_PIECE_KEYS
+    h ^= keys[piece_moved][start_pos[0] * 8 + start_pos[1]]
+    h ^= keys[promoted or piece_moved][end_pos[0] * 8 + end_pos[1]]
+    if piece_captured != '--':
+        h ^= keys[piece_captured][captured_pos[0] * 8 + captured_pos[1]]
+    if rook_move is not None:
+        rook_keys = keys[piece_moved[0] + 'R']
+        (row, rook_from_col), (_, rook_to_col) = rook_move
+        h ^= rook_keys[row * 8 + rook_from_col] ^ rook_keys[row * 8 + rook_to_col]
+    if en_passant_possible:
+        h ^= ZOBRIST_EN_PASSANT_KEYS[en_passant_possible[1]]
+    if new_en_passant_possible:
+        h ^= ZOBRIST_EN_PASSANT_KEYS[new_en_passant_possible[1]]
+    if new_castling_rights != castling_rights:
+        h ^= ZOBRIST_CASTLING_KEYS[castling_mask(castling_rights)]
+        h ^= ZOBRIST_CASTLING_KEYS[castling_mask(new_castling_rights)]
+    return h ^ ZOBRIST_SIDE_KEY
+
+FEN_PIECES = {
+    'P': 'wp', 'N': 'wN', 'B': 'wB', 'R': 'wR', 'Q': 'wQ', 'K': 'wK',
+    'p': 'bp', 'n': 'bN', 'b': 'bB', 'r': 'bR', 'q': 'bQ', 'k': 'bK'
+}
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+def square_to_algebraic(pos):
+    """
+    Converts a (row, col) tuple to a square name such as 'e4'.
+    """
+    return 'abcdefgh'[pos[1]] + str(8 - pos[0])
+
+def algebraic_to_square(name):
+    """
+    Converts a square name such as 'e4' to a (row, col) tuple.
+    """
+    if len(name) != 2 or name[0] not in 'abcdefgh' or name[1] not in '12345678':
+        raise ValueError(f'Invalid square: {name!r}')
+    return (8 - int(name[1]), 'abcdefgh'.index(name[0]))
+
+def move_to_uci(move, promotion=None):
+    """
+    Formats a ((row, col), (row, col)) move in long algebraic form, e.g. 'e2e4' or 'e7e8q'.
+    """
+    text = square_to_algebraic(move[0]) + square_to_algebraic(move[1])
+    if promotion:
+        text += promotion.lower()
+    return text
+
+def board_from_fen(fen):
+    """
+    Parses a FEN string.
+    Returns (board, turn, en_passant_possible, castling_rights).
+    """
+    fields = fen.split()
+    if not fields:
+        raise ValueError('Empty FEN')
+    board = []
+    for rank in fields[0].split('/'):
+        row = []
+        for char in rank:
+            if char.isdigit():
+                row.extend(['--'] * int(char))
+            elif char in FEN_PIECES:
+                row.append(FEN_PIECES[char])
+            else:
+                raise ValueError(f'Invalid piece {char!r} in FEN: {fen!r}')
+        if len(row) != 8:
+            raise ValueError(f'Rank {rank!r} does not have 8 squares in FEN: {fen!r}')
+        board.append(row)
+    if len(board) != 8:
+        raise ValueError(f'FEN does not have 8 ranks: {fen!r}')
+    turn = fields[1] if len(fields) > 1 else 'w'
+    castling = fields[2] if len(fields) > 2 else '-'
+    en_passant = fields[3] if len(fields) > 3 else '-'
+    castling_rights = {
+        'w': {'king_side': 'K' in castling, 'queen_side': 'Q' in castling},
+        'b': {'king_side': 'k' in castling, 'queen_side': 'q' in castling}
+    }
+    en_passant_possible = algebraic_to_square(en_passant) if en_passant != '-' else ()
+    return board, turn, en_passant_possible, castling_rights
+
+def initial_castling_rights():
+    """
+    Returns castling rights with every castle still available.
+    """
+    return {
+        'w': {'king_side': True, 'queen_side': True},
+        'b': {'king_side': True, 'queen_side': True}
+    }
+
+class GameState:
+    """
+    Mutable game state for searching a single board with make/unmake.
+    Exposes the same interface as bitboard.Position so either can back the search.
+    """
+
+    def __init__(self, board, turn='w', en_passant_possible=(), castling_rights=None, move_log=None):
+        self.board = board
+        self.turn = turn
+        self.en_passant_possible = en_passant_possible
+        self.castling_rights = castling_rights if castling_rights is not None else initial_castling_rights()
+        self.move_log = move_log if move_log is not None else []
+        self.null_moves = []
+        self.zobrist_hash = compute_zobrist_hash(board, turn, en_passant_possible, self.castling_rights)
+        # Running material + piece-square score (white's point of view) and game phase
+        self.psqt_mg, self.psqt_eg, self.phase = compute_psqt(board)
+        # (zobrist_hash, psqt_mg, psqt_eg, phase) before each move, for unmake
+        self.history = []
+        # (zobrist_hash, legal moves) of the last position generated for the side to move,
+        # so splitting it into captures and quiet moves costs a single generation
+        self.move_cache = None
+        # Optional nnue.Accumulator, kept in step with make/unmake
+        self.accumulator = None
+
+    @classmethod
+    def from_board(cls, board, turn='w', en_passant_possible=(), castling_rights=None):
+        """
+        Builds a GameState on a copy of the given board.
+        """
+        castling_rights = copy_castling_rights(castling_rights) if castling_rights is not None else None
+        return cls([row[:] for row in board], turn, en_passant_possible, castling_rights)
+
+    def to_board(self):
+        """
+        Returns a copy of the current board.
+        """
+        return [row[:] for row in self.board]
+
+    def make_move(self, start_pos, end_pos, promotion='Q'):
+        """
+        Plays a move in place and returns the captured piece ('--' if none).
+        """
+        piece_captured, self.en_passant_possible, self.castling_rights = make_move(
+            self.board, start_pos, end_pos, self.en_passant_possible, self.castling_rights,
+            self.move_log, promotion
+        )
+        record = self.move_log[-1]
+        self.history.append((self.zobrist_hash, self.psqt_mg, self.psqt_eg, self.phase))
+        self.zobrist_hash = update_zobrist_hash(self.zobrist_hash, record,
+                                                self.en_passant_possible, self.castling_rights)
+        self._update_psqt(record)
+        if self.accumulator is not None:
+            self._update_accumulator(record)
+        self.turn = 'b' if self.turn == 'w' else 'w'
+        return piece_captured
+
+    def _update_accumulator(self, record):
+        """
+        Passes the pieces the move took off and put on the board to the NNUE accumulator.
+        """
+        start_pos, end_pos, piece_moved, piece_captured, captured_pos, _, _, rook_move, promoted = record
+        removed = [(piece_moved, start_pos[0] * 8 + start_pos[1])]
+        added = [(promoted or piece_moved, end_pos[0] * 8 + end_pos[1])]
+        if piece_captured != '--':
+            removed.append((piece_captured, captured_pos[0] * 8 + captured_pos[1]))
+        if rook_move is not None:
+            rook = piece_moved[0] + 'R'
+            (row, rook_from_col), (_, rook_to_col) = rook_move
+            removed.append((rook, row * 8 + rook_from_col))
+            added.append((rook, row * 8 + rook_to_col))
+        self.accumulator.push(self.board, removed, added)
+
+    def _update_psqt(self, record):
+        """
+        Moves the running piece-square score by only the squares the move touched.
+        """
+        start_pos, end_pos, piece_moved, piece_captured, captured_pos, _, _, rook_move, promoted = record
+        from_sq = start_pos[0] * 8 + start_pos[1]
+        to_sq = end_pos[0] * 8 + end_pos[1]
+        placed = promoted or piece_moved
+        middlegame = self.psqt_mg + PSQT_MIDDLEGAME[placed][to_sq] - PSQT_MIDDLEGAME[piece_moved][from_sq]
+        endgame = self.psqt_eg + PSQT_ENDGAME[placed][to_sq] - PSQT_ENDGAME[piece_moved][from_sq]
+        if promoted:
+            self.phase += PIECE_PHASE[promoted]
+        if piece_captured != '--':
+            captured_sq = captured_pos[0] * 8 + captured_pos[1]
+            middlegame -= PSQT_MIDDLEGAME[piece_captured][captured_sq]
+            endgame -= PSQT_ENDGAME[piece_captured][captured_sq]
+            self.phase -= PIECE_PHASE[piece_captured]
+        if rook_move is not None:
+            rook = piece_moved[0] + 'R'
+            (row, rook_from_col), (_, rook_to_col) = rook_move
+            middlegame += PSQT_MIDDLEGAME[rook][row * 8 + rook_to_col] - PSQT_MIDDLEGAME[rook][row * 8 + rook_from_col]
+            endgame += PSQT_ENDGAME[rook][row * 8 + rook_to_col] - PSQT_ENDGAME[rook][row * 8 + rook_from_col]
+        self.psqt_mg = middlegame
+        self.psqt_eg = endgame
+
+    def unmake_move(self):
+        """
+        Restores the state to exactly what it was before the last make_move.
+        """
+        self.en_passant_possible, self.castling_rights = unmake_move(self.board, self.move_log)
+        self.zobrist_hash, self.psqt_mg, self.psqt_eg, self.phase = self.history.pop()
+        if self.accumulator is not None:
+            self.accumulator.pop()
+        self.turn = 'b' if self.turn == 'w' else 'w'
+
+    def make_null_move(self):
+        """
+        Passes the turn to the opponent without moving a piece.
+        """
+        self.null_moves.append((self.en_passant_possible, self.zobrist_hash))
+        if self.en_passant_possible:
+            self.zobrist_hash ^= ZOBRIST_EN_PASSANT_KEYS[self.en_passant_possible[1]]
+        self.zobrist_hash ^= ZOBRIST_SIDE_KEY
+        self.en_passant_possible = ()
+        self.turn = 'b' if self.turn == 'w' else 'w'
+
+    def unmake_null_move(self):
+        """
+        Reverses the last make_null_move.
+        """
+        self.en_passant_possible, self.zobrist_hash = self.null_moves.pop()
+        self.turn = 'b' if self.turn == 'w' else 'w'
+
+    def in_check(self, color=None):
+        """
+        Determines if the given side (default: side to move) is in check.
+        """
+        return in_check(self.board, color or self.turn)
+
+    def get_valid_moves(self, pos):
+        """
+        Returns the legal destination squares for the piece at the given position.
+        """
+        return get_valid_moves(self.board, pos, self.turn, self.en_passant_possible, self.castling_rights)
+
+    def is_valid_move(self, start_pos, end_pos):
+        """
+        Checks if moving from start_pos to end_pos is legal for the side to move.
+        """
+        return is_valid_move(self.board, start_pos, end_pos, self.turn,
+                             self.en_passant_possible, self.castling_rights)
+
+    def get_all_possible_moves(self, color=None):
+        """
+        Returns all legal moves for the given side (default: side to move).
+        """
+        if color is not None and color != self.turn:
+            return get_all_possible_moves(self.board, color, self.en_passant_possible, self.castling_rights)
+        if self.move_cache is None or self.move_cache[0] != self.zobrist_hash:
+            self.move_cache = (self.zobrist_hash, get_all_possible_moves(
+                self.board, self.turn, self.en_passant_possible, self.castling_rights))
+        return list(self.move_cache[1])
+
+    def attack_maps(self):
+        """
+        Returns both sides' attack maps; see compute_attack_maps.
+        """
+        return compute_attack_maps(self.board)
+
+    def get_capture_moves(self, color=None):
+        """
+        Returns all legal captures, including en passant, for the given side.
+        """
+        color = color or self.turn
+        board = self.board
+        capture_moves = []
+        for start_pos, end_pos in self.get_all_possible_moves(color):
+            if board[end_pos[0]][end_pos[1]] != '--':
+                capture_moves.append((start_pos, end_pos))
+            elif board[start_pos[0]][start_pos[1]][1] == 'p' and end_pos == self.en_passant_possible:
+                capture_moves.append((start_pos, end_pos))
+        return capture_moves
+
+    def get_quiet_moves(self, color=None):
+        """
+        Returns all legal non-captures, castling included, for the given side.
+        """
+        color = color or self.turn
+        board = self.board
+        quiet_moves = []
+        for start_pos, end_pos in self.get_all_possible_moves(color):
+            if board[end_pos[0]][end_pos[1]] == '--' and not (
+                    board[start_pos[0]][start_pos[1]][1] == 'p' and end_pos == self.en_passant_possible):
+                quiet_moves.append((start_pos, end_pos))
+        return quiet_moves
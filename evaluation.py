@@ -0,0 +1,149 @@
+# evaluation.py
+#
+# Material and piece-square tables, plus the running (incremental) material and
+# piece-square score that the search states update on make/unmake. Tables are
+# written from white's point of view with row 0 being the eighth rank; black
+# pieces read them mirrored.
+
+PIECE_VALUES = {
+    'p': 100,
+    'N': 320,
+    'B': 330,
+    'R': 500,
+    'Q': 900,
+    'K': 20000
+}
+
+PAWN_TABLE = [
+    [0,   0,   0,   0,   0,   0,   0,   0],
+    [50,  50,  50,  50,  50,  50,  50,  50],
+    [10,  10,  20,  30,  30,  20,  10,  10],
+    [5,   5,  10,  25,  25,  10,   5,   5],
+    [0,   0,   0,  20,  20,   0,   0,   0],
+    [5,  -5, -10,   0,   0, -10,  -5,   5],
+    [5,  10,  10, -20, -20,  10,  10,   5],
+    [0,   0,   0,   0,   0,   0,   0,   0]
+]
+
+KNIGHT_TABLE = [
+    [-50, -40, -30, -30, -30, -30, -40, -50],
+    [-40, -20,   0,   0,   0,   0, -20, -40],
+    [-30,   0,  10,  15,  15,  10,   0, -30],
+    [-30,   5,  15,  20,  20,  15,   5, -30],
+    [-30,   0,  15,  20,  20,  15,   0, -30],
+    [-30,   5,  10,  15,  15,  10,   5, -30],
+    [-40, -20,   0,   5,   5,   0, -20, -40],
+    [-50, -40, -30, -30, -30, -30, -40, -50]
+]
+
+BISHOP_TABLE = [
+    [-20, -10, -10, -10, -10, -10, -10, -20],
+    [-10,   0,   0,   0,   0,   0,   0, -10],
+    [-10,   0,   5,  10,  10,   5,   0, -10],
+    [-10,   5,   5,  10,  10,   5,   5, -10],
+    [-10,   0,  10,  10,  10,  10,   0, -10],
+    [-10,  10,  10,  10,  10,  10,  10, -10],
+    [-10,   5,   0,   0,   0,   0,   5, -10],
+    [-20, -10, -10, -10, -10, -10, -10, -20]
+]
+
+ROOK_TABLE = [
+    [0,   0,   0,   0,   0,   0,   0,   0],
+    [5,  10,  10,  10,  10,  10,  10,   5],
+    [-5,   0,   0,   0,   0,   0,   0,  -5],
+    [-5,   0,   0,   0,   0,   0,   0,  -5],
+    [-5,   0,   0,   0,   0,   0,   0,  -5],
+    [-5,   0,   0,   0,   0,   0,   0,  -5],
+    [-5,   0,   0,   0,   0,   0,   0,  -5],
+    [0,   0,   0,   5,   5,   0,   0,   0]
+]
+
+QUEEN_TABLE = [
+    [-20, -10, -10,  -5,  -5, -10, -10, -20],
+    [-10,   0,   0,   0,   0,   0,   0, -10],
+    [-10,   0,   5,   5,   5,   5,   0, -10],
+    [ -5,   0,   5,   5,   5,   5,   0,  -5],
+    [  0,   0,   5,   5,   5,   5,   0,  -5],
+    [-10,   5,   5,   5,   5,   5,   0, -10],
+    [-10,   0,   5,   0,   0,   0,   0, -10],
+    [-20, -10, -10,  -5,  -5, -10, -10, -20]
+]
+
+KING_TABLE = [
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-30, -40, -40, -50, -50, -40, -40, -30],
+    [-20, -30, -30, -40, -40, -30, -30, -20],
+    [-10, -20, -20, -20, -20, -20, -20, -10],
+    [20,   20,   0,   0,   0,   0,  20,  20],
+    [20,   30,  10,   0,   0,  10,  30,  20]
+]
+
+KING_ENDGAME_TABLE = [
+    [-50, -40, -30, -20, -20, -30, -40, -50],
+    [-30, -20, -10,   0,   0, -10, -20, -30],
+    [-30, -10,  20,  30,  30,  20, -10, -30],
+    [-30, -10,  30,  40,  40,  30, -10, -30],
+    [-30, -10,  30,  40,  40,  30, -10, -30],
+    [-30, -10,  20,  30,  30,  20, -10, -30],
+    [-30, -30,   0,   0,   0,   0, -30, -30],
+    [-50, -30, -30, -30, -30, -30, -30, -50]
+]
+
+MIDDLEGAME_TABLES = {
+    'p': PAWN_TABLE, 'N': KNIGHT_TABLE, 'B': BISHOP_TABLE,
+    'R': ROOK_TABLE, 'Q': QUEEN_TABLE, 'K': KING_TABLE
+}
+ENDGAME_TABLES = dict(MIDDLEGAME_TABLES, K=KING_ENDGAME_TABLE)
+
+# Pawn structure terms, per pawn
+ISOLATED_PAWN_PENALTY = 20
+DOUBLED_PAWN_PENALTY = 15
+PASSED_PAWN_BONUS = 30
+
+# Game phase runs from MAX_PHASE (all minor and major pieces on) down to 0
+PHASE_WEIGHTS = {'p': 0, 'N': 1, 'B': 1, 'R': 2, 'Q': 4, 'K': 0}
+MAX_PHASE = 24
+
+
+def _build_piece_square_scores(tables):
+    """
+    Builds PIECE[piece][row * 8 + col] = material + positional value, signed so
+    white pieces count positive and black pieces negative. Kings carry no material.
+    """
+    scores = {}
+    for piece_type, table in tables.items():
+        material = PIECE_VALUES[piece_type] if piece_type != 'K' else 0
+        scores['w' + piece_type] = [material + table[sq >> 3][sq & 7] for sq in range(64)]
+        scores['b' + piece_type] = [-(material + table[7 - (sq >> 3)][sq & 7]) for sq in range(64)]
+    return scores
+
+
+PSQT_MIDDLEGAME = _build_piece_square_scores(MIDDLEGAME_TABLES)
+PSQT_ENDGAME = _build_piece_square_scores(ENDGAME_TABLES)
+PIECE_PHASE = {color + piece_type: weight for piece_type, weight in PHASE_WEIGHTS.items() for color in 'wb'}
+
+
+def compute_psqt(board):
+    """
+    Computes the material and piece-square score from scratch.
+    Returns (middlegame, endgame, phase), with scores from white's point of view.
+    """
+    middlegame = endgame = phase = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece != '--':
+                middlegame += PSQT_MIDDLEGAME[piece][row * 8 + col]
+                endgame += PSQT_ENDGAME[piece][row * 8 + col]
+                phase += PIECE_PHASE[piece]
+    return middlegame, endgame, phase
+
+
+def tapered_score(middlegame, endgame, phase):
+    """
+    Blends the middlegame and endgame scores by the remaining material.
+    """
+    phase = min(phase, MAX_PHASE)
+    return (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
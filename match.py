@@ -0,0 +1,399 @@
+# match.py
+#
+# Headless self-play between two Bot configurations, for measuring whether a
+# change is stronger. Games run across a process pool from an opening suite,
+# each opening played twice with colors swapped, and the run stops early once
+# a sequential probability ratio test (SPRT) decides.
+#
+#   python match.py --engine1 use_bitboards=true --engine2 use_bitboards=false --tc 10+0.1
+#   python match.py --engine1 name=new,hash_mb=32 --engine2 name=old --nodes 20000 --games 2000
+#   python match.py ... --openings suite.txt --pgn games.pgn --elo0 0 --elo1 5
+#
+# An engine is a comma-separated list of Bot keyword arguments (plus name=...).
+# Opening files hold one opening per line: a FEN, or moves in long algebraic form.
+
+import argparse
+import math
+import multiprocessing
+import time
+from bot import Bot
+from chess_logic import (
+    GameState, STARTING_FEN, board_from_fen, get_all_possible_moves, in_check, square_to_algebraic
+)
+from uci import parse_move
+
+DEFAULT_OPENINGS = [
+    'e2e4 e7e5 g1f3 b8c6 f1b5 a7a6',
+    'e2e4 e7e5 g1f3 b8c6 f1c4 f8c5',
+    'e2e4 c7c5 g1f3 d7d6 d2d4 c5d4',
+    'e2e4 c7c5 b1c3 b8c6 g2g3',
+    'e2e4 e7e6 d2d4 d7d5 b1c3 g8f6',
+    'e2e4 c7c6 d2d4 d7d5 e4e5 c8f5',
+    'd2d4 d7d5 c2c4 e7e6 b1c3 g8f6',
+    'd2d4 d7d5 c2c4 c7c6 g1f3 g8f6',
+    'd2d4 g8f6 c2c4 g7g6 b1c3 f8g7',
+    'd2d4 g8f6 c2c4 e7e6 g1f3 b7b6',
+    'c2c4 e7e5 b1c3 g8f6 g2g3',
+    'g1f3 d7d5 g2g3 g8f6 f1g2',
+]
+
+# Games still going after this many plies are scored as draws
+MAX_GAME_PLIES = 400
+FIFTY_MOVE_PLIES = 100
+
+
+def parse_engine(spec):
+    """
+    Reads 'name=x,key=value,...' into (name, Bot keyword arguments).
+    Values are read as booleans, numbers or strings.
+    """
+    options = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        key, _, value = item.partition('=')
+        if value.lower() in ('true', 'false'):
+            value = value.lower() == 'true'
+        else:
+            for convert in (int, float):
+                try:
+                    value = convert(value)
+                    break
+                except ValueError:
+                    pass
+        options[key.strip()] = value
+    name = str(options.pop('name', spec or 'default'))
+    if options.get('threads', 1) != 1:
+        raise ValueError('match games run in pool workers, which cannot start Lazy SMP helpers: use threads=1')
+    return name, options
+
+
+def read_openings(path):
+    """
+    Returns the openings in a file, skipping blank lines and '#' comments.
+    """
+    with open(path) as openings_file:
+        return [line.strip() for line in openings_file if line.strip() and not line.startswith('#')]
+
+
+def opening_position(opening):
+    """
+    Plays out an opening line. Returns (state, start FEN, moves as (move, promotion)).
+    """
+    if '/' in opening:
+        return GameState(*board_from_fen(opening)), opening, []
+    state = GameState(*board_from_fen(STARTING_FEN))
+    moves = []
+    for text in opening.split():
+        move, promotion = parse_move(text)
+        if not state.is_valid_move(*move):
+            raise ValueError(f'illegal opening move {text} in: {opening}')
+        moves.append((move, promotion))
+        state.make_move(move[0], move[1], promotion or 'Q')
+    return state, STARTING_FEN, moves
+
+
+def move_to_san(state, move, promotion=None):
+    """
+    Formats a legal move in standard algebraic notation, with check and mate marks.
+    """
+    (start_row, start_col), end_pos = move
+    board = state.board
+    piece = board[start_row][start_col]
+    target = board[end_pos[0]][end_pos[1]]
+    if piece[1] == 'K' and abs(end_pos[1] - start_col) == 2:
+        san = 'O-O' if end_pos[1] > start_col else 'O-O-O'
+    elif piece[1] == 'p':
+        san = ''
+        if start_col != end_pos[1]:
+            san = square_to_algebraic(move[0])[0] + 'x'
+        san += square_to_algebraic(end_pos)
+        if end_pos[0] in (0, 7):
+            san += '=' + (promotion or 'Q')
+    else:
+        others = [start for start, end in state.get_all_possible_moves()
+                  if end == end_pos and start != move[0] and board[start[0]][start[1]] == piece]
+        origin = square_to_algebraic(move[0])
+        qualifier = ''
+        if others:
+            if all(start[1] != start_col for start in others):
+                qualifier = origin[0]
+            elif all(start[0] != start_row for start in others):
+                qualifier = origin[1]
+            else:
+                qualifier = origin
+        san = piece[1] + qualifier + ('x' if target != '--' else '') + square_to_algebraic(end_pos)
+
+    state.make_move(move[0], end_pos, promotion or 'Q')
+    if state.in_check():
+        san += '#' if not state.get_all_possible_moves() else '+'
+    state.unmake_move()
+    return san
+
+
+def insufficient_material(board):
+    """
+    Checks for positions no sequence of moves can mate in: bare kings, or a single minor piece.
+    """
+    pieces = [piece[1] for row in board for piece in row if piece != '--' and piece[1] != 'K']
+    return not pieces or (len(pieces) == 1 and pieces[0] in 'NB')
+
+
+def play_game(task):
+    """
+    Plays one game in a pool worker. task is (game number, opening, white
+    (name, options), black (name, options), limits). Returns (game number,
+    result from white's point of view as '1-0'/'0-1'/'1/2-1/2', reason, PGN text).
+    """
+    number, opening, white, black, limits = task
+    state, start_fen, opening_moves = opening_position(opening)
+    bots = {}
+    for color, (_, options) in (('w', white), ('b', black)):
+        bot = Bot(color, **options)
+        if limits['nodes']:
+            bot.max_nodes = limits['nodes']
+            bot.time_limit = float('inf')
+        elif limits['movetime']:
+            bot.time_limit = limits['movetime']
+        if limits['depth']:
+            bot.max_depth = limits['depth']
+            if not limits['nodes'] and not limits['movetime'] and not limits['tc']:
+                bot.time_limit = float('inf')
+        bots[color] = bot
+    clocks = {'w': limits['tc'][0], 'b': limits['tc'][0]} if limits['tc'] else None
+
+    # Replay the opening for the PGN, the repetition history and the fifty-move count
+    replay = GameState(*board_from_fen(start_fen))
+    fields = start_fen.split()
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    repetitions = {replay.zobrist_hash: 1}
+    sans = []
+    for move, promotion in opening_moves:
+        (start_row, start_col), _ = move
+        piece = replay.board[start_row][start_col]
+        sans.append(move_to_san(replay, move, promotion))
+        captured = replay.make_move(move[0], move[1], promotion or 'Q')
+        halfmove_clock = 0 if piece[1] == 'p' or captured != '--' else halfmove_clock + 1
+        repetitions[replay.zobrist_hash] = repetitions.get(replay.zobrist_hash, 0) + 1
+    result, reason = '1/2-1/2', 'adjudicated after the ply limit'
+
+    try:
+        for _ in range(MAX_GAME_PLIES):
+            turn = state.turn
+            if not get_all_possible_moves(state.board, turn, state.en_passant_possible, state.castling_rights):
+                if in_check(state.board, turn):
+                    result, reason = ('0-1' if turn == 'w' else '1-0'), 'checkmate'
+                else:
+                    reason = 'stalemate'
+                break
+            if insufficient_material(state.board):
+                reason = 'insufficient material'
+                break
+            if halfmove_clock >= FIFTY_MOVE_PLIES:
+                reason = 'fifty-move rule'
+                break
+
+            bot = bots[turn]
+            started = time.time()
+            if clocks is not None:
+                move = bot.get_move(state.board, state.en_passant_possible, state.castling_rights,
+                                    state.move_log, clocks[turn], limits['tc'][1])
+                clocks[turn] -= time.time() - started
+                if clocks[turn] < 0:
+                    result, reason = ('0-1' if turn == 'w' else '1-0'), 'time forfeit'
+                    break
+                clocks[turn] += limits['tc'][1]
+            else:
+                move = bot.get_move(state.board, state.en_passant_possible, state.castling_rights,
+                                    state.move_log)
+
+            (start_row, start_col), end_pos = move
+            piece = state.board[start_row][start_col]
+            sans.append(move_to_san(state, move))
+            captured = state.make_move(*move)
+            halfmove_clock = 0 if piece[1] == 'p' or captured != '--' else halfmove_clock + 1
+            repetitions[state.zobrist_hash] = repetitions.get(state.zobrist_hash, 0) + 1
+            if repetitions[state.zobrist_hash] >= 3:
+                reason = 'threefold repetition'
+                break
+    finally:
+        for bot in bots.values():
+            bot.close()
+
+    return number, result, reason, format_pgn(number, white[0], black[0], start_fen, sans, result, reason)
+
+
+def format_pgn(number, white, black, start_fen, sans, result, reason):
+    """
+    Formats a finished game as PGN.
+    """
+    tags = [('Event', 'Self-play match'), ('Site', '?'), ('Date', '????.??.??'),
+            ('Round', str(number + 1)), ('White', white),
+            ('Black', black), ('Result', result), ('Termination', reason)]
+    if start_fen != STARTING_FEN:
+        tags += [('SetUp', '1'), ('FEN', start_fen)]
+    fields = start_fen.split()
+    turn = fields[1]
+    move_number = int(fields[5]) if len(fields) > 5 else 1
+    tokens = []
+    for i, san in enumerate(sans):
+        if turn == 'w':
+            tokens.append(f'{move_number}.')
+        elif i == 0:
+            tokens.append(f'{move_number}...')
+        tokens.append(san)
+        if turn == 'b':
+            move_number += 1
+        turn = 'b' if turn == 'w' else 'w'
+    tokens.append(result)
+
+    lines = [f'[{name} "{value}"]' for name, value in tags] + ['']
+    line = ''
+    for token in tokens:
+        if len(line) + len(token) + 1 > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def elo_from_score(score):
+    """
+    Elo difference corresponding to an expected score between 0 and 1.
+    """
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_from_elo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def match_statistics(wins, draws, losses):
+    """
+    Returns (Elo, 95% error margin) for engine 1 from its wins, draws and losses.
+    """
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, float('inf')
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    elo = elo_from_score(score)
+    return elo, (elo_from_score(score + margin) - elo_from_score(score - margin)) / 2
+
+
+def sprt(wins, draws, losses, elo0, elo1, alpha=0.05, beta=0.05):
+    """
+    Generalized SPRT of H0: Elo = elo0 against H1: Elo = elo1 on the game
+    results. Returns (log-likelihood ratio, lower bound, upper bound); the
+    test accepts H1 above the upper bound and H0 below the lower one.
+    """
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, lower, upper
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance == 0:
+        return 0.0, lower, upper
+    score0, score1 = score_from_elo(elo0), score_from_elo(elo1)
+    llr = games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+    return llr, lower, upper
+
+
+def run_match(engine1, engine2, openings, games, limits, workers, pgn_path=None,
+              elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05, report=print):
+    """
+    Plays up to games games between two engines given as (name, Bot options),
+    each opening once per color, and stops early when the SPRT decides.
+    Returns (wins, draws, losses) for engine1.
+    """
+    tasks = []
+    for number in range(games):
+        opening = openings[(number // 2) % len(openings)]
+        if number % 2 == 0:
+            tasks.append((number, opening, engine1, engine2, limits))
+        else:
+            tasks.append((number, opening, engine2, engine1, limits))
+
+    wins = draws = losses = 0
+    pgn_file = open(pgn_path, 'a') if pgn_path else None
+    pool = multiprocessing.Pool(workers)
+    try:
+        for number, result, reason, pgn in pool.imap_unordered(play_game, tasks):
+            engine1_white = number % 2 == 0
+            if result == '1/2-1/2':
+                draws += 1
+            elif (result == '1-0') == engine1_white:
+                wins += 1
+            else:
+                losses += 1
+            if pgn_file is not None:
+                pgn_file.write(pgn)
+                pgn_file.flush()
+            elo, margin = match_statistics(wins, draws, losses)
+            llr, lower, upper = sprt(wins, draws, losses, elo0, elo1, alpha, beta)
+            report(f'Game {wins + draws + losses}/{games} ({result}, {reason}): '
+                   f'+{wins} ={draws} -{losses}  Elo {elo:+.1f} +/- {margin:.1f}  '
+                   f'LLR {llr:.2f} [{lower:.2f}, {upper:.2f}]')
+            if llr >= upper or llr <= lower:
+                report(f'SPRT: {"H1" if llr >= upper else "H0"} accepted '
+                       f'(elo0 {elo0:g}, elo1 {elo1:g})')
+                pool.terminate()
+                break
+    finally:
+        pool.terminate()
+        pool.join()
+        if pgn_file is not None:
+            pgn_file.close()
+    return wins, draws, losses
+
+
+def parse_time_control(text):
+    """
+    Reads 'base+increment' in seconds, e.g. '10+0.1'.
+    """
+    base, _, increment = text.partition('+')
+    return float(base), float(increment or 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play two bot configurations against each other.')
+    parser.add_argument('--engine1', default='', help="first engine, e.g. 'name=new,use_bitboards=true'")
+    parser.add_argument('--engine2', default='', help='second engine (the baseline)')
+    parser.add_argument('--games', type=int, default=1000, help='maximum number of games')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help='games played in parallel')
+    parser.add_argument('--openings', help='opening suite file (default: a small built-in suite)')
+    parser.add_argument('--pgn', help='file to append the games to')
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument('--tc', type=parse_time_control, help="clock per side, 'base+increment' in seconds")
+    limit.add_argument('--movetime', type=float, help='seconds per move')
+    limit.add_argument('--nodes', type=int, help='nodes per move')
+    parser.add_argument('--depth', type=int, help='maximum depth per move')
+    parser.add_argument('--elo0', type=float, default=0.0, help='SPRT null hypothesis Elo')
+    parser.add_argument('--elo1', type=float, default=5.0, help='SPRT alternative hypothesis Elo')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    try:
+        engine1 = parse_engine(args.engine1 or 'name=engine1')
+        engine2 = parse_engine(args.engine2 or 'name=engine2')
+    except ValueError as error:
+        parser.error(str(error))
+    openings = read_openings(args.openings) if args.openings else DEFAULT_OPENINGS
+    limits = {'tc': args.tc, 'movetime': args.movetime, 'nodes': args.nodes, 'depth': args.depth}
+    if not any(limits.values()):
+        limits['tc'] = (10.0, 0.1)
+
+    wins, draws, losses = run_match(engine1, engine2, openings, args.games, limits, max(1, args.workers),
+                                    args.pgn, args.elo0, args.elo1, args.alpha, args.beta)
+    elo, margin = match_statistics(wins, draws, losses)
+    print(f'{engine1[0]} vs {engine2[0]}: +{wins} ={draws} -{losses}  Elo {elo:+.1f} +/- {margin:.1f}')
+
+
+if __name__ == '__main__':
+    main()
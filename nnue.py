@@ -0,0 +1,237 @@
+# nnue.py
+#
+# Efficiently updatable neural network evaluation (NNUE), computed with NumPy.
+#
+# Input features are HalfKP-like: for each side's point of view, every
+# non-king piece is a feature keyed by that side's king square, the piece's
+# kind relative to the viewer, and its square. The first layer's output (the
+# accumulator) is kept per side and moved along with make/unmake by adding
+# and subtracting weight rows, so only the small dense layers run per
+# evaluation. Updates are deferred until a position is evaluated. A king
+# move changes every feature of its own side's view, so that view is
+# rebuilt from the board instead.
+#
+# Weights are quantized: int16 for the feature layer, int8 for the dense
+# layers, int32 biases. The network file is a small header followed by the
+# raw little-endian arrays in the order of Network.ARRAYS.
+
+import struct
+import numpy as np
+
+MAGIC = b'NNUE'
+VERSION = 1
+HEADER = struct.Struct('<4sIIII')  # magic, version, hidden, layer 1, layer 2
+
+PIECE_KINDS = 'pNBRQ'
+FEATURES_PER_KING = len(PIECE_KINDS) * 2 * 64
+INPUTS = 64 * FEATURES_PER_KING
+
+# Activations are clipped to [0, ACTIVATION_MAX]; dense layers shift their
+# int32 sums down by WEIGHT_SHIFT to get back to that range
+ACTIVATION_MAX = 127
+WEIGHT_SHIFT = 6
+OUTPUT_SCALE = 16  # Network output units per centipawn
+
+
+def orient(color, sq):
+    """
+    Square as seen from color's side: black's view is mirrored top to bottom.
+    """
+    return sq if color == 'w' else sq ^ 56
+
+
+def feature_index(perspective, king_sq, piece, sq):
+    """
+    Input feature of piece on sq, seen from perspective with its king on king_sq.
+    """
+    kind = PIECE_KINDS.index(piece[1]) * 2 + (piece[0] != perspective)
+    return orient(perspective, king_sq) * FEATURES_PER_KING + kind * 64 + orient(perspective, sq)
+
+
+class Network:
+    """
+    Quantized weights of a HalfKP-like network: a feature layer of hidden
+    units per side, two clipped-ReLU dense layers and a single output.
+    """
+
+    ARRAYS = (('feature_weights', np.int16), ('feature_bias', np.int16),
+              ('l1_weights', np.int8), ('l1_bias', np.int32),
+              ('l2_weights', np.int8), ('l2_bias', np.int32),
+              ('output_weights', np.int8), ('output_bias', np.int32))
+
+    def __init__(self, hidden=256, l1=32, l2=32):
+        self.hidden, self.l1, self.l2 = hidden, l1, l2
+        self.feature_weights = np.zeros((INPUTS, hidden), dtype=np.int16)
+        self.feature_bias = np.zeros(hidden, dtype=np.int16)
+        self.l1_weights = np.zeros((2 * hidden, l1), dtype=np.int8)
+        self.l1_bias = np.zeros(l1, dtype=np.int32)
+        self.l2_weights = np.zeros((l1, l2), dtype=np.int8)
+        self.l2_bias = np.zeros(l2, dtype=np.int32)
+        self.output_weights = np.zeros(l2, dtype=np.int8)
+        self.output_bias = np.zeros(1, dtype=np.int32)
+        self.prepare()
+
+    def shapes(self):
+        hidden, l1, l2 = self.hidden, self.l1, self.l2
+        return {'feature_weights': (INPUTS, hidden), 'feature_bias': (hidden,),
+                'l1_weights': (2 * hidden, l1), 'l1_bias': (l1,),
+                'l2_weights': (l1, l2), 'l2_bias': (l2,),
+                'output_weights': (l2,), 'output_bias': (1,)}
+
+    def prepare(self):
+        """
+        Widens the dense layers to int32 once, so evaluation doesn't convert them per call.
+        """
+        self.l1_matrix = self.l1_weights.astype(np.int32)
+        self.l2_matrix = self.l2_weights.astype(np.int32)
+        self.output_vector = self.output_weights.astype(np.int32)
+
+    @classmethod
+    def random(cls, seed=0, hidden=256, l1=32, l2=32):
+        """
+        A network with small random weights, for testing the plumbing.
+        """
+        rng = np.random.default_rng(seed)
+        network = cls(hidden, l1, l2)
+        network.feature_weights = rng.integers(-8, 9, size=(INPUTS, hidden), dtype=np.int16)
+        network.feature_bias = rng.integers(0, 64, size=hidden, dtype=np.int16)
+        network.l1_weights = rng.integers(-4, 5, size=(2 * hidden, l1), dtype=np.int8)
+        network.l2_weights = rng.integers(-8, 9, size=(l1, l2), dtype=np.int8)
+        network.output_weights = rng.integers(-16, 17, size=l2, dtype=np.int8)
+        network.prepare()
+        return network
+
+    def evaluate(self, us, them):
+        """
+        Runs the dense layers on the two accumulators, side to move first.
+        Returns centipawns for the side to move.
+        """
+        x = np.concatenate((us, them)).clip(0, ACTIVATION_MAX).astype(np.int32)
+        x = ((x @ self.l1_matrix + self.l1_bias) >> WEIGHT_SHIFT).clip(0, ACTIVATION_MAX)
+        x = ((x @ self.l2_matrix + self.l2_bias) >> WEIGHT_SHIFT).clip(0, ACTIVATION_MAX)
+        return int(x @ self.output_vector + self.output_bias[0]) // OUTPUT_SCALE
+
+
+def load_network(path):
+    """
+    Reads a network written by save_network.
+    """
+    with open(path, 'rb') as network_file:
+        data = network_file.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f'{path} is too short for an NNUE file')
+    magic, version, hidden, l1, l2 = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} NNUE file')
+    network = Network.__new__(Network)
+    network.hidden, network.l1, network.l2 = hidden, l1, l2
+    offset = HEADER.size
+    shapes = network.shapes()
+    for name, dtype in Network.ARRAYS:
+        count = int(np.prod(shapes[name]))
+        array = np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder('<'), count=count, offset=offset)
+        setattr(network, name, array.astype(dtype).reshape(shapes[name]))
+        offset += array.nbytes
+    if offset != len(data):
+        raise ValueError(f'{path} has the wrong size for its header')
+    network.prepare()
+    return network
+
+
+def save_network(path, network):
+    """
+    Writes a network as a header followed by its raw little-endian arrays.
+    """
+    with open(path, 'wb') as network_file:
+        network_file.write(HEADER.pack(MAGIC, VERSION, network.hidden, network.l1, network.l2))
+        for name, dtype in Network.ARRAYS:
+            array = np.ascontiguousarray(getattr(network, name), dtype=np.dtype(dtype).newbyteorder('<'))
+            network_file.write(array.tobytes())
+
+
+class Accumulator:
+    """
+    Feature-layer outputs for both sides' views, with one entry per move made
+    so unmake is a pop. States call push/pop from make_move/unmake_move.
+
+    Pushing only records the move; an entry maps a color to (accumulator,
+    that side's king square) once evaluate has needed it, so moves that are
+    made and unmade without an evaluation (cutoffs, tablebase hits) cost no
+    NumPy work.
+    """
+
+    def __init__(self, network, board):
+        self.network = network
+        self.board = board
+        self.stack = [{color: self.compute(board, color) for color in 'wb'}]
+        self.moves = [None]  # (removed, added) of the move that led to each entry
+
+    def compute(self, board, perspective):
+        """
+        Builds one side's accumulator from scratch. Returns (accumulator, king square).
+        """
+        king_sq = None
+        pieces = []
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece == '--':
+                    continue
+                if piece == perspective + 'K':
+                    king_sq = row * 8 + col
+                elif piece[1] != 'K':
+                    pieces.append((piece, row * 8 + col))
+        accumulator = self.network.feature_bias.copy()
+        if king_sq is not None and pieces:
+            indices = [feature_index(perspective, king_sq, piece, sq) for piece, sq in pieces]
+            accumulator += self.network.feature_weights[indices].sum(axis=0, dtype=np.int16)
+        return accumulator, king_sq
+
+    def push(self, board, removed, added):
+        """
+        Records a move that took the (piece, sq) pairs in removed off the board
+        and put those in added on it. board is the position after the move.
+        """
+        self.board = board
+        self.stack.append({})
+        self.moves.append((removed, added))
+
+    def pop(self):
+        self.stack.pop()
+        self.moves.pop()
+
+    def _refresh(self, perspective):
+        """
+        Brings one side's view of the top entry up to date from the nearest
+        entry below that has it, or rebuilds it if that side's king has moved since.
+        """
+        stack, moves = self.stack, self.moves
+        top = len(stack) - 1
+        i = top
+        while perspective not in stack[i]:
+            if any(piece == perspective + 'K' for piece, _ in moves[i][1]):
+                stack[top][perspective] = self.compute(self.board, perspective)
+                return
+            i -= 1
+        accumulator, king_sq = stack[i][perspective]
+        weights = self.network.feature_weights
+        for j in range(i + 1, top + 1):
+            removed, added = moves[j]
+            accumulator = accumulator.copy()
+            for piece, sq in added:
+                if piece[1] != 'K':
+                    accumulator += weights[feature_index(perspective, king_sq, piece, sq)]
+            for piece, sq in removed:
+                if piece[1] != 'K':
+                    accumulator -= weights[feature_index(perspective, king_sq, piece, sq)]
+            stack[j][perspective] = accumulator, king_sq
+
+    def evaluate(self, turn):
+        """
+        Network score in centipawns for the side to move.
+        """
+        current = self.stack[-1]
+        for perspective in 'wb':
+            if perspective not in current:
+                self._refresh(perspective)
+        return self.network.evaluate(current[turn][0], current['b' if turn == 'w' else 'w'][0])
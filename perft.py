@@ -0,0 +1,141 @@
+# perft.py
+#
+# Move generator correctness gate and throughput benchmark.
+#
+#   python perft.py                       # run the reference suite
+#   python perft.py --depth 4             # initial position to depth 4
+#   python perft.py --fen "<fen>" --depth 3 --divide
+#   python perft.py --bitboards ...       # use bitboard.Position instead of chess_logic
+
+import argparse
+import sys
+import time
+from chess_logic import GameState, STARTING_FEN, board_from_fen, move_to_uci
+from bitboard import Position
+
+PROMOTION_PIECES = ('Q', 'R', 'B', 'N')
+
+# (name, FEN, leaf node counts for depth 1, 2, ...)
+REFERENCE_POSITIONS = [
+    ('initial', STARTING_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603]),
+    ('en passant endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    ('promotions and castling', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('promotion with check', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def create_state(fen, use_bitboards=False):
+    """
+    Builds a GameState (or a bitboard Position) from a FEN string.
+    """
+    board, turn, en_passant_possible, castling_rights = board_from_fen(fen)
+    if use_bitboards:
+        return Position.from_board(board, turn, en_passant_possible, castling_rights)
+    return GameState(board, turn, en_passant_possible, castling_rights)
+
+
+def is_promotion(state, move):
+    """
+    Checks if a move is a pawn reaching the last rank.
+    """
+    (start_row, start_col), (end_row, _) = move
+    return state.board[start_row][start_col][1] == 'p' and (end_row == 0 or end_row == 7)
+
+
+def perft(state, depth):
+    """
+    Counts the leaf nodes of the legal move tree to the given depth.
+    Each promotion counts once per promotion piece.
+    """
+    if depth == 0:
+        return 1
+    moves = state.get_all_possible_moves()
+    if depth == 1:
+        return sum(len(PROMOTION_PIECES) if is_promotion(state, move) else 1 for move in moves)
+    nodes = 0
+    for move in moves:
+        for promotion in PROMOTION_PIECES if is_promotion(state, move) else ('Q',):
+            state.make_move(move[0], move[1], promotion)
+            nodes += perft(state, depth - 1)
+            state.unmake_move()
+    return nodes
+
+
+def divide(state, depth):
+    """
+    Returns (move, leaf count) for every root move, in long algebraic notation.
+    """
+    results = []
+    for move in state.get_all_possible_moves():
+        promotions = PROMOTION_PIECES if is_promotion(state, move) else (None,)
+        for promotion in promotions:
+            state.make_move(move[0], move[1], promotion or 'Q')
+            results.append((move_to_uci(move, promotion), perft(state, depth - 1)))
+            state.unmake_move()
+    return sorted(results)
+
+
+def run_suite(max_depth=None, max_nodes=100000, use_bitboards=False):
+    """
+    Runs perft on every reference position up to max_depth, skipping depths
+    whose node count exceeds max_nodes. Returns True if every count matched.
+    """
+    all_passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in REFERENCE_POSITIONS:
+        for depth, expected in enumerate(counts, start=1):
+            if (max_depth is not None and depth > max_depth) or expected > max_nodes:
+                break
+            state = create_state(fen, use_bitboards)
+            start_time = time.time()
+            nodes = perft(state, depth)
+            elapsed = time.time() - start_time
+            total_nodes += nodes
+            total_time += elapsed
+            status = 'ok' if nodes == expected else f'FAIL (expected {expected})'
+            all_passed = all_passed and nodes == expected
+            print(f'{name:<24} depth {depth}  {nodes:>9} nodes  {elapsed:7.2f}s  '
+                  f'{nodes / max(elapsed, 1e-9):>9.0f} nps  {status}')
+    print(f'total {total_nodes} nodes in {total_time:.2f}s '
+          f'({total_nodes / max(total_time, 1e-9):.0f} nps)')
+    return all_passed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count and time move generation (perft).')
+    parser.add_argument('--fen', help='position to search (default: run the reference suite)')
+    parser.add_argument('--depth', type=int, help='search depth')
+    parser.add_argument('--divide', action='store_true', help='print the node count below each root move')
+    parser.add_argument('--max-nodes', type=int, default=100000,
+                        help='skip reference depths with more nodes than this (suite only)')
+    parser.add_argument('--bitboards', action='store_true', help='use bitboard.Position')
+    args = parser.parse_args(argv)
+
+    if args.fen is None and args.depth is None:
+        sys.exit(0 if run_suite(max_nodes=args.max_nodes, use_bitboards=args.bitboards) else 1)
+
+    state = create_state(args.fen or STARTING_FEN, args.bitboards)
+    depth = args.depth or 1
+    start_time = time.time()
+    if args.divide:
+        results = divide(state, depth)
+        for move, nodes in results:
+            print(f'{move}: {nodes}')
+        nodes = sum(count for _, count in results)
+    else:
+        nodes = perft(state, depth)
+    elapsed = time.time() - start_time
+    print(f'nodes {nodes}  time {elapsed:.2f}s  nps {nodes / max(elapsed, 1e-9):.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# see.py
+#
+# Static exchange evaluation: the material outcome of trading off every
+# attacker on one square, cheapest first, with either side free to stop.
+
+from chess_logic import KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKERS, ORTHOGONAL_RAYS, DIAGONAL_RAYS
+from evaluation import PIECE_VALUES
+
+
+def least_valuable_attacker(board, square, color, removed):
+    """
+    Finds the cheapest piece of the given color attacking square, treating the
+    squares in removed as empty so sliders behind pieces that already
+    captured (x-rays) are found. Returns (value, (row, col)) or None.
+    """
+    row, col = square
+    for r, c in PAWN_ATTACKERS[color][row][col]:
+        if board[r][c] == color + 'p' and (r, c) not in removed:
+            return PIECE_VALUES['p'], (r, c)
+    for r, c in KNIGHT_ATTACKS[row][col]:
+        if board[r][c] == color + 'N' and (r, c) not in removed:
+            return PIECE_VALUES['N'], (r, c)
+
+    best = None
+    for rays, slider in ((DIAGONAL_RAYS, 'B'), (ORTHOGONAL_RAYS, 'R')):
+        for ray in rays[row][col]:
+            for r, c in ray:
+                piece = board[r][c]
+                if piece == '--' or (r, c) in removed:
+                    continue
+                if piece[0] == color and (piece[1] == slider or piece[1] == 'Q'):
+                    value = PIECE_VALUES[piece[1]]
+                    if best is None or value < best[0]:
+                        best = (value, (r, c))
+                break
+    if best is not None:
+        return best
+
+    for r, c in KING_ATTACKS[row][col]:
+        if board[r][c] == color + 'K' and (r, c) not in removed:
+            return PIECE_VALUES['K'], (r, c)
+    return None
+
+
+def see_move(board, move):
+    """
+    Returns the expected material gain of playing move and letting both sides
+    recapture on its target square for as long as it pays. Non-captures
+    score the cost of the moved piece being taken.
+    """
+    (start_row, start_col), end_pos = move
+    piece = board[start_row][start_col]
+    color = piece[0]
+    target = board[end_pos[0]][end_pos[1]]
+    if target != '--':
+        captured_value = PIECE_VALUES[target[1]]
+    elif piece[1] == 'p' and start_col != end_pos[1]:
+        captured_value = PIECE_VALUES['p']  # en passant
+    else:
+        captured_value = 0
+    return _exchange(board, end_pos, color, captured_value, PIECE_VALUES[piece[1]], {(start_row, start_col)})
+
+
+def see_square(board, square, color):
+    """
+    Returns what the given side wins by starting an exchange on square with its
+    cheapest attacker, or 0 if it has none or the exchange would lose material.
+    """
+    target = board[square[0]][square[1]]
+    if target == '--' or target[0] == color:
+        return 0
+    attacker = least_valuable_attacker(board, square, color, set())
+    if attacker is None:
+        return 0
+    value, pos = attacker
+    return max(0, _exchange(board, square, color, PIECE_VALUES[target[1]], value, {pos}))
+
+
+def _exchange(board, square, color, captured_value, attacker_value, removed):
+    """
+    Runs the swap list for a first capture by color of captured_value with a
+    piece worth attacker_value. removed holds the squares vacated so far.
+    """
+    gains = [captured_value]
+    side = 'b' if color == 'w' else 'w'
+    on_square = attacker_value
+    while True:
+        attacker = least_valuable_attacker(board, square, side, removed)
+        if attacker is None:
+            break
+        if on_square == PIECE_VALUES['K']:
+            # The king can't capture into a defended square, so its capture never happened
+            if len(gains) > 1:
+                gains.pop()
+            else:
+                gains[0] = -on_square
+            break
+        value, pos = attacker
+        gains.append(on_square - gains[-1])
+        removed.add(pos)
+        on_square = value
+        side = 'b' if side == 'w' else 'w'
+
+    # Either side may stand pat instead of recapturing
+    for i in range(len(gains) - 1, 0, -1):
+        gains[i - 1] = -max(-gains[i - 1], gains[i])
+    return gains[0]
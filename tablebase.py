@@ -0,0 +1,556 @@
+# tablebase.py
+#
+# Endgame tablebases for positions with up to four pieces (kings included).
+#
+#   python tablebase.py                         # generate the default set into tablebases/
+#   python tablebase.py KQK KRKN --dir tb       # generate chosen endings
+#   python tablebase.py KQKB --verify           # generate if missing, then self-check
+#
+# Each ending is solved offline by retrograde analysis on top of chess_logic and
+# written as one byte per position: 0 is a draw, 1-127 a win for the side to
+# move with that many plies to mate, 128 + n a loss in n plies, 255 an illegal
+# or duplicate position. The engine maps the files and probes them by index.
+#
+# Tables are named after the material, stronger side first ('KQK', 'KRKN',
+# 'KPK'), and are stored with the stronger side as white. Positions are
+# reduced by the board's symmetries: all eight for pawnless endings, the
+# left-right mirror when pawns are on the board.
+
+import argparse
+import mmap
+import os
+import time
+from chess_logic import (
+    KNIGHT_ATTACKS, KING_ATTACKS, ORTHOGONAL_RAYS, DIAGONAL_RAYS,
+    get_all_possible_moves, in_check, square_under_attack
+)
+from evaluation import PIECE_VALUES
+
+DRAW = 0
+LOSS_BASE = 128
+ILLEGAL = 255
+MAX_DISTANCE = 126
+
+# Results returned by probes, from the side to move's point of view
+WIN = 1
+LOSS = -1
+
+MAX_PIECES = 4
+PIECE_ORDER = 'QRBNp'
+PROMOTION_PIECES = 'QRBN'
+NO_CASTLING = {'w': {'king_side': False, 'queen_side': False},
+               'b': {'king_side': False, 'queen_side': False}}
+DEFAULT_TABLES = ['KQK', 'KRK', 'KPK', 'KBNK', 'KBBK', 'KQKR', 'KQKB', 'KQKN', 'KQKP',
+                  'KRKB', 'KRKN', 'KRKP', 'KPKP']
+
+
+def _build_transforms():
+    """
+    Returns the eight symmetries of the board as square maps (sq = row * 8 + col),
+    identity first and the left-right mirror second.
+    """
+    transforms = []
+    for transpose in (False, True):
+        for flip_rows in (False, True):
+            for flip_cols in (False, True):
+                table = []
+                for sq in range(64):
+                    row, col = divmod(sq, 8)
+                    if flip_rows:
+                        row = 7 - row
+                    if flip_cols:
+                        col = 7 - col
+                    if transpose:
+                        row, col = col, row
+                    table.append(row * 8 + col)
+                transforms.append(table)
+    # Put the identity and the plain left-right mirror first
+    transforms.sort(key=lambda t: (t != list(range(64)), t != [sq ^ 7 for sq in range(64)]))
+    return transforms
+
+
+ALL_TRANSFORMS = _build_transforms()
+MIRROR_TRANSFORMS = ALL_TRANSFORMS[:2]
+
+
+def material_name(pieces):
+    """
+    Names the material of a list of piece codes, stronger side first.
+    Returns (name, swapped) where swapped means black is the stronger side,
+    so the position has to be color-flipped to look it up.
+    """
+    sides = {}
+    for color in 'wb':
+        extras = sorted((piece[1] for piece in pieces if piece[0] == color and piece[1] != 'K'),
+                        key=PIECE_ORDER.index)
+        sides[color] = (sum(PIECE_VALUES[p] for p in extras), [-PIECE_ORDER.index(p) for p in extras],
+                        'K' + ''.join(extras).upper())
+    swapped = sides['b'][:2] > sides['w'][:2]
+    strong, weak = ('b', 'w') if swapped else ('w', 'b')
+    return sides[strong][2] + sides[weak][2], swapped
+
+
+def split_material(name):
+    """
+    Returns the piece codes of a material name, kings first: 'KRKN' -> ['wK', 'bK', 'wR', 'bN'].
+    """
+    split = name.index('K', 1)
+    white, black = name[:split], name[split:]
+    to_code = lambda color, letter: color + ('p' if letter == 'P' else letter)
+    return (['wK', 'bK'] + [to_code('w', p) for p in white[1:]]
+            + [to_code('b', p) for p in black[1:]])
+
+
+def flip_colors(placed, turn):
+    """
+    Mirrors a position top to bottom and swaps the colors, so black's material becomes white's.
+    """
+    flipped = [(('b' if piece[0] == 'w' else 'w') + piece[1], (7 - sq // 8) * 8 + sq % 8)
+               for piece, sq in placed]
+    return flipped, 'b' if turn == 'w' else 'w'
+
+
+def encode_value(is_win, distance):
+    if distance > MAX_DISTANCE:
+        raise ValueError('distance to mate does not fit in a byte')
+    return distance if is_win else LOSS_BASE + distance
+
+
+def decode_value(value):
+    """
+    Returns (result, plies to mate) for a stored byte, or None for an illegal position.
+    """
+    if value == ILLEGAL:
+        return None
+    if value == DRAW:
+        return DRAW, 0
+    if value >= LOSS_BASE:
+        return LOSS, value - LOSS_BASE
+    return WIN, value
+
+
+class Table:
+    """
+    Index layout of one ending: the pieces in split_material order, the white
+    king restricted to one square per symmetry class, and the side to move.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.pieces = split_material(name)
+        self.has_pawns = any(piece[1] == 'p' for piece in self.pieces)
+        self.transforms = MIRROR_TRANSFORMS if self.has_pawns else ALL_TRANSFORMS
+        self.king_squares = sorted({min(t[sq] for t in self.transforms) for sq in range(64)})
+        self.king_index = {sq: i for i, sq in enumerate(self.king_squares)}
+        self.positions = len(self.king_squares) * 64 ** (len(self.pieces) - 1)
+        # Runs of identical pieces, which are kept in ascending square order
+        self.groups = [(start, end) for start, end in self._identical_runs() if end - start > 1]
+        self.file_name = name + '.tb'
+
+    def _identical_runs(self):
+        start = 0
+        for i in range(1, len(self.pieces) + 1):
+            if i == len(self.pieces) or self.pieces[i] != self.pieces[start]:
+                yield start, i
+                start = i
+
+    def canonical(self, squares):
+        """
+        Returns the representative of a square tuple's symmetry class: its
+        smallest image, with identical pieces in ascending order.
+        """
+        best = None
+        groups = self.groups
+        for transform in self.transforms:
+            image = [transform[sq] for sq in squares]
+            for start, end in groups:
+                image[start:end] = sorted(image[start:end])
+            image = tuple(image)
+            if best is None or image < best:
+                best = image
+        return best
+
+    def index(self, squares, turn):
+        """
+        Index of a canonical square tuple with the given side to move.
+        """
+        idx = self.king_index[squares[0]]
+        for sq in squares[1:]:
+            idx = idx * 64 + sq
+        return idx + self.positions if turn == 'b' else idx
+
+    def decode(self, idx):
+        """
+        Inverse of index: returns (squares, turn).
+        """
+        turn = 'w'
+        if idx >= self.positions:
+            idx -= self.positions
+            turn = 'b'
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            idx, sq = divmod(idx, 64)
+            squares.append(sq)
+        squares.append(self.king_squares[idx])
+        squares.reverse()
+        return tuple(squares), turn
+
+    def lookup_index(self, placed, turn):
+        """
+        Index of a position given as (piece, sq) pairs whose material matches
+        this table without color flipping.
+        """
+        remaining = list(placed)
+        squares = []
+        for piece in self.pieces:
+            for i, (code, sq) in enumerate(remaining):
+                if code == piece:
+                    squares.append(sq)
+                    del remaining[i]
+                    break
+        return self.index(self.canonical(squares), turn)
+
+
+class Tablebases:
+    """
+    Probes generated tables from a directory. Files are memory-mapped on first use.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {}  # name -> (Table, data) or None when the file is missing
+
+    def close(self):
+        for entry in self.tables.values():
+            if entry is not None and isinstance(entry[1], mmap.mmap):
+                entry[1].close()
+        self.tables = {}
+
+    def add(self, table, data):
+        """
+        Registers a table held in memory (used while generating).
+        """
+        self.tables[table.name] = (table, data)
+
+    def _table(self, name):
+        if name not in self.tables:
+            path = os.path.join(self.directory, name + '.tb')
+            entry = None
+            if os.path.exists(path):
+                with open(path, 'rb') as table_file:
+                    entry = (Table(name), mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ))
+            self.tables[name] = entry
+        return self.tables[name]
+
+    def probe_pieces(self, placed, turn):
+        """
+        Looks up a position given as (piece, sq) pairs (sq = row * 8 + col).
+        Returns (result, plies to mate) or None if no table covers it.
+        """
+        if len(placed) == 2:
+            return DRAW, 0  # Bare kings
+        name, swapped = material_name([piece for piece, _ in placed])
+        entry = self._table(name)
+        if entry is None:
+            return None
+        if swapped:
+            placed, turn = flip_colors(placed, turn)
+        table, data = entry
+        return decode_value(data[table.lookup_index(placed, turn)])
+
+    def probe(self, board, turn, en_passant_possible, castling_rights):
+        """
+        Looks up a board position. Returns (result, plies to mate) for the side
+        to move, or None if it has too many pieces, castling rights, an en
+        passant capture available, or no generated table.
+        """
+        if any(castling_rights[color][side] for color in castling_rights for side in castling_rights[color]):
+            return None
+        if en_passant_possible:
+            row = en_passant_possible[0] + (1 if turn == 'w' else -1)
+            col = en_passant_possible[1]
+            if any(0 <= c < 8 and board[row][c] == turn + 'p' for c in (col - 1, col + 1)):
+                return None
+        placed = []
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece != '--':
+                    placed.append((piece, row * 8 + col))
+                    if len(placed) > MAX_PIECES:
+                        return None
+        return self.probe_pieces(placed, turn)
+
+
+def _place(board, pieces, squares):
+    for piece, sq in zip(pieces, squares):
+        board[sq // 8][sq % 8] = piece
+
+
+def _clear(board, squares):
+    for sq in squares:
+        board[sq // 8][sq % 8] = '--'
+
+
+def _origins(board, piece, sq):
+    """
+    Squares a piece now on sq could have come from with a non-capturing move.
+    """
+    row, col = divmod(sq, 8)
+    piece_type = piece[1]
+    if piece_type == 'N':
+        targets = KNIGHT_ATTACKS[row][col]
+    elif piece_type == 'K':
+        targets = KING_ATTACKS[row][col]
+    elif piece_type == 'p':
+        step = 1 if piece[0] == 'w' else -1  # White pawns came from the row below
+        targets = []
+        if 1 <= row + step <= 6 and board[row + step][col] == '--':
+            targets.append((row + step, col))
+            start_row = 6 if piece[0] == 'w' else 1
+            if row + 2 * step == start_row and board[start_row][col] == '--':
+                targets.append((start_row, col))
+        return [r * 8 + c for r, c in targets]
+    else:
+        origins = []
+        rays = []
+        if piece_type != 'B':
+            rays += ORTHOGONAL_RAYS[row][col]
+        if piece_type != 'R':
+            rays += DIAGONAL_RAYS[row][col]
+        for ray in rays:
+            for r, c in ray:
+                if board[r][c] != '--':
+                    break
+                origins.append(r * 8 + c)
+        return origins
+    return [r * 8 + c for r, c in targets if board[r][c] == '--']
+
+
+def generate_table(name, directory, tablebases=None, verbose=True):
+    """
+    Solves one ending by retrograde analysis and writes it to directory.
+    Tables it reaches by captures and promotions are loaded from directory,
+    or generated first if missing. Returns the table's bytes.
+    """
+    if tablebases is None:
+        tablebases = Tablebases(directory)
+    table = Table(name)
+    pieces = table.pieces
+    total = 2 * table.positions
+    start_time = time.time()
+
+    # Make sure every ending reachable by a capture or promotion is available
+    for successor in successor_materials(pieces):
+        if tablebases._table(successor) is None:
+            tablebases.add(Table(successor), generate_table(successor, directory, tablebases, verbose))
+
+    values = bytearray([ILLEGAL]) * total
+    counters = bytearray(total)  # In-table children not yet known to be lost for us
+    floors = bytearray(total)  # Longest loss reached through a capture or promotion
+    escapes = bytearray(total)  # 1 if a capture or promotion reaches a draw
+    final = bytearray(total)
+    win_pending = bytearray(total)
+    buckets = {}  # distance -> ([wins], [losses])
+
+    def push(distance, idx, is_win):
+        buckets.setdefault(distance, ([], []))[0 if is_win else 1].append(idx)
+
+    board = [['--'] * 8 for _ in range(8)]
+    for idx in range(total):
+        squares, turn = table.decode(idx)
+        if len(set(squares)) != len(squares) or table.canonical(squares) != squares:
+            continue
+        if any(piece[1] == 'p' and not 8 <= sq < 56 for piece, sq in zip(pieces, squares)):
+            continue
+        _place(board, pieces, squares)
+        opponent = 'b' if turn == 'w' else 'w'
+        king_sq = squares[0] if opponent == 'w' else squares[1]
+        if square_under_attack(board, divmod(king_sq, 8), opponent):
+            _clear(board, squares)
+            continue  # The side that just moved is in check
+        values[idx] = DRAW
+
+        moves = get_all_possible_moves(board, turn, (), NO_CASTLING)
+        if not moves:
+            if in_check(board, turn):
+                push(0, idx, False)  # Checkmated
+            else:
+                final[idx] = 1  # Stalemate
+            _clear(board, squares)
+            continue
+
+        children = set()
+        floor = 0
+        for start_pos, end_pos in moves:
+            piece = board[start_pos[0]][start_pos[1]]
+            target = board[end_pos[0]][end_pos[1]]
+            promotes = piece[1] == 'p' and end_pos[0] in (0, 7)
+            if target == '--' and not promotes:
+                # Different moves can reach the same stored child (e.g. a symmetric
+                # pair, or a piece landing next to an identical one); the retrograde
+                # pass visits each parent once per child, so count children, not moves
+                moved = list(squares)
+                moved[squares.index(start_pos[0] * 8 + start_pos[1])] = end_pos[0] * 8 + end_pos[1]
+                children.add(table.canonical(moved))
+                continue
+            # Captures and promotions leave this ending: look the result up
+            placed = [(p, sq) for p, sq in zip(pieces, squares)
+                      if sq != end_pos[0] * 8 + end_pos[1] and sq != start_pos[0] * 8 + start_pos[1]]
+            for promotion in PROMOTION_PIECES if promotes else (None,):
+                moved_piece = piece[0] + promotion if promotion else piece
+                child = placed + [(moved_piece, end_pos[0] * 8 + end_pos[1])]
+                result, distance = tablebases.probe_pieces(child, opponent)
+                if result == LOSS:
+                    push(distance + 1, idx, True)
+                    win_pending[idx] = 1
+                elif result == DRAW:
+                    escapes[idx] = 1
+                else:
+                    floor = max(floor, distance + 1)
+        counters[idx] = len(children)
+        floors[idx] = floor
+        if counters[idx] == 0 and not escapes[idx] and not win_pending[idx]:
+            push(floor, idx, False)  # Every move leaves the ending and loses
+        _clear(board, squares)
+
+    # Retrograde pass: settle positions in order of distance to mate
+    while buckets:
+        distance = min(buckets)
+        wins, losses = buckets.pop(distance)
+        for is_win, batch in ((True, wins), (False, losses)):
+            for idx in batch:
+                if final[idx]:
+                    continue
+                final[idx] = 1
+                values[idx] = encode_value(is_win, distance)
+                squares, turn = table.decode(idx)
+                mover = 'b' if turn == 'w' else 'w'
+                _place(board, pieces, squares)
+                parents = set()
+                for i, (piece, sq) in enumerate(zip(pieces, squares)):
+                    if piece[0] != mover:
+                        continue
+                    for origin in _origins(board, piece, sq):
+                        moved = list(squares)
+                        moved[i] = origin
+                        parents.add(table.index(table.canonical(moved), mover))
+                _clear(board, squares)
+                for parent in parents:
+                    if values[parent] == ILLEGAL or final[parent]:
+                        continue
+                    if not is_win:
+                        # Moving here leaves the opponent lost
+                        push(distance + 1, parent, True)
+                        win_pending[parent] = 1
+                    else:
+                        counters[parent] -= 1
+                        if counters[parent] == 0 and not escapes[parent] and not win_pending[parent]:
+                            push(max(distance + 1, floors[parent]), parent, False)
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, table.file_name), 'wb') as table_file:
+        table_file.write(values)
+    if verbose:
+        print(f'{name}: {total} positions in {time.time() - start_time:.1f}s')
+    return bytes(values)
+
+
+def verify_table(name, tablebases):
+    """
+    Checks every stored position of a table against its children: a win must
+    be one ply longer than the fastest lost child, a loss one ply longer than
+    the slowest won child with every child won, and anything else a draw.
+    Returns the number of positions that disagree.
+    """
+    table, data = tablebases._table(name)
+    pieces = table.pieces
+    board = [['--'] * 8 for _ in range(8)]
+    errors = 0
+    for idx in range(2 * table.positions):
+        stored = decode_value(data[idx])
+        if stored is None:
+            continue
+        squares, turn = table.decode(idx)
+        _place(board, pieces, squares)
+        opponent = 'b' if turn == 'w' else 'w'
+        fastest_win = slowest_loss = None
+        all_lost = True
+        moves = get_all_possible_moves(board, turn, (), NO_CASTLING)
+        for start_pos, end_pos in moves:
+            piece = board[start_pos[0]][start_pos[1]]
+            placed = [(p, sq) for p, sq in zip(pieces, squares)
+                      if sq != end_pos[0] * 8 + end_pos[1] and sq != start_pos[0] * 8 + start_pos[1]]
+            promotes = piece[1] == 'p' and end_pos[0] in (0, 7)
+            for promotion in PROMOTION_PIECES if promotes else (None,):
+                moved_piece = piece[0] + promotion if promotion else piece
+                result, distance = tablebases.probe_pieces(placed + [(moved_piece, end_pos[0] * 8 + end_pos[1])],
+                                                           opponent)
+                if result == LOSS:
+                    fastest_win = distance + 1 if fastest_win is None else min(fastest_win, distance + 1)
+                elif result == WIN:
+                    slowest_loss = max(slowest_loss or 0, distance + 1)
+                else:
+                    all_lost = False
+        if not moves:
+            expected = (LOSS, 0) if in_check(board, turn) else (DRAW, 0)
+        elif fastest_win is not None:
+            expected = (WIN, fastest_win)
+        elif all_lost:
+            expected = (LOSS, slowest_loss)
+        else:
+            expected = (DRAW, 0)
+        _clear(board, squares)
+        if stored != expected:
+            errors += 1
+    return errors
+
+
+def successor_materials(pieces):
+    """
+    Names of the endings reachable from a material set by one capture or promotion.
+    """
+    names = set()
+    extras = [i for i, piece in enumerate(pieces) if piece[1] != 'K']
+    options = [list(pieces)]
+    for i in extras:
+        if pieces[i][1] == 'p':
+            for promotion in PROMOTION_PIECES:
+                promoted = list(pieces)
+                promoted[i] = pieces[i][0] + promotion
+                options.append(promoted)
+    for option in options:
+        if option != list(pieces):
+            names.add(material_name(option)[0])
+        for i in extras:
+            captured = option[:i] + option[i + 1:]
+            if len(captured) > 2:
+                names.add(material_name(captured)[0])
+    return sorted(names, key=len)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate endgame tablebases.')
+    parser.add_argument('tables', nargs='*', default=DEFAULT_TABLES,
+                        help='endings to generate, e.g. KQK KRKN (default: a standard set)')
+    parser.add_argument('--dir', default='tablebases', help='output directory')
+    parser.add_argument('--verify', action='store_true',
+                        help='check every position of the chosen endings against its children')
+    args = parser.parse_args(argv)
+
+    tablebases = Tablebases(args.dir)
+    for name in args.tables:
+        name = name.upper()
+        if len(split_material(name)) > MAX_PIECES:
+            parser.error(f'{name}: at most {MAX_PIECES} pieces are supported')
+        canonical, _ = material_name(split_material(name))
+        if tablebases._table(canonical) is None:
+            tablebases.add(Table(canonical), generate_table(canonical, args.dir, tablebases))
+        if args.verify:
+            errors = verify_table(canonical, tablebases)
+            print(f'{canonical}: {"ok" if errors == 0 else f"{errors} inconsistent positions"}')
+    tablebases.close()
+
+
+if __name__ == '__main__':
+    main()
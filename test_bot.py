@@ -0,0 +1,38 @@
+from bot import Bot, MATE_SCORE, MATE_BOUND, score_to_table, score_from_table
+from chess_logic import STARTING_FEN, board_from_fen
+from tablebase import Table, Tablebases, ILLEGAL, WIN, encode_value
+from uci import format_score
+
+
+def test_long_tablebase_win_at_deep_ply_stays_a_mate(tmp_path):
+    # A KRKN win 80 plies from mate, probed 100 plies into the search
+    board, turn, en_passant_possible, castling_rights = board_from_fen('8/8/8/3k4/8/2n5/8/R3K3 w - - 0 1')
+    table = Table('KRKN')
+    data = bytearray([ILLEGAL]) * (2 * table.positions)
+    placed = [(board[row][col], row * 8 + col) for row in range(8) for col in range(8) if board[row][col] != '--']
+    data[table.lookup_index(placed, turn)] = encode_value(True, 80)
+    bot = Bot(turn, hash_mb=1)
+    bot.tablebases = Tablebases(str(tmp_path))
+    bot.tablebases.add(table, bytes(data))
+    state = bot.create_state(board, turn, en_passant_possible, castling_rights)
+
+    assert bot.tablebases.probe(board, turn, en_passant_possible, castling_rights) == (WIN, 80)
+    score = bot.probe_tablebase(state, 100)
+    assert score == MATE_SCORE - 180
+    assert score >= MATE_BOUND
+    # Stored relative to the node and read back at another ply, it stays a mate
+    assert score_to_table(score, 100) == MATE_SCORE - 80
+    assert score_from_table(score_to_table(score, 100), 10) == MATE_SCORE - 90
+    assert format_score(score) == 'mate 90'
+    assert format_score(-score) == 'mate -90'
+
+
+def test_ponder_search_stops_at_its_limit():
+    board, turn, en_passant_possible, castling_rights = board_from_fen(STARTING_FEN)
+    bot = Bot('b', hash_mb=1)
+    bot.time_limit = 0.1
+    bot.start_ponder(board, en_passant_possible, castling_rights, [], ((6, 4), (4, 4)))
+    bot.ponder_thread.join(5)
+    assert not bot.ponder_thread.is_alive()
+    # The move found while pondering is still returned on a ponder hit
+    assert bot.ponder_hit() is not None
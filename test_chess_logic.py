@@ -0,0 +1,42 @@
+import pytest
+from chess_logic import GameState, board_from_fen, gives_check, in_check
+from perft import REFERENCE_POSITIONS, PROMOTION_PIECES, is_promotion
+
+# Discovered checks by castling and en passant, on top of the perft positions
+CHECK_FENS = [fen for _, fen, _ in REFERENCE_POSITIONS] + [
+    '5k2/8/8/8/8/8/8/4K2R w K - 0 1',  # O-O puts the rook on f1 facing the king
+    '4k3/1b6/8/8/3Pp3/8/8/7K b - d3 0 1',  # exd3 opens the bishop's diagonal
+    '8/8/8/R2pP2k/8/8/8/K7 w - d6 0 1',  # exd6 clears the rook's rank
+]
+
+
+def _check_moves(state, depth):
+    """
+    Compares gives_check with playing each move and testing in_check, at
+    every node down to depth.
+    """
+    opponent = 'b' if state.turn == 'w' else 'w'
+    for move in state.get_all_possible_moves():
+        for promotion in PROMOTION_PIECES if is_promotion(state, move) else ('Q',):
+            expected_board = [row[:] for row in state.board]
+            predicted = gives_check(expected_board, move, promotion)
+            state.make_move(move[0], move[1], promotion)
+            assert predicted == in_check(state.board, opponent), (move, promotion)
+            if depth > 1:
+                _check_moves(state, depth - 1)
+            state.unmake_move()
+
+
+@pytest.mark.parametrize('fen', CHECK_FENS)
+def test_gives_check_matches_making_the_move(fen):
+    _check_moves(GameState(*board_from_fen(fen)), 2)
+
+
+@pytest.mark.parametrize('fen, move', [
+    (CHECK_FENS[-3], ((7, 4), (7, 6))),
+    (CHECK_FENS[-2], ((4, 4), (5, 3))),
+    (CHECK_FENS[-1], ((3, 4), (2, 3))),
+])
+def test_castling_and_en_passant_discover_checks(fen, move):
+    board = board_from_fen(fen)[0]
+    assert gives_check(board, move)
@@ -0,0 +1,27 @@
+import pytest
+from chess_logic import board_from_fen
+from see import see_move, see_square
+
+
+@pytest.mark.parametrize('fen, move, expected', [
+    # Rxe5 wins an undefended pawn
+    ('1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1', ((7, 4), (3, 4)), 100),
+    # Nxe5 loses the knight for a pawn: the bishop and queen keep recapturing
+    ('1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1', ((5, 3), (3, 4)), -220),
+    # Doubled rooks: the rook behind the first one recaptures through it
+    ('4r1k1/8/8/4p3/8/8/4R3/4R1K1 w - - 0 1', ((6, 4), (3, 4)), 100),
+    # A single rook taking a defended pawn loses the exchange
+    ('4r1k1/8/8/4p3/8/8/4R3/6K1 w - - 0 1', ((6, 4), (3, 4)), -400),
+    # En passant captures a pawn that isn't on the target square
+    ('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1', ((3, 4), (2, 3)), 100),
+])
+def test_see_move(fen, move, expected):
+    board = board_from_fen(fen)[0]
+    assert see_move(board, move) == expected
+
+
+def test_see_square_only_counts_winning_exchanges():
+    board = board_from_fen('4r1k1/8/8/4p3/8/8/4R3/4R1K1 w - - 0 1')[0]
+    assert see_square(board, (3, 4), 'w') == 100
+    board = board_from_fen('4r1k1/8/8/4p3/8/8/4R3/6K1 w - - 0 1')[0]
+    assert see_square(board, (3, 4), 'w') == 0
@@ -0,0 +1,20 @@
+import io
+from uci import UCIEngine
+
+
+def test_unloadable_files_are_reported_and_reset(tmp_path):
+    output = io.StringIO()
+    engine = UCIEngine(output)
+    engine.handle(f'setoption name BookFile value {tmp_path / "missing.bin"}')
+    engine.handle(f'setoption name TablebasePath value {tmp_path / "missing"}')
+    engine.handle('isready')
+    engine.handle('go depth 1')
+    engine.search_thread.join()
+    engine.handle('quit')
+
+    lines = output.getvalue().splitlines()
+    assert any(line.startswith('info string cannot load BookFile:') for line in lines)
+    assert any(line.startswith('info string cannot load TablebasePath:') for line in lines)
+    assert 'readyok' in lines
+    assert any(line.startswith('bestmove ') for line in lines)
+    assert engine.options['BookFile'] == '' and engine.options['TablebasePath'] == ''
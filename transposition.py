@@ -0,0 +1,224 @@
+# transposition.py
+#
+# Fixed-size transposition table stored in preallocated flat arrays so memory
+# use stays predictable over a long game and probes never allocate dicts.
+# The arrays can live in shared memory so several search processes share one table.
+
+import weakref
+from multiprocessing import shared_memory
+
+# Bound flags
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# Each bucket holds a depth-preferred slot followed by an always-replace slot
+BUCKET_SIZE = 2
+# keys (8 bytes) + scores (8 bytes) + packed info (8 bytes)
+ENTRY_BYTES = 24
+
+# Layout of the packed info word: depth + 1 (8 bits), flag (2), move (13), age (8)
+FLAG_SHIFT = 8
+MOVE_SHIFT = 10
+MOVE_MASK = 0x1FFF
+AGE_SHIFT = 23
+
+
+def encode_move(move):
+    """
+    Packs a ((row, col), (row, col)) move into 13 bits; 0 means no move.
+    """
+    if move is None:
+        return 0
+    (start_row, start_col), (end_row, end_col) = move
+    return ((start_row * 8 + start_col) << 6 | (end_row * 8 + end_col)) + 1
+
+
+def attach_shared_memory(name):
+    """
+    Opens an existing shared memory block without taking ownership of it, so
+    a helper process exiting doesn't unlink the creator's table.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the block with the resource
+        # tracker; processes started by multiprocessing share the creator's
+        # tracker, so that registration is the creator's own and harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def _release(views, shm, owner):
+    """
+    Drops the array views over a shared block, then closes (and if owned, unlinks) it.
+    """
+    for view in views:
+        view.release()
+    shm.close()
+    if owner:
+        shm.unlink()
+
+
+def decode_move(code):
+    """
+    Unpacks a move produced by encode_move, returning None for 0.
+    """
+    if code == 0:
+        return None
+    code -= 1
+    start_sq, end_sq = code >> 6, code & 63
+    return (start_sq >> 3, start_sq & 7), (end_sq >> 3, end_sq & 7)
+
+
+class TranspositionTable:
+    """
+    Hash table of search results with a bounded memory footprint.
+
+    Entries live in three parallel arrays (keys, scores and a packed
+    depth/flag/move/age word). A store goes to the depth-preferred slot of its
+    bucket when it is at least as deep, refers to the same position, or the
+    slot is from an older search; otherwise it overwrites the always-replace slot.
+
+    With shared=True the arrays are views over a multiprocessing shared memory
+    block that other processes open with TranspositionTable.attach. Writers
+    take no lock: each key slot holds key ^ score bits ^ info, so an entry
+    torn by two processes writing at once fails verification on probe and
+    reads as a miss.
+    """
+
+    def __init__(self, size_mb=16, shared=False):
+        self.shared = shared
+        self.shm = None
+        self._finalizer = None
+        self.resize(size_mb)
+
+    @classmethod
+    def attach(cls, name, size_mb, generation=1):
+        """
+        Opens a shared table created by another process under the given name.
+        """
+        table = cls.__new__(cls)
+        table.shared = True
+        table.size_mb = size_mb
+        table._map(attach_shared_memory(name), owner=False)
+        table.generation = generation
+        return table
+
+    @property
+    def name(self):
+        """
+        Name of the shared memory block, or None for a private table.
+        """
+        return self.shm.name if self.shm is not None else None
+
+    def resize(self, size_mb):
+        """
+        Reallocates the table to use about size_mb megabytes, discarding its contents.
+        """
+        self.close()
+        self.size_mb = size_mb
+        num_buckets = max(1, (size_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        size = num_buckets * BUCKET_SIZE * ENTRY_BYTES
+        if self.shared:
+            self._map(shared_memory.SharedMemory(create=True, size=size), owner=True)
+        else:
+            self._map(bytearray(size))
+        self.generation = 1
+
+    def _map(self, block, owner=False):
+        """
+        Lays the key, score and info arrays over a zeroed buffer or shared memory block.
+        """
+        buffer = memoryview(block.buf if isinstance(block, shared_memory.SharedMemory) else block)
+        num_entries = len(buffer) // ENTRY_BYTES
+        self.num_buckets = num_entries // BUCKET_SIZE
+        num_entries = self.num_buckets * BUCKET_SIZE
+        self.keys = buffer[:8 * num_entries].cast('Q')
+        self.scores = buffer[8 * num_entries:16 * num_entries].cast('d')
+        # The score bytes read as integers, for the key check
+        self.score_bits = buffer[8 * num_entries:16 * num_entries].cast('Q')
+        self.info = buffer[16 * num_entries:24 * num_entries].cast('Q')
+        if isinstance(block, shared_memory.SharedMemory):
+            self.shm = block
+            views = (self.keys, self.scores, self.score_bits, self.info, buffer)
+            self._finalizer = weakref.finalize(self, _release, views, block, owner)
+
+    def close(self):
+        """
+        Releases a shared table; the creating process also frees the memory block.
+        """
+        if self._finalizer is not None:
+            self.keys = self.scores = self.score_bits = self.info = None
+            self._finalizer()
+            self._finalizer = None
+            self.shm = None
+
+    def clear(self):
+        """
+        Empties the table, keeping its size.
+        """
+        if self.shared:
+            # Zero in place so attached processes keep seeing the same block
+            for view in (self.keys, self.score_bits, self.info):
+                view[:] = bytes(len(view) * 8)
+            self.generation = 1
+        else:
+            self.resize(self.size_mb)
+
+    def new_search(self):
+        """
+        Advances the generation so entries from earlier searches get replaced first.
+        """
+        self.generation = self.generation % 255 + 1
+
+    def probe(self, key):
+        """
+        Looks up a position by its 64-bit hash.
+        Returns (score, depth, flag, move) or None if the position is not stored.
+        """
+        index = (key % self.num_buckets) * BUCKET_SIZE
+        keys = self.keys
+        info = self.info
+        score_bits = self.score_bits
+        if keys[index] ^ info[index] ^ score_bits[index] != key:
+            index += 1
+            if keys[index] ^ info[index] ^ score_bits[index] != key:
+                return None
+        info = info[index]
+        if not info:
+            return None
+        return (self.scores[index], (info & 0xFF) - 1, (info >> FLAG_SHIFT) & 3,
+                decode_move((info >> MOVE_SHIFT) & MOVE_MASK))
+
+    def store(self, key, depth, flag, score, move=None):
+        """
+        Records a search result, choosing the slot by the bucket's replacement policy.
+        """
+        index = (key % self.num_buckets) * BUCKET_SIZE
+        keys = self.keys
+        info = self.info
+        score_bits = self.score_bits
+        current = info[index]
+        same_key = keys[index] ^ current ^ score_bits[index] == key
+        code = encode_move(move)
+        if current and not same_key and (current >> AGE_SHIFT) == self.generation \
+                and (current & 0xFF) - 1 > depth:
+            # Keep the deeper entry from this search and use the always-replace slot
+            index += 1
+        elif not code and same_key:
+            # Don't lose a known best move when re-storing the same position
+            code = (current >> MOVE_SHIFT) & MOVE_MASK
+        new_info = ((depth + 1) & 0xFF) | (flag << FLAG_SHIFT) \
+            | (code << MOVE_SHIFT) | (self.generation << AGE_SHIFT)
+        self.scores[index] = score
+        info[index] = new_info
+        keys[index] = key ^ new_info ^ score_bits[index]
+
+    def hashfull(self):
+        """
+        Returns how full the table is, in permille, from a sample of the first entries.
+        """
+        sample = min(1000, len(self.info))
+        generation = self.generation
+        used = sum(1 for i in range(sample) if self.info[i] and (self.info[i] >> AGE_SHIFT) == generation)
+        return used * 1000 // sample
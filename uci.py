@@ -0,0 +1,336 @@
+# uci.py
+#
+# Universal Chess Interface front end: drives Bot over stdin/stdout so the
+# engine can run headless under GUIs, tournament managers and on servers.
+# It never imports pygame.
+#
+#   python uci.py
+
+import sys
+import threading
+import time
+from bot import Bot, MATE_SCORE, MATE_BOUND
+from chess_logic import GameState, STARTING_FEN, board_from_fen, algebraic_to_square, move_to_uci
+
+ENGINE_NAME = 'chess-bot'
+ENGINE_AUTHOR = 'chess-bot contributors'
+
+# name -> (UCI type, default, minimum, maximum)
+OPTIONS = {
+    'Hash': ('spin', 16, 1, 4096),
+    'Threads': ('spin', 1, 1, 64),
+    'BookFile': ('string', '', None, None),
+    'TablebasePath': ('string', '', None, None),
+    'EvalFile': ('string', '', None, None),
+}
+
+# 'go' arguments followed by a number; 'infinite' and 'ponder' are bare flags
+GO_LIMITS = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'depth', 'nodes', 'mate', 'movetime')
+
+
+def parse_move(text):
+    """
+    Reads a long algebraic move such as 'e2e4' or 'e7e8q'. Returns (move, promotion).
+    """
+    move = (algebraic_to_square(text[0:2]), algebraic_to_square(text[2:4]))
+    promotion = text[4].upper() if len(text) > 4 else None
+    return move, promotion
+
+
+def format_score(score):
+    """
+    UCI score of a search score: 'cp <centipawns>' or 'mate <moves>', negative when mated.
+    """
+    if abs(score) >= MATE_BOUND:
+        plies = MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f'mate {moves if score > 0 else -moves}'
+    return f'cp {int(score)}'
+
+
+def format_move(board, move):
+    """
+    Long algebraic form of a bot move; pawns reaching the last rank promote to a queen.
+    """
+    (start_row, start_col), (end_row, _) = move
+    promotion = 'Q' if board[start_row][start_col][1] == 'p' and end_row in (0, 7) else None
+    return move_to_uci(move, promotion)
+
+
+class UCIEngine:
+    """
+    Holds the current position and options and runs one search at a time in a
+    worker thread, so 'stop' and 'isready' are answered while it thinks.
+    """
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.options = {name: spec[1] for name, spec in OPTIONS.items()}
+        self.bot = None
+        self.set_position(STARTING_FEN, [])
+        self.search_thread = None
+        # Set by 'stop' or 'ponderhit'; an infinite or ponder search waits for
+        # it before reporting its move
+        self.release = threading.Event()
+        self.pondering = False
+
+    def send(self, line):
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def create_bot(self):
+        """
+        (Re)creates the bot from the current options. Called lazily, since
+        changing Hash or Threads needs a new transposition table.
+        """
+        if self.bot is not None:
+            self.bot.close()
+        self.bot = Bot(self.turn, hash_mb=self.options['Hash'], threads=self.options['Threads'])
+        self.bot.info_callback = self.send_info
+        # A file that can't be loaded is reported and its option reset, so the
+        # engine keeps playing without it instead of dying mid-session
+        for name, load in (('BookFile', self.bot.load_book), ('TablebasePath', self.bot.load_tablebases),
+                           ('EvalFile', self.bot.load_network)):
+            if not self.options[name]:
+                continue
+            try:
+                load(self.options[name])
+            except (OSError, ValueError, ImportError) as error:
+                self.send(f'info string cannot load {name}: {error}')
+                self.options[name] = OPTIONS[name][1]
+
+    def set_position(self, fen, moves):
+        """
+        Sets up the position from a FEN string and a list of long algebraic moves.
+        """
+        board, turn, en_passant_possible, castling_rights = board_from_fen(fen)
+        state = GameState(board, turn, en_passant_possible, castling_rights)
+        for text in moves:
+            move, promotion = parse_move(text)
+            if not state.is_valid_move(*move):
+                raise ValueError(f'illegal move: {text}')
+            state.make_move(move[0], move[1], promotion or 'Q')
+        self.board = state.board
+        self.turn = state.turn
+        self.en_passant_possible = state.en_passant_possible
+        self.castling_rights = state.castling_rights
+        self.move_log = state.move_log
+
+    def handle(self, line):
+        """
+        Runs one command line. Returns False when the engine should exit.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'uci':
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            for name, (kind, default, minimum, maximum) in OPTIONS.items():
+                if kind == 'spin':
+                    self.send(f'option name {name} type spin default {default} min {minimum} max {maximum}')
+                else:
+                    self.send(f'option name {name} type string default {default or "<empty>"}')
+            self.send('uciok')
+        elif command == 'isready':
+            if self.bot is None:
+                self.create_bot()
+            self.send('readyok')
+        elif command == 'setoption':
+            self.set_option(args)
+        elif command == 'ucinewgame':
+            self.stop()
+            if self.bot is not None:
+                self.bot.transposition_table.clear()
+        elif command == 'position':
+            self.stop()
+            self.position(args)
+        elif command == 'go':
+            self.stop()
+            self.go(args)
+        elif command == 'ponderhit':
+            self.ponderhit()
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            if self.bot is not None:
+                self.bot.close()
+            return False
+        else:
+            self.send(f'info string unknown command: {command}')
+        return True
+
+    def set_option(self, args):
+        """
+        Handles 'setoption name <name> [value <value>]'; names may contain spaces.
+        """
+        if 'name' not in args:
+            return
+        rest = args[args.index('name') + 1:]
+        if 'value' in rest:
+            split = rest.index('value')
+            name, value = ' '.join(rest[:split]), ' '.join(rest[split + 1:])
+        else:
+            name, value = ' '.join(rest), ''
+        match = next((option for option in OPTIONS if option.lower() == name.lower()), None)
+        if match is None:
+            self.send(f'info string unknown option: {name}')
+            return
+        kind, _, minimum, maximum = OPTIONS[match]
+        if kind == 'spin':
+            try:
+                value = min(max(int(value), minimum), maximum)
+            except ValueError:
+                self.send(f'info string invalid value for {match}: {value}')
+                return
+        elif value == '<empty>':
+            value = ''
+        if self.options[match] != value:
+            self.options[match] = value
+            self.stop()
+            if self.bot is not None:
+                self.bot.close()
+                self.bot = None
+
+    def position(self, args):
+        """
+        Handles 'position startpos|fen <fen> [moves ...]'.
+        """
+        moves = []
+        if 'moves' in args:
+            split = args.index('moves')
+            args, moves = args[:split], args[split + 1:]
+        if args[:1] == ['startpos']:
+            fen = STARTING_FEN
+        elif args[:1] == ['fen']:
+            fen = ' '.join(args[1:])
+        else:
+            self.send('info string expected startpos or fen')
+            return
+        try:
+            self.set_position(fen, moves)
+        except (ValueError, IndexError, KeyError) as error:
+            self.send(f'info string invalid position: {error}')
+
+    def go(self, args):
+        """
+        Handles 'go' with wtime/btime/winc/binc/movestogo/movetime/depth/nodes,
+        infinite and ponder, and starts the search thread. searchmoves and mate
+        are accepted but ignored.
+        """
+        limits = {}
+        infinite = ponder = False
+        i = 0
+        while i < len(args):
+            if args[i] == 'infinite':
+                infinite = True
+            elif args[i] == 'ponder':
+                ponder = True
+            elif args[i] in GO_LIMITS and i + 1 < len(args):
+                try:
+                    limits[args[i]] = int(args[i + 1])
+                except ValueError:
+                    pass
+                i += 1
+            i += 1
+
+        if self.bot is None:
+            self.create_bot()
+        bot = self.bot
+        bot.set_color(self.turn)
+        bot.max_depth = limits.get('depth')
+        bot.max_nodes = limits.get('nodes')
+        time_left = limits.get('wtime' if self.turn == 'w' else 'btime')
+        increment = limits.get('winc' if self.turn == 'w' else 'binc', 0)
+        if 'movetime' in limits:
+            bot.time_limit = limits['movetime'] / 1000
+            time_left = None
+        elif infinite or time_left is None:
+            bot.time_limit = float('inf')  # Until stop, or the depth or node limit
+            time_left = None
+        clock = (time_left / 1000 if time_left is not None else None, increment / 1000,
+                 limits.get('movestogo'))
+
+        self.release.clear()
+        # While pondering the bot ignores its time limits; 'ponderhit' turns them back on
+        self.pondering = bot.pondering = ponder
+        self.search_thread = threading.Thread(target=self.run_search, args=(clock, infinite or ponder),
+                                              daemon=True)
+        self.search_thread.start()
+
+    def run_search(self, clock, wait_for_release):
+        board = [row[:] for row in self.board]
+        move = self.bot.get_move(board, self.en_passant_possible, self.castling_rights,
+                                 self.move_log, *clock)
+        if wait_for_release:
+            self.release.wait()  # UCI: infinite and ponder searches report only after 'stop' or 'ponderhit'
+        if move is None:
+            self.send('bestmove 0000')
+            return
+        pv = self.bot.principal_variation
+        line = f'bestmove {format_move(board, move)}'
+        if len(pv) >= 2 and pv[0] == move:
+            board_after = GameState([row[:] for row in board], self.turn, self.en_passant_possible,
+                                    self.castling_rights)
+            board_after.make_move(*move)
+            line += f' ponder {format_move(board_after.board, pv[1])}'
+        self.send(line)
+
+    def send_info(self, depth, score, pv):
+        """
+        Streams an 'info' line after each completed iteration.
+        """
+        bot = self.bot
+        elapsed = max(time.time() - bot.start_time, 0.001)
+        moves = []
+        state = GameState([row[:] for row in self.board], self.turn, self.en_passant_possible,
+                          self.castling_rights)
+        for move in pv:
+            if not state.is_valid_move(*move):
+                break
+            moves.append(format_move(state.board, move))
+            state.make_move(*move)
+        self.send(f'info depth {depth} score {format_score(score)} nodes {bot.nodes} '
+                  f'nps {int(bot.nodes / elapsed)} time {int(elapsed * 1000)} '
+                  f'hashfull {bot.transposition_table.hashfull()} pv {" ".join(moves)}')
+
+    def ponderhit(self):
+        """
+        Handles 'ponderhit': the opponent played the expected move, so the ponder
+        search carries on as a normal search, with the time it has spent counted
+        against the clock given to 'go ponder'.
+        """
+        if self.search_thread is None or not self.pondering:
+            return
+        self.pondering = self.bot.pondering = False
+        self.release.set()
+
+    def stop(self):
+        """
+        Stops a running search and waits for its bestmove to be sent.
+        """
+        if self.search_thread is None:
+            return
+        self.pondering = self.bot.pondering = False
+        self.release.set()
+        # Keep cancelling in case the search hadn't set up its stop event yet
+        while self.search_thread.is_alive():
+            self.bot.cancel()
+            self.search_thread.join(0.01)
+        self.search_thread = None
+
+
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line.strip()):
+            break
+    engine.stop()
+
+
+if __name__ == '__main__':
+    main()